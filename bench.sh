@@ -0,0 +1,4 @@
+#!/bin/bash
+
+
+python src/bench_scraper.py "$@"
@@ -63,21 +63,27 @@ class Service {
   }
 
   fetchTicker2 = async (ticker: string) => {
-    const response = await fetch(this.baseUrl + 'tickerSA/' + ticker);
+    // Solo i campi usati: il server scarica la sola sezione overview e risponde con un JSON minimo
+    const paths = {
+      company_name: 'company_name',
+      dividend: 'data.overview.key_metrics.Dividend',
+      open: 'data.overview.key_metrics.Open',
+      close: 'data.overview.key_metrics.Previous Close',
+      analysts: 'data.overview.key_metrics.Analysts',
+      priceTarget: 'data.overview.key_metrics.Price Target'
+    };
+    const fields = ['ticker', 'last_updated', ...Object.values(paths)].join(',');
+    const response = await fetch(this.baseUrl + 'tickerSA/' + ticker + '?fields=' + encodeURIComponent(fields));
     if (!response.ok) {
       throw new Error(`HTTP error! status: ${response.status}`);
     }
     var data = await response.json();
     var ret = {
       ticker: data['ticker'],
-      company_name: data['company_name'],
-      last_updated: data['last_updated'],
-      dividend: this.getValueByPath(data, 'data.overview.key_metrics.Dividend'),
-      open: this.getValueByPath(data, 'data.overview.key_metrics.Open'),
-      close: this.getValueByPath(data, 'data.overview.key_metrics.Previous Close'),
-      analysts: this.getValueByPath(data, 'data.overview.key_metrics.Analysts'),
-      priceTarget: this.getValueByPath(data, 'data.overview.key_metrics.Price Target')
+      last_updated: data['last_updated']
     };
+    Object.keys(paths).forEach(key => ret[key] = this.getValueByPath(data, paths[key]));
+    ret['company_name'] = ret['company_name'] || data['ticker'] || ticker;
     return ret;
   }
 
@@ -92,6 +98,34 @@ class Service {
     return data;
   }
 
+  // Valutazione calcolata dal server: { currency, fx, totals: { USD, EUR }, positions: { columns, data }, missing }
+  fetchValuation = async (stocks: any[], currency = 'EUR') => {
+    const holdings = stocks.map(stock => ({
+      symbol: stock.symbol,
+      quantity: stock.quantity,
+      cost: stock.purchasePrice
+    }));
+    const response = await fetch(this.baseUrl + 'portfolio/valuation', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ currency, holdings })
+    });
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    return await response.json();
+  }
+
+  // Autocompletamento dall'indice locale del server: nessuno scraping per i simboli parziali
+  searchSymbols = async (query: string, limit = 10) => {
+    const response = await fetch(this.baseUrl + 'symbols/search?q=' + encodeURIComponent(query) + '&limit=' + limit);
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    const data = await response.json();
+    return data.results;
+  }
+
   fetchTickerSA = async (ticker: string) => {
     const response = await fetch(this.baseUrl + 'tickerSA/' + ticker);
     if (!response.ok) {
@@ -101,6 +135,63 @@ class Service {
     return data;
   }
 
+  // Stream in push delle quotazioni: una sola EventSource per pagina, condivisa da tutti
+  // i componenti iscritti e riaperta solo quando cambia l'insieme dei simboli
+  listeners = new Map();
+  quotes = {};
+  source: EventSource | null = null;
+  sourceSymbols = '';
+  nextListener = 0;
+
+  // callback riceve { SIMBOLO: campi cambiati }; torna la funzione per annullare l'iscrizione
+  subscribe = (symbols: string[], callback: (changes: any) => void) => {
+    const id = this.nextListener++;
+    const wanted = new Set(symbols.map(s => s.toUpperCase()));
+    this.listeners.set(id, { symbols: wanted, callback });
+    // Lo stato già noto arriva subito al nuovo iscritto
+    const known = {};
+    wanted.forEach(symbol => {
+      if (this.quotes[symbol]) known[symbol] = this.quotes[symbol];
+    });
+    if (Object.keys(known).length > 0) callback(known);
+    this.reconnect();
+    return () => {
+      this.listeners.delete(id);
+      this.reconnect();
+    };
+  }
+
+  reconnect = () => {
+    const all = new Set<string>();
+    this.listeners.forEach(listener => listener.symbols.forEach(symbol => all.add(symbol)));
+    const symbols = Array.from(all).sort().join(',');
+    if (symbols === this.sourceSymbols) {
+      return;
+    }
+    if (this.source) {
+      this.source.close();
+    }
+    this.source = null;
+    this.sourceSymbols = symbols;
+    if (!symbols) {
+      return;
+    }
+    this.source = new EventSource(this.baseUrl + 'stream?symbols=' + encodeURIComponent(symbols));
+    this.source.addEventListener('quote', (event: MessageEvent) => {
+      const changes = JSON.parse(event.data);
+      Object.keys(changes).forEach(symbol => {
+        this.quotes[symbol] = { ...this.quotes[symbol], ...changes[symbol] };
+      });
+      this.listeners.forEach(listener => {
+        const mine = {};
+        Object.keys(changes).forEach(symbol => {
+          if (listener.symbols.has(symbol)) mine[symbol] = changes[symbol];
+        });
+        if (Object.keys(mine).length > 0) listener.callback(mine);
+      });
+    });
+  }
+
   store(data: any) {
     console.log('Storing to storage', data);
     localStorage.setItem('portfolio', JSON.stringify(data));
@@ -27,6 +27,7 @@ const StockEdit: React.FC = () => {
   const [newStockQuantity, setNewStockQuantity] = useState<number>(1);
   const [newStockPurchasePrice, setNewStockPurchasePrice] = useState<number>(0);
   const [newStockCurrentPrice, setNewStockCurrentPrice] = useState<number>(0);
+  const [symbolOptions, setSymbolOptions] = useState<any[]>([]);
 
   const stockConfiguration: ColumnConfig<Stock>[] = [
     //  { header: 'ID', path: 'id', sortable: true, type: 'string' },
@@ -145,6 +146,35 @@ const StockEdit: React.FC = () => {
       });
   }
 
+  // Suggerimenti per il campo simbolo: solo l'indice locale del server, il fetch completo
+  // parte quando si sceglie un suggerimento o con il pulsante Fetch
+  useEffect(() => {
+    const query = newStockSymbol.trim();
+    if (!query) {
+      setSymbolOptions([]);
+      return;
+    }
+    let cancelled = false;
+    const timer = setTimeout(() => {
+      service.searchSymbols(query)
+        .then(results => { if (!cancelled) setSymbolOptions(results); })
+        .catch(error => console.error('Errore nella ricerca dei simboli:', error));
+    }, 150);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [newStockSymbol]);
+
+  // La scelta di un suggerimento arriva senza inputType (o come sostituzione), la digitazione no
+  const onInputSymbol = (value: string, inputType?: string) => {
+    setNewStockSymbol(value);
+    const picked = !inputType || inputType === 'insertReplacementText';
+    if (picked && symbolOptions.some(option => option.symbol === value)) {
+      onChangeSymbol(value);
+    }
+  }
+
   // Aggiunge un nuovo titolo al portafoglio
   const handleAddStock = (e: React.FormEvent) => {
     e.preventDefault();
@@ -188,39 +218,27 @@ const StockEdit: React.FC = () => {
   };
 
 
-  const aggiornaValori = () => {
-    console.log('Aggiornamento prezzi correnti...');
-    setLoading(true);
-    stocks.forEach((stock) => {
-      service.fetchTicker(stock.symbol)
-        .then(data => {
-          console.log('Dati ricevuti:', data);
-          if (data && data.currentPrice) {
-            handleUpdateCurrentPrice(stock.id, data.currentPrice);
-            calculateProfitLoss(stock);
-          } else {
-            console.warn('Dati non validi ricevuti dalla API');
-          }
-        });
-    });
-    setLoading(false);
-    setStocks(stocks);
-  }
-
+  // Simboli del portafoglio: l'iscrizione allo stream cambia solo quando cambiano questi
+  const symbols = useMemo(() => stocks.map((stock) => stock.symbol.toUpperCase()).sort().join(','), [stocks]);
 
   useEffect(() => {
-    console.log('mounting');
-    console.log('Stato attuale del portafoglio:', stocks);
-
-    const interval = setInterval(() => {
-      aggiornaValori();
-    }, 100000);
-
-    return () => {
-      console.log('unmounting, clear interval');
-      clearInterval(interval);
+    if (!symbols) {
+      return;
     }
-  }, [stocks]);
+    console.log('Iscrizione allo stream delle quotazioni:', symbols);
+    // Il server invia in push solo i campi cambiati, per tutti i titoli in una connessione
+    return service.subscribe(symbols.split(','), changes => {
+      setStocks(current =>
+        current.map((stock) => {
+          const quote = changes[stock.symbol.toUpperCase()];
+          if (!quote) {
+            return stock;
+          }
+          return { ...stock, currentPrice: quote.currentPrice ?? stock.currentPrice, data: { ...stock.data, ...quote } };
+        })
+      );
+    });
+  }, [symbols]);
 
   // Calcola il valore totale del portafoglio
   const totalPurchaseValue = useMemo(() => {
@@ -270,9 +288,15 @@ const StockEdit: React.FC = () => {
   const yeldITA= (divITA*12)/(totalPortfolioValue/usd)*100;
   const yeldITANetto= (divITANetto*12)/(totalPortfolioValue/usd)*100;
 
-  service.fetchUSD('USDEUR=X').then(data => {
-    setUsd(data);
-  });
+  useEffect(() => {
+    // Cambio dallo stream condiviso con <Usd />, non una richiesta a ogni render
+    return service.subscribe(['USDEUR=X'], changes => {
+      const quote = changes['USDEUR=X'];
+      if (quote && typeof quote.rate === 'number') {
+        setUsd(quote.rate);
+      }
+    });
+  }, []);
 
   return (
     <div class="container-fluid" >
@@ -294,10 +318,17 @@ const StockEdit: React.FC = () => {
             class="form-control-sm"
             type="text"
             id="symbol"
+            list="symbol-options"
+            autoComplete="off"
             value={newStockSymbol}
-            onChange={(e) => setNewStockSymbol(e.target.value)}
+            onChange={(e) => onInputSymbol(e.target.value, (e.nativeEvent as InputEvent).inputType)}
             required
           />
+          <datalist id="symbol-options">
+            {symbolOptions.map(option => (
+              <option key={option.symbol} value={option.symbol}>{option.description}</option>
+            ))}
+          </datalist>
           <button type="button" class="btn btn-success" onClick={() => onChangeSymbol(newStockSymbol)} >Fetch</button>
         </div>
         <div >
@@ -94,37 +94,24 @@ const StockPortfolio: React.FC = () => {
   };
 
 
-  const aggiornaValori=()=>{
-    console.log('Aggiornamento prezzi correnti...');
-    stocks.forEach((stock) => {
-      service.fetchTicker(stock.symbol)
-        .then(data => {
-            console.log('Dati ricevuti:', data);
-            if (data && data.currentPrice) {
-              handleUpdateCurrentPrice(stock.id, data.currentPrice);
-              calculateProfitLoss(stock);
-            } else {
-              console.warn('Dati non validi ricevuti dalla API');
-            }
-        }); 
-    });
-    setStocks(stocks);
-  }
-
+  // Simboli del portafoglio: l'iscrizione allo stream cambia solo quando cambiano questi
+  const symbols = useMemo(() => stocks.map((stock) => stock.symbol.toUpperCase()).sort().join(','), [stocks]);
 
   useEffect(() => {
-    console.log('mounting');
-    console.log('Stato attuale del portafoglio:', stocks);
-    
-    const interval = setInterval(() => {
-      aggiornaValori();
-    },5000);
-
-    return () => {
-      console.log('unmounting, clear interval');
-      clearInterval(interval); 
+    if (!symbols) {
+      return;
     }
-  }, [stocks]);
+    console.log('Iscrizione allo stream delle quotazioni:', symbols);
+    // Il server invia in push solo i campi cambiati, per tutti i titoli in una connessione
+    return service.subscribe(symbols.split(','), changes => {
+      setStocks(current =>
+        current.map((stock) => {
+          const quote = changes[stock.symbol.toUpperCase()];
+          return quote && quote.currentPrice ? { ...stock, currentPrice: quote.currentPrice } : stock;
+        })
+      );
+    });
+  }, [symbols]);
 
   // Calcola il valore totale del portafoglio
   const totalPurchaseValue = useMemo(() => {
@@ -21,13 +21,15 @@ function StockInfo(props) {
     }
 
     useEffect(() => {
-        console.log(`initializing usd interval`);
+        // I dati SA dell'overview cambiano al più ogni 15 minuti (TTL del server): niente
+        // polling a 5 secondi, le quotazioni vive arrivano dallo stream
+        update();
         const interval = setInterval(() => {
             update();
-        }, 5000);
+        }, 15 * 60 * 1000);
 
         return () => {
-            console.log(`clearing usd interval`);
+            console.log(`clearing info interval`);
             clearInterval(interval);
         };
     }, []);
@@ -8,26 +8,17 @@ function Usd() {
     let [usd, setUsd] = useState(usdValue);
     let [time, setTime] = useState(now);
 
-    function update() {
-        service.fetchUSD('USDEUR=X').then(data => {
-            console.log(data);
-            usdValue=data;
-            const newTime = new Date().toLocaleTimeString();
-            setTime(newTime);
-            setUsd(usdValue.toFixed(4));
-        });
-    }
-
     useEffect(() => {
-        console.log(`initializing usd interval`);
-        const interval = setInterval(() => {
-            update();
-        }, 5000);
-
-        return () => {
-            console.log(`clearing usd interval`);
-            clearInterval(interval);
-        };
+        console.log(`subscribing usd stream`);
+        // Il cambio arriva in push dallo stream, solo quando varia
+        return service.subscribe(['USDEUR=X'], changes => {
+            const quote = changes['USDEUR=X'];
+            if (quote && typeof quote.rate === 'number') {
+                usdValue = quote.rate;
+                setTime(new Date().toLocaleTimeString());
+                setUsd(usdValue.toFixed(4));
+            }
+        });
     }, []);
 
     return (
@@ -0,0 +1,90 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundWriter:
+    """
+    Coda di scrittura su disco servita da un thread in background, così le richieste non
+    attendono l'I/O. Le scritture sono per chiave (es. il ticker): una nuova scrittura per
+    una chiave ancora in coda sostituisce la precedente (coalescenza). La coda è limitata
+    a `max_pending` chiavi; oltre, le nuove scritture sono scartate e contate in `dropped`.
+    Il thread preleva fino a `batch_size` voci alla volta e le passa a `write(key, value)`.
+    """
+    def __init__(self, write: Callable[[str, Any], Any], max_pending: int = 256,
+                 batch_size: int = 16, name: str = 'writer'):
+        self.write = write
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.pending: 'OrderedDict[str, Any]' = OrderedDict()
+        self.cond = threading.Condition()
+        self.busy = 0
+        self.counters = {'submitted': 0, 'coalesced': 0, 'dropped': 0,
+                         'written': 0, 'errors': 0, 'batches': 0}
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+
+    def submit(self, key: str, value: Any) -> bool:
+        """Accoda la scrittura senza bloccare; torna False se la coda è piena"""
+        with self.cond:
+            self.counters['submitted'] += 1
+            if key in self.pending:
+                self.counters['coalesced'] += 1
+                self.pending[key] = value
+                return True
+            if len(self.pending) >= self.max_pending:
+                self.counters['dropped'] += 1
+                logger.warning(f"Coda di scrittura piena, scartato {key}")
+                return False
+            self.pending[key] = value
+            self.cond.notify_all()
+            return True
+
+    def _take(self) -> List[Tuple[str, Any]]:
+        with self.cond:
+            while not self.pending:
+                self.cond.wait()
+            batch = []
+            while self.pending and len(batch) < self.batch_size:
+                batch.append(self.pending.popitem(last=False))
+            self.busy = len(batch)
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take()
+            written = errors = 0
+            for key, value in batch:
+                try:
+                    self.write(key, value)
+                    written += 1
+                except Exception as e:
+                    errors += 1
+                    logger.error(f"Errore nella scrittura di {key}: {e}")
+            with self.cond:
+                self.busy = 0
+                self.counters['written'] += written
+                self.counters['errors'] += errors
+                self.counters['batches'] += 1
+                self.cond.notify_all()
+
+    def flush(self, timeout: float = 30.0) -> bool:
+        """Attende che coda e batch in corso siano scritti; False se scade il timeout"""
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while self.pending or self.busy:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.cond.wait(remaining)
+            return True
+
+    def stats(self) -> Dict[str, int]:
+        """Profondità della coda e contatori cumulativi"""
+        with self.cond:
+            return {'depth': len(self.pending), 'in_flight': self.busy,
+                    'max_pending': self.max_pending, **self.counters}
@@ -0,0 +1,268 @@
+"""
+Benchmark offline della pipeline di parsing di StockAnalysisScraper.
+
+Le pagine sono servite da fixture HTML registrate (bench/fixtures/<ticker>/<pagina>.html)
+tramite un adapter requests locale, quindi nessuna richiesta arriva al sito reale.
+
+    python src/bench_scraper.py --record AAPL            # registra le pagine dal sito
+    python src/bench_scraper.py --synthetic DEMO         # genera fixture sintetiche
+    python src/bench_scraper.py --output bench/results/base.json
+    python src/bench_scraper.py --compare bench/results/base.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List
+
+import requests
+from requests.adapters import BaseAdapter
+
+from http_client import ConditionalCache, HttpClient
+from rate_limiter import HostRateLimiter
+from scraper_stockanalysis import BROWSER_HEADERS, StockAnalysisScraper
+
+FIXTURES_DIR = os.path.join('bench', 'fixtures')
+
+
+class FixtureAdapter(BaseAdapter):
+    """Transport requests che risponde con le fixture HTML invece di andare in rete"""
+    def __init__(self, pages: Dict[str, bytes]):
+        super().__init__()
+        self.pages = pages
+
+    def send(self, request, **kwargs):
+        response = requests.Response()
+        response.url = request.url
+        response.request = request
+        body = self.pages.get(request.url)
+        response.status_code = 200 if body is not None else 404
+        response._content = body if body is not None else b''
+        response.headers['Content-Type'] = 'text/html; charset=utf-8'
+        return response
+
+    def close(self):
+        pass
+
+
+def fixture_path(ticker: str, page: str) -> str:
+    return os.path.join(FIXTURES_DIR, ticker.lower(), f"{page}.html")
+
+
+def load_fixtures(ticker: str) -> Dict[str, bytes]:
+    """Mappa url -> html per tutte le pagine di self.urls del ticker"""
+    scraper = StockAnalysisScraper(ticker)
+    pages = {}
+    for page, url in scraper.urls.items():
+        with open(fixture_path(ticker, page), 'rb') as f:
+            pages[url] = f.read()
+    return pages
+
+
+def record(ticker: str):
+    """Registra dal sito le pagine di tutte le sezioni"""
+    scraper = StockAnalysisScraper(ticker, delay=1.0)
+    os.makedirs(os.path.dirname(fixture_path(ticker, 'overview')), exist_ok=True)
+    for page, url in scraper.urls.items():
+        response = scraper.http.get(url, headers=BROWSER_HEADERS)
+        response.raise_for_status()
+        with open(fixture_path(ticker, page), 'wb') as f:
+            f.write(response.content)
+        print(f"💾 {page}: {len(response.content)} bytes")
+        time.sleep(scraper.delay)
+
+
+def synthetic_value(rng: random.Random) -> str:
+    r = rng.random()
+    if r < 0.08:
+        return '-'
+    if r < 0.12:
+        return 'N/A'
+    if r < 0.35:
+        return f"{rng.uniform(-60, 60):.2f}%"
+    if r < 0.45:
+        return f"({rng.uniform(1, 999):,.1f})"
+    if r < 0.65:
+        return f"{rng.uniform(1, 999):.2f}{rng.choice('KMBT')}"
+    if r < 0.85:
+        return f"{rng.uniform(1, 999999):,.0f}"
+    return f"${rng.uniform(1, 500):,.2f}"
+
+
+def synthetic_page(page: str, rng: random.Random) -> str:
+    """Pagina HTML con la struttura tipica di stockanalysis (tabelle, statistiche, news)"""
+    parts = ['<html><head><title>Demo</title></head><body><h1>Demo Corp (DEMO)</h1>']
+    if page == 'news':
+        for i in range(30):
+            parts.append(f'<article><h3>Headline {i}</h3><span class="date">Oct {i % 28 + 1}, 2025</span>'
+                         f'<a href="/news/{i}/">link</a><p class="summary">{"Lorem ipsum " * 20}</p></article>')
+    else:
+        for i in range(12):
+            parts.append(f'<div class="stat"><span class="label">Metric {i}</span>'
+                         f'<span class="value">{synthetic_value(rng)}</span></div>')
+        parts.append('<table class="stats-table"><tbody>')
+        for i in range(25):
+            parts.append(f'<tr><td>Statistic {i}</td><td>{synthetic_value(rng)}</td></tr>')
+        parts.append('</tbody></table>')
+        years = 10 if page in ('financials', 'balance-sheet', 'cash-flow', 'ratios') else 5
+        rows = 45 if years == 10 else 15
+        parts.append('<table><thead><tr><th>Fiscal Year</th>')
+        parts.extend(f'<th>FY {2024 - y}</th>' for y in range(years))
+        parts.append('</tr></thead><tbody>')
+        for i in range(rows):
+            parts.append(f'<tr><td>Line item {i}</td>')
+            parts.extend(f'<td>{synthetic_value(rng)}</td>' for _ in range(years))
+            parts.append('</tr>')
+        parts.append('</tbody></table>')
+    parts.append('</body></html>')
+    return ''.join(parts)
+
+
+def synthetic(ticker: str, seed: int = 42):
+    """Genera fixture sintetiche deterministiche per tutte le pagine"""
+    rng = random.Random(seed)
+    scraper = StockAnalysisScraper(ticker)
+    os.makedirs(os.path.dirname(fixture_path(ticker, 'overview')), exist_ok=True)
+    for page in scraper.urls:
+        with open(fixture_path(ticker, page), 'w', encoding='utf-8') as f:
+            f.write(synthetic_page(page, rng))
+    print(f"✅ Fixture sintetiche generate in {os.path.dirname(fixture_path(ticker, 'overview'))}")
+
+
+def offline_scraper(ticker: str, pages: Dict[str, bytes], **kwargs) -> StockAnalysisScraper:
+    """Scraper con transport locale (client HTTP dedicato) e nessun delay/rate limit"""
+    kwargs.setdefault('rate_limiter', HostRateLimiter(rate=1e9, capacity=1e9))
+    http = HttpClient(retries=0, per_host=64)
+    http.session.mount('https://', FixtureAdapter(pages))
+    # Niente cache condizionale: ogni fetch misura download e parsing completi
+    return StockAnalysisScraper(ticker, delay=0, http=http, page_cache=ConditionalCache(max_entries=0), **kwargs)
+
+
+def timeit(fn: Callable[[], object], repeat: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return {'mean_s': statistics.mean(samples), 'median_s': statistics.median(samples),
+            'min_s': min(samples), 'repeat': repeat}
+
+
+def run(ticker: str, repeat: int, parser: str = None) -> Dict:
+    pages = load_fixtures(ticker)
+    urls: List[str] = list(pages)
+    results: Dict[str, Dict] = {}
+
+    scraper = offline_scraper(ticker, pages, parser=parser)
+    soups = [scraper.fetch_page(url) for url in urls]
+    cells = [scraper.clean_text(td.get_text()) for soup in soups for td in soup.find_all(['td', 'th'])]
+
+    def get_pages():
+        for url in urls:
+            scraper.get_page(url)
+
+    def tables():
+        for soup in soups:
+            scraper.last_extract = None
+            scraper.scrape_table(soup)
+
+    def key_statistics():
+        for soup in soups:
+            scraper.last_extract = None
+            scraper.scrape_key_statistics(soup)
+
+    def parse_numbers():
+        for text in cells:
+            scraper.parse_number(text)
+
+    results['get_page'] = timeit(get_pages, repeat)
+    results['get_page']['pages_per_s'] = len(urls) / results['get_page']['mean_s']
+    results['scrape_table'] = timeit(tables, repeat)
+    results['scrape_table']['pages_per_s'] = len(urls) / results['scrape_table']['mean_s']
+    results['scrape_key_statistics'] = timeit(key_statistics, repeat)
+    results['scrape_key_statistics']['pages_per_s'] = len(urls) / results['scrape_key_statistics']['mean_s']
+    results['parse_number'] = timeit(parse_numbers, repeat)
+    results['parse_number']['cells_per_s'] = len(cells) / results['parse_number']['mean_s']
+
+    for name, concurrent in (('scrape_all', False), ('scrape_all_concurrent', True)):
+        results[name] = timeit(lambda: offline_scraper(ticker, pages, parser=parser, concurrent=concurrent).scrape_all(), repeat)
+        results[name]['tickers_per_s'] = 1 / results[name]['mean_s']
+        results[name]['pages_per_s'] = len(urls) / results[name]['mean_s']
+
+    # Picco di memoria di uno scraping completo
+    tracemalloc.start()
+    offline_scraper(ticker, pages, parser=parser).scrape_all()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'ticker': ticker,
+        'parser': scraper.parser or 'default',
+        'pages': len(urls),
+        'cells': len(cells),
+        'html_bytes': sum(len(body) for body in pages.values()),
+        'peak_memory_bytes': peak,
+        'created': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'results': results
+    }
+
+
+def compare(current: Dict, baseline: Dict):
+    """Stampa il rapporto baseline/corrente del tempo medio di ogni misura"""
+    print(f"📊 Confronto con baseline del {baseline.get('created')}")
+    for name, values in current['results'].items():
+        base = baseline['results'].get(name)
+        if base:
+            speedup = base['mean_s'] / values['mean_s']
+            print(f"   • {name:24s} {base['mean_s'] * 1000:9.2f} ms -> {values['mean_s'] * 1000:9.2f} ms  (x{speedup:.2f})")
+    print(f"   • peak memory            {baseline['peak_memory_bytes'] / 1e6:9.2f} MB -> "
+          f"{current['peak_memory_bytes'] / 1e6:9.2f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark offline di StockAnalysisScraper')
+    parser.add_argument('--ticker', default='DEMO')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--parser', default=None, help='Parser HTML (lxml, html.parser, ...)')
+    parser.add_argument('--record', metavar='TICKER', help='Registra le fixture dal sito reale')
+    parser.add_argument('--synthetic', metavar='TICKER', help='Genera fixture sintetiche')
+    parser.add_argument('--output', help='Salva i risultati in JSON')
+    parser.add_argument('--compare', help='Confronta con un file di risultati precedente')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    if args.record:
+        record(args.record)
+        return
+    if args.synthetic:
+        synthetic(args.synthetic)
+        return
+    if not os.path.exists(fixture_path(args.ticker, 'overview')):
+        print(f"Fixture mancanti per {args.ticker}: usa --record o --synthetic")
+        return
+
+    report = run(args.ticker, args.repeat, args.parser)
+    for name, values in report['results'].items():
+        rates = ', '.join(f"{k}={v:,.1f}" for k, v in values.items() if k.endswith('_per_s'))
+        print(f"⏱️  {name:24s} {values['mean_s'] * 1000:9.2f} ms  {rates}")
+    print(f"🧠 Picco memoria scrape_all: {report['peak_memory_bytes'] / 1e6:.2f} MB")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(report, json.load(f))
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Risultati salvati in {args.output}")
+
+
+if __name__ == '__main__':
+    main()
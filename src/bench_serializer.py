@@ -0,0 +1,73 @@
+"""
+Micro-benchmark della serializzazione JSON di uno ScrapedData completo.
+
+Il documento è prodotto da StockAnalysisScraper sulle fixture di bench_scraper (registrate
+o, se mancano, sintetiche generate in memoria), quindi nessuna richiesta va in rete.
+
+    python src/bench_serializer.py
+    python src/bench_serializer.py --ticker AAPL --repeat 50 --columnar
+"""
+import argparse
+import json
+import logging
+import os
+import random
+from dataclasses import asdict
+
+import serializer
+from bench_scraper import fixture_path, load_fixtures, offline_scraper, synthetic_page, timeit
+from scraper_stockanalysis import StockAnalysisScraper
+
+
+def pages_for(ticker: str):
+    """Fixture registrate del ticker, altrimenti pagine sintetiche in memoria"""
+    if os.path.exists(fixture_path(ticker, 'overview')):
+        return load_fixtures(ticker)
+    rng = random.Random(42)
+    urls = StockAnalysisScraper(ticker).urls
+    return {url: synthetic_page(page, rng).encode('utf-8') for page, url in urls.items()}
+
+
+def run(ticker: str, repeat: int, columnar: bool = False):
+    data = offline_scraper(ticker, pages_for(ticker), columnar=columnar).scrape_all()
+    doc = serializer.as_document(data)
+    cache = serializer.BytesCache()
+    cache.get('doc', 1, lambda: serializer.dumps(doc))
+
+    measures = {
+        # Percorso storico: asdict + json.dump indentato (file) e json compatto (Flask-RESTX)
+        'asdict+json(indent=2)': lambda: json.dumps(asdict(data), indent=2, default=str),
+        'asdict+json': lambda: json.dumps(asdict(data), default=str),
+        'serializer.dumps(ScrapedData)': lambda: serializer.dumps(data),
+        'serializer.dumps(doc)': lambda: serializer.dumps(doc),
+        'BytesCache hit': lambda: cache.get('doc', 1, lambda: serializer.dumps(doc)),
+    }
+    if columnar:
+        # Con i DataFrame in cache il percorso storico passa da to_serializable
+        from columnar import to_serializable
+        measures['asdict+json'] = lambda: json.dumps(to_serializable(asdict(data)), default=str)
+        measures['asdict+json(indent=2)'] = lambda: json.dumps(to_serializable(asdict(data)), indent=2, default=str)
+
+    size = len(serializer.dumps(doc))
+    print(f"📦 {ticker}: {size / 1e3:.1f} KB di JSON, encoder {'orjson' if serializer.orjson else 'json'}")
+    baseline = None
+    for name, fn in measures.items():
+        result = timeit(fn, repeat)
+        baseline = baseline or result['mean_s']
+        print(f"⏱️  {name:30s} {result['mean_s'] * 1000:9.3f} ms  "
+              f"{size / result['mean_s'] / 1e6:9.1f} MB/s  (x{baseline / result['mean_s']:.1f})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmark della serializzazione JSON')
+    parser.add_argument('--ticker', default='DEMO')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--columnar', action='store_true', help='Tabelle come DataFrame')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    run(args.ticker, args.repeat, args.columnar)
+
+
+if __name__ == '__main__':
+    main()
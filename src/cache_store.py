@@ -0,0 +1,375 @@
+import atexit
+import hashlib
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from flask_caching.backends.base import BaseCache
+
+try:
+    import fcntl
+except ImportError:  # Windows: niente lock tra worker
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteCache(BaseCache):
+    """
+    Backend flask_caching su file SQLite: condiviso da tutti i worker (gunicorn) della
+    stessa macchina e persistente ai riavvii. Conta hit e miss per namespace, dove il
+    namespace è la parte della chiave prima di '/' (es. 'tickerSA/AAPL' -> 'tickerSA'):
+    i contatori restano in memoria e sono scritti nella tabella stats al più ogni
+    `flush_every` secondi, così le letture non diventano transazioni di scrittura.
+    """
+    def __init__(self, path: str = 'cache/finanza.db', default_timeout: int = 300,
+                 prune_every: int = 100, flush_every: float = 10.0):
+        super().__init__(default_timeout=default_timeout)
+        self.path = path
+        self.prune_every = prune_every
+        self.flush_every = flush_every
+        self.sets = 0
+        self.local = threading.local()
+        self.counts: Dict[str, list] = {}
+        self.counts_lock = threading.Lock()
+        self.flushed = time.monotonic()
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with self._conn() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, expires REAL, value BLOB)")
+            conn.execute("CREATE TABLE IF NOT EXISTS stats (namespace TEXT PRIMARY KEY, "
+                         "hits INTEGER NOT NULL DEFAULT 0, misses INTEGER NOT NULL DEFAULT 0)")
+        atexit.register(self.flush_stats)
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        kwargs.setdefault('path', config.get('CACHE_SQLITE_PATH', 'cache/finanza.db'))
+        return cls(*args, **kwargs)
+
+    def _conn(self) -> sqlite3.Connection:
+        """Una connessione per thread, in WAL così i lettori non bloccano lo scrittore"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def _expires(self, timeout: Optional[int]) -> float:
+        timeout = self._normalize_timeout(timeout)
+        return time.time() + timeout if timeout > 0 else 0
+
+    def _count(self, key: str, hit: bool):
+        namespace = key.split('/', 1)[0]
+        with self.counts_lock:
+            self.counts.setdefault(namespace, [0, 0])[0 if hit else 1] += 1
+            due = time.monotonic() - self.flushed >= self.flush_every
+        if due:
+            self.flush_stats()
+
+    def flush_stats(self):
+        """Somma i contatori in memoria del processo alla tabella stats (una transazione)"""
+        with self.counts_lock:
+            counts, self.counts = self.counts, {}
+            self.flushed = time.monotonic()
+        if not counts:
+            return
+        conn = self._conn()
+        try:
+            with conn:
+                conn.execute("BEGIN")
+                conn.executemany(
+                    "INSERT INTO stats (namespace, hits, misses) VALUES (?, ?, ?) ON CONFLICT(namespace) "
+                    "DO UPDATE SET hits = hits + excluded.hits, misses = misses + excluded.misses",
+                    [(namespace, hits, misses) for namespace, (hits, misses) in counts.items()])
+        except sqlite3.Error as e:
+            logger.warning(f"Statistiche della cache non salvate: {e}")
+
+    def _row(self, key: str):
+        row = self._conn().execute("SELECT expires, value FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None or (row[0] and row[0] <= time.time()):
+            return None
+        return row
+
+    def get(self, key: str) -> Any:
+        row = self._row(key)
+        self._count(key, row is not None)
+        return pickle.loads(row[1]) if row is not None else None
+
+    def has(self, key: str) -> bool:
+        return self._row(key) is not None
+
+    def peek(self, key: str) -> Any:
+        """Come get, ma senza contare hit o miss (riletture interne, non richieste dei client)"""
+        row = self._row(key)
+        return pickle.loads(row[1]) if row is not None else None
+
+    def set(self, key: str, value: Any, timeout: Optional[int] = None) -> bool:
+        self._conn().execute("INSERT OR REPLACE INTO entries (key, expires, value) VALUES (?, ?, ?)",
+                             (key, self._expires(timeout), pickle.dumps(value, pickle.HIGHEST_PROTOCOL)))
+        self.sets += 1
+        if self.sets % self.prune_every == 0:
+            self.prune()
+        return True
+
+    def add(self, key: str, value: Any, timeout: Optional[int] = None) -> bool:
+        if self.has(key):
+            return False
+        return self.set(key, value, timeout)
+
+    def delete(self, key: str) -> bool:
+        return self._conn().execute("DELETE FROM entries WHERE key = ?", (key,)).rowcount > 0
+
+    def clear(self) -> bool:
+        self._conn().execute("DELETE FROM entries")
+        return True
+
+    def prune(self):
+        """Elimina le voci scadute"""
+        self._conn().execute("DELETE FROM entries WHERE expires > 0 AND expires <= ?", (time.time(),))
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Hit, miss e hit ratio per namespace (cumulativi su tutti i worker, fino all'ultimo flush)"""
+        self.flush_stats()
+        ret = {}
+        for namespace, hits, misses in self._conn().execute("SELECT namespace, hits, misses FROM stats"):
+            total = hits + misses
+            ret[namespace] = {'hits': hits, 'misses': misses,
+                              'hit_ratio': round(hits / total, 4) if total else None}
+        return ret
+
+
+class _Call:
+    """Fetch in corso per una chiave: i thread in attesa ne condividono il risultato"""
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Coalescenza delle richieste concorrenti: per ogni chiave un solo thread (il leader)
+    esegue il fetch, gli altri attendono e ricevono lo stesso risultato (o la stessa eccezione).
+    Con `lock_dir` il leader prende anche un file lock per chiave, così un solo worker
+    alla volta va upstream; prima del fetch `recheck` permette di riusare il valore che
+    un altro worker ha nel frattempo salvato nella cache condivisa.
+    """
+    def __init__(self, lock_dir: Optional[str] = None, lock_timeout: float = 60.0):
+        self.calls: Dict[str, _Call] = {}
+        self.lock = threading.Lock()
+        self.lock_dir = lock_dir if fcntl is not None else None
+        self.lock_timeout = lock_timeout
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+
+    def do(self, key: str, fn: Callable[[], Any], recheck: Optional[Callable[[], Any]] = None) -> Any:
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+        try:
+            call.value = self._run(key, fn, recheck)
+            return call.value
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+    def _run(self, key: str, fn: Callable[[], Any], recheck: Optional[Callable[[], Any]]) -> Any:
+        if not self.lock_dir:
+            return fn()
+        path = os.path.join(self.lock_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.lock')
+        with open(path, 'a') as lock_file:
+            locked = self._flock(lock_file)
+            try:
+                if recheck is not None:
+                    value = recheck()
+                    if value is not None:
+                        return value
+                return fn()
+            finally:
+                if locked:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _flock(self, lock_file) -> bool:
+        """Attende il lock esclusivo; scaduto il timeout procede comunque senza lock"""
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    logger.warning(f"Timeout sul lock {lock_file.name}, fetch senza lock")
+                    return False
+                time.sleep(0.05)
+
+
+@dataclass
+class CachedValue:
+    value: Any
+    age: float
+    status: str  # 'fresh', 'stale' (servito mentre si aggiorna in background) o 'miss'
+    stored_at: float = 0.0  # istante di salvataggio in cache: identifica la versione del valore
+
+
+class StaleWhileRevalidate:
+    """
+    Lettura stale-while-revalidate sopra una cache flask_caching. Le voci sono salvate
+    come (timestamp, valore) e restano in cache fino a `max_stale` secondi:
+    - età < ttl: servite fresche;
+    - ttl <= età < max_stale: servite subito e aggiornate da un worker in background;
+    - oltre max_stale (o assenti): fetch bloccante.
+    I fetch (bloccanti e in background) passano dal SingleFlight, uno per chiave.
+    """
+    def __init__(self, cache, max_workers: int = 4, flight: Optional[SingleFlight] = None):
+        self.cache = cache
+        # Lettura senza statistiche per i ricontrolli, se il backend la offre
+        backend = getattr(cache, 'cache', cache)
+        self.peek = getattr(backend, 'peek', cache.get)
+        self.flight = flight or SingleFlight()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='swr')
+        self.refreshing: Set[str] = set()
+        self.lock = threading.Lock()
+
+    def lookup(self, key: str, ttl: int, max_stale: int) -> Optional[CachedValue]:
+        """Voce in cache fresca o stale (senza avviarne l'aggiornamento); None se assente o troppo vecchia"""
+        entry = self.cache.get(key)
+        if isinstance(entry, tuple) and len(entry) == 2:
+            stored_at, value = entry
+            age = time.time() - stored_at
+            if age < ttl:
+                return CachedValue(value, age, 'fresh', stored_at)
+            if age < max_stale:
+                return CachedValue(value, age, 'stale', stored_at)
+        return None
+
+    def get(self, key: str, loader: Callable[[], Any], ttl: int, max_stale: int) -> CachedValue:
+        result = self.lookup(key, ttl, max_stale)
+        if result is not None:
+            if result.status == 'stale':
+                self.refresh(key, loader, ttl, max_stale)
+            return result
+        stored_at, value = self.load(key, loader, ttl, max_stale)
+        return CachedValue(value, max(time.time() - stored_at, 0.0), 'miss', stored_at)
+
+    def store(self, key: str, value: Any, max_stale: int, stored_at: Optional[float] = None) -> CachedValue:
+        """
+        Salva un valore appena scaricato e lo torna come voce 'miss'. Con `stored_at` il
+        valore è datato a quell'istante (es. calcolato da una voce più vecchia): età e
+        scadenza partono da lì e una voce già oltre max_stale non viene salvata.
+        """
+        now = time.time()
+        stored_at = now if stored_at is None else stored_at
+        remaining = int(stored_at + max_stale - now)
+        if remaining > 0:
+            self.cache.set(key, (stored_at, value), timeout=remaining)
+        return CachedValue(value, max(now - stored_at, 0.0), 'miss', stored_at)
+
+    def get_many(self, keys: Dict[str, str], loader: Callable[[List[str]], Dict[str, Any]],
+                 ttl: int, max_stale: int) -> Dict[str, CachedValue]:
+        """
+        Come get per più voci {id: chiave}, con `loader(ids) -> {id: valore}` che scarica
+        più id in una volta: i mancanti con una sola chiamata bloccante, gli stale con una
+        sola chiamata in background. Gli id che il loader non torna sono assenti dal risultato.
+        """
+        ret: Dict[str, CachedValue] = {}
+        missing: List[str] = []
+        stale: List[str] = []
+        for item, key in keys.items():
+            result = self.lookup(key, ttl, max_stale)
+            if result is None:
+                missing.append(item)
+                continue
+            ret[item] = result
+            if result.status == 'stale':
+                stale.append(item)
+        if stale:
+            self.refresh_many({item: keys[item] for item in stale}, loader, max_stale)
+        if missing:
+            for item, value in loader(missing).items():
+                if item in keys:
+                    ret[item] = self.store(keys[item], value, max_stale)
+        return ret
+
+    def refresh_many(self, keys: Dict[str, str], loader: Callable[[List[str]], Dict[str, Any]], max_stale: int):
+        """Un solo aggiornamento in background per le voci {id: chiave} non già in aggiornamento"""
+        with self.lock:
+            keys = {item: key for item, key in keys.items() if key not in self.refreshing}
+            self.refreshing.update(keys.values())
+        if keys:
+            self.executor.submit(self._refresh_many, keys, loader, max_stale)
+
+    def _refresh_many(self, keys: Dict[str, str], loader: Callable[[List[str]], Dict[str, Any]], max_stale: int):
+        try:
+            for item, value in loader(list(keys)).items():
+                if item in keys:
+                    self.store(keys[item], value, max_stale)
+        except Exception as e:
+            logger.error(f"Errore nell'aggiornamento in background di {len(keys)} voci: {e}")
+        finally:
+            with self.lock:
+                self.refreshing.difference_update(keys.values())
+
+    def _fresh_entry(self, key: str, ttl: int) -> Optional[tuple]:
+        entry = self.peek(key)
+        if isinstance(entry, tuple) and len(entry) == 2 and time.time() - entry[0] < ttl:
+            return entry
+        return None
+
+    def fresh(self, key: str, ttl: int) -> Any:
+        """Valore in cache se più giovane del ttl, altrimenti None"""
+        entry = self._fresh_entry(key, ttl)
+        return entry[1] if entry is not None else None
+
+    def prime(self, key: str, value: Any, stored_at: float, max_stale: int) -> bool:
+        """Inserisce un valore salvato altrove all'istante `stored_at`, se la chiave è assente e non troppo vecchio"""
+        remaining = stored_at + max_stale - time.time()
+        if remaining <= 0:
+            return False
+        return self.cache.add(key, (stored_at, value), timeout=int(remaining))
+
+    def load(self, key: str, loader: Callable[[], Any], ttl: int, max_stale: int) -> tuple:
+        """Fetch bloccante: torna la voce (stored_at, valore) salvata in cache"""
+        def fetch():
+            value = loader()
+            entry = (time.time(), value)
+            self.cache.set(key, entry, timeout=max_stale)
+            return entry
+        return self.flight.do(key, fetch, recheck=lambda: self._fresh_entry(key, ttl))
+
+    def refresh(self, key: str, loader: Callable[[], Any], ttl: int, max_stale: int):
+        """Accoda un aggiornamento in background, al massimo uno per chiave"""
+        with self.lock:
+            if key in self.refreshing:
+                return
+            self.refreshing.add(key)
+        self.executor.submit(self._refresh, key, loader, ttl, max_stale)
+
+    def _refresh(self, key: str, loader: Callable[[], Any], ttl: int, max_stale: int):
+        try:
+            self.load(key, loader, ttl, max_stale)
+        except Exception as e:
+            # La voce stale resta valida fino a max_stale: si riproverà alla prossima lettura
+            logger.error(f"Errore nell'aggiornamento in background di {key}: {e}")
+        finally:
+            with self.lock:
+                self.refreshing.discard(key)
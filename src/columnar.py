@@ -0,0 +1,146 @@
+import argparse
+import os
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Formati supportati per le tabelle colonnari:
+# - 'records': lista di dict riga per riga (formato storico di scrape_table)
+# - 'split': {'columns': [...], 'data': [[...], ...]}, senza ripetere gli header per riga
+ORIENTS = ('records', 'split')
+
+INT64_MIN, INT64_MAX = int(np.iinfo(np.int64).min), int(np.iinfo(np.int64).max)
+
+
+def _column(values: List[Any]) -> Any:
+    """
+    Colonna col dtype che conserva i valori: Int64 (intero nullable), float64 o object.
+    Gli interi oltre i 64 bit (parse_number non ha limiti) restano in una colonna object.
+    """
+    present = [v for v in values if v is not None]
+    if present and all(type(v) is int and INT64_MIN <= v <= INT64_MAX for v in present):
+        return pd.array(values, dtype='Int64')
+    if present and all(type(v) is float for v in present):
+        return np.array([np.nan if v is None else v for v in values], dtype=float)
+    return pd.array(values, dtype=object)
+
+
+def records_to_frame(rows: List[Dict]) -> pd.DataFrame:
+    """
+    Converte le righe di scrape_table in un DataFrame (colonne nell'ordine di apparizione).
+    Le righe di tabelle HTML diverse hanno header diversi: in attrs['blocks'] restano, per
+    ogni gruppo di righe consecutive con le stesse chiavi, il numero di righe e le chiavi,
+    così frame_to_records ricostruisce le righe originali senza le colonne degli altri.
+    """
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    frame = pd.DataFrame({column: _column([row.get(column) for row in rows]) for column in columns},
+                         columns=columns)
+    blocks: List[Tuple[int, List[str]]] = []
+    for row in rows:
+        keys = list(row)
+        if blocks and blocks[-1][1] == keys:
+            blocks[-1] = (blocks[-1][0] + 1, keys)
+        else:
+            blocks.append((1, keys))
+    frame.attrs['blocks'] = blocks
+    return frame
+
+
+def frame_values(frame: pd.DataFrame) -> List[List]:
+    """Righe del DataFrame come liste Python, con None al posto dei mancanti (NaN/NA)"""
+    values = frame.to_numpy(dtype=object, copy=True)
+    values[pd.isna(values)] = None
+    return values.tolist()
+
+
+def frame_to_records(frame: pd.DataFrame) -> List[Dict]:
+    """DataFrame -> righe come scrape_table, ognuna con le sole chiavi della sua tabella"""
+    names = [str(column) for column in frame.columns]
+    rows = frame_values(frame)
+    blocks = frame.attrs.get('blocks')
+    if not blocks or sum(count for count, _ in blocks) != len(rows):
+        return [dict(zip(names, row)) for row in rows]
+    position = {name: i for i, name in enumerate(names)}
+    ret: List[Dict] = []
+    start = 0
+    for count, keys in blocks:
+        indexes = [position[str(key)] for key in keys]
+        ret.extend({key: row[i] for key, i in zip(keys, indexes)} for row in rows[start:start + count])
+        start += count
+    return ret
+
+
+def frame_to_split(frame: pd.DataFrame) -> Dict[str, List]:
+    """DataFrame -> {'columns', 'data'} con gli header una sola volta; i mancanti diventano None"""
+    return {'columns': [str(column) for column in frame.columns], 'data': frame_values(frame)}
+
+
+def to_serializable(obj: Any, orient: str = 'records') -> Any:
+    """Copia di obj con i DataFrame convertiti nel formato richiesto, pronta per json"""
+    if isinstance(obj, pd.DataFrame):
+        return frame_to_split(obj) if orient == 'split' else frame_to_records(obj)
+    if isinstance(obj, dict):
+        return {key: to_serializable(value, orient) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [to_serializable(value, orient) for value in obj]
+    return obj
+
+
+def write_parquet(obj: Any, folder: str, prefix: str = '') -> List[str]:
+    """
+    Scrive ogni DataFrame contenuto in obj in un file Parquet il cui nome è il percorso
+    delle chiavi (es. financials_balance_sheet_tables.parquet). Richiede pyarrow.
+    """
+    os.makedirs(folder, exist_ok=True)
+    written = []
+    if isinstance(obj, pd.DataFrame):
+        # Parquet vuole colonne omogenee: le colonne miste (numeri e testo) diventano stringhe
+        mixed = {column: 'string' for column in obj.columns if obj[column].dtype == object}
+        path = os.path.join(folder, f"{prefix or 'table'}.parquet")
+        obj.astype(mixed).to_parquet(path, index=False)
+        written.append(path)
+    elif isinstance(obj, dict):
+        for key, value in obj.items():
+            written.extend(write_parquet(value, folder, f"{prefix}_{key}" if prefix else str(key)))
+    return written
+
+
+def financial_frames(doc: Dict) -> Dict[str, pd.DataFrame]:
+    """Tabelle della sezione financials di un documento SA (DataFrame o righe) come DataFrame"""
+    frames = {}
+    for page, content in (doc.get('data', {}).get('financials') or {}).items():
+        tables = content.get('tables') if isinstance(content, dict) else None
+        if isinstance(tables, pd.DataFrame):
+            frames[page] = tables
+        elif tables:
+            frames[page] = records_to_frame(tables)
+    return frames
+
+
+def main():
+    """
+    Esporta in Parquet le tabelle finanziarie di uno snapshot dello storico:
+
+        python src/columnar.py AAPL data/parquet --as-of 2025-06-30
+    """
+    from snapshot_store import SnapshotStore
+
+    parser = argparse.ArgumentParser(description='Tabelle finanziarie di uno snapshot in Parquet')
+    parser.add_argument('ticker')
+    parser.add_argument('folder', help='Cartella di destinazione')
+    parser.add_argument('--as-of', help='Data (YYYY-MM-DD) o data/ora ISO; default: ultimo snapshot')
+    parser.add_argument('--snapshots', default=os.environ.get('FINANZA_SNAPSHOT_DIR', 'data/snapshots'))
+    args = parser.parse_args()
+
+    store = SnapshotStore(args.snapshots)
+    doc = store.as_of(args.ticker, args.as_of) if args.as_of else store.latest(args.ticker)
+    if doc is None:
+        print(f"❌ Nessuno snapshot per {args.ticker.upper()}")
+        return
+    for path in write_parquet(financial_frames(doc), args.folder, prefix=doc['ticker']):
+        print(f"✅ {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlencode
+
+from cache_store import SingleFlight, SQLiteCache
+from http_client import HttpClient, http_client
+from rate_limiter import BACKGROUND, INTERACTIVE, PriorityLimiter
+
+logger = logging.getLogger(__name__)
+
+FINNHUB_URL = 'https://finnhub.io/api/v1'
+
+# TTL in secondi per endpoint: anagrafiche per giorni, dividendi giornalieri, consensi orari
+FINNHUB_TTLS = {
+    'stock/symbol': 60*60*24,
+    'stock/profile2': 60*60*24*3,
+    'stock/dividend': 60*60*24,
+    'stock/recommendation': 60*60,
+    'search': 60*60*24,
+    'quote': 15,
+}
+
+
+class FinnhubError(Exception):
+    """Errore della API Finnhub (quota, autenticazione, risposta non valida)"""
+
+
+class FinnhubProvider:
+    """
+    Client REST di Finnhub con quota e cache:
+    - un PriorityLimiter tarato sulla quota (`calls_per_minute`, con burst di `burst`
+      chiamate: in ogni finestra di 60 s non si superano mai le chiamate consentite) e le
+      richieste interattive servite prima dei refresh in background; con `bucket_path` il
+      secchio è in un file condiviso, così la quota vale per tutti i worker insieme e non
+      per ciascuno;
+    - risposte per endpoint con i TTL di FINNHUB_TTLS nella cache SQLite condivisa dai
+      worker (FINANZA_CACHE_PATH, la stessa del server); richieste concorrenti uguali con
+      la stessa priorità fanno una sola chiamata, così un'interattiva non attende in coda
+      dietro un refresh in background, e chi ottiene il token ricontrolla prima la cache;
+    - `base_url` configurabile, così un server locale può prendere il posto di Finnhub.
+    """
+    def __init__(self, api_key: str, base_url: str = FINNHUB_URL, calls_per_minute: int = 60,
+                 burst: int = 10, cache=None, http: Optional[HttpClient] = None,
+                 ttls: Optional[Dict[str, int]] = None, queue_timeout: float = 30.0,
+                 flight: Optional[SingleFlight] = None, bucket_path: Optional[str] = None):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        burst = max(1, min(burst, calls_per_minute - 1))
+        self.limiter = PriorityLimiter(rate=(calls_per_minute - burst) / 60.0, capacity=burst, path=bucket_path)
+        self.cache = cache if cache is not None else SQLiteCache(os.environ.get('FINANZA_CACHE_PATH', 'cache/finanza.db'))
+        # Ricontrolli senza statistiche, se il backend li offre
+        self.peek = getattr(self.cache, 'peek', self.cache.get)
+        self.http = http if http is not None else http_client
+        self.ttls = {**FINNHUB_TTLS, **(ttls or {})}
+        self.queue_timeout = queue_timeout
+        self.flight = flight or SingleFlight()
+        self.counters = {'calls': 0, 'hits': 0, 'errors': 0}
+
+    @classmethod
+    def from_env(cls, api_key: Optional[str] = None, **kwargs) -> 'FinnhubProvider':
+        """
+        Provider configurato dalle variabili FINANZA_FINNHUB_* (chiave, url, quota e burst);
+        la quota è condivisa dai processi tramite FINANZA_FINNHUB_BUCKET (default accanto
+        alla cache, FINANZA_CACHE_PATH)
+        """
+        env = os.environ.get
+        cache_dir = os.path.dirname(env('FINANZA_CACHE_PATH', 'cache/finanza.db')) or '.'
+        kwargs.setdefault('bucket_path', env('FINANZA_FINNHUB_BUCKET', os.path.join(cache_dir, 'finnhub.bucket')))
+        return cls(api_key or env('FINANZA_FINNHUB_KEY', ''), base_url=env('FINANZA_FINNHUB_URL', FINNHUB_URL),
+                   calls_per_minute=int(env('FINANZA_FINNHUB_RATE', '60')),
+                   burst=int(env('FINANZA_FINNHUB_BURST', '10')), **kwargs)
+
+    def _fresh(self, key: str, ttl: int, peek: bool = False) -> Any:
+        entry = (self.peek if peek else self.cache.get)(key)
+        if isinstance(entry, tuple) and len(entry) == 2 and time.time() - entry[0] < ttl:
+            return entry
+        return None
+
+    def get(self, endpoint: str, params: Dict[str, Any], priority: int = INTERACTIVE) -> Any:
+        """JSON di GET <base_url>/<endpoint>, dalla cache se più giovane del TTL dell'endpoint"""
+        ttl = self.ttls.get(endpoint, 60)
+        key = f"finnhub/{endpoint}?{urlencode(sorted(params.items()))}"
+        entry = self._fresh(key, ttl)
+        if entry is not None:
+            self.counters['hits'] += 1
+            return entry[1]
+
+        def fetch():
+            entry = self._fresh(key, ttl, peek=True)
+            if entry is not None:
+                return entry[1]
+            if not self.limiter.acquire(priority, timeout=self.queue_timeout):
+                raise FinnhubError(f"Quota Finnhub: {endpoint} in coda da oltre {self.queue_timeout:.0f}s")
+            # Mentre era in coda la risposta può averla salvata una chiamata di altra priorità
+            entry = self._fresh(key, ttl, peek=True)
+            if entry is not None:
+                return entry[1]
+            self.counters['calls'] += 1
+            response = self.http.get(f"{self.base_url}/{endpoint}", params=params,
+                                     headers={'X-Finnhub-Token': self.api_key})
+            if response.status_code >= 400:
+                self.counters['errors'] += 1
+                logger.warning(f"Finnhub {endpoint} {params}: HTTP {response.status_code}")
+                raise FinnhubError(f"Finnhub {endpoint}: HTTP {response.status_code}")
+            value = response.json()
+            self.cache.set(key, (time.time(), value), timeout=ttl)
+            return value
+
+        return self.flight.do(f"{key}#{priority}", fetch)
+
+    def stock_symbols(self, exchange: str = 'US', priority: int = BACKGROUND) -> List[Dict]:
+        return self.get('stock/symbol', {'exchange': exchange}, priority)
+
+    def symbol_lookup(self, query: str, priority: int = INTERACTIVE) -> Dict:
+        return self.get('search', {'q': query}, priority)
+
+    def company_profile(self, symbol: str, priority: int = INTERACTIVE) -> Dict:
+        return self.get('stock/profile2', {'symbol': symbol.upper()}, priority)
+
+    def recommendation_trends(self, symbol: str, priority: int = INTERACTIVE) -> List[Dict]:
+        return self.get('stock/recommendation', {'symbol': symbol.upper()}, priority)
+
+    def stock_dividends(self, symbol: str, _from: str, to: str, priority: int = INTERACTIVE) -> List[Dict]:
+        return self.get('stock/dividend', {'symbol': symbol.upper(), 'from': _from, 'to': to}, priority)
+
+    def quote(self, symbol: str, priority: int = INTERACTIVE) -> Dict:
+        return self.get('quote', {'symbol': symbol.upper()}, priority)
+
+    def stats(self) -> Dict[str, Any]:
+        return {'pending': self.limiter.pending(), 'interactive': self.limiter.counters[INTERACTIVE],
+                'background': self.limiter.counters[BACKGROUND], **self.counters}
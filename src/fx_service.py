@@ -0,0 +1,131 @@
+import logging
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import pandas as pd
+import yfinance as yf
+from flask_caching.backends import SimpleCache
+
+from cache_store import CachedValue, StaleWhileRevalidate
+from scraper_USD import USDEURScraperYF
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CURRENCIES = ('USD', 'EUR', 'GBP', 'CHF', 'JPY', 'CAD')
+
+# Simboli Yahoo delle coppie: 'USDEUR=X' (euro per 1 dollaro) o 'EUR=X' (stessa coppia, base USD)
+PAIR_RE = re.compile(r'^([A-Z]{3})?([A-Z]{3})=X$')
+
+
+class FxService:
+    """
+    Tassi di cambio tra `currencies`: si scaricano solo le coppie base (1 `base` in ogni
+    valuta) e l'intera matrice incrociata è calcolata in locale (inversi e triangolazioni
+    via la base). Le coppie base sono in cache stale-while-revalidate: scaduto il `ttl` si
+    serve il valore precedente e lo si aggiorna in background, quindi le conversioni non
+    attendono una chiamata live se non alla primissima lettura.
+    """
+    def __init__(self, base: str = 'USD', currencies: Iterable[str] = DEFAULT_CURRENCIES,
+                 ttl: int = 300, max_stale: int = 24 * 3600, swr: Optional[StaleWhileRevalidate] = None,
+                 download: Callable[..., pd.DataFrame] = yf.download):
+        self.base = base.upper()
+        self.currencies = list(dict.fromkeys([self.base] + [c.upper() for c in currencies]))
+        self.ttl = ttl
+        self.max_stale = max(ttl, max_stale)
+        self.swr = swr or StaleWhileRevalidate(SimpleCache())
+        self.download = download
+
+    def pair_symbol(self, currency: str) -> str:
+        return f"{self.base}{currency}=X"
+
+    def fetch_base_rates(self) -> Dict[str, float]:
+        """Unità di ogni valuta per 1 base: un solo download, USDEURScraperYF per le coppie mancanti"""
+        symbols = [self.pair_symbol(c) for c in self.currencies if c != self.base]
+        rates = {self.base: 1.0}
+        try:
+            frame = self.download(symbols, period='5d', interval='1d', group_by='ticker',
+                                  auto_adjust=False, progress=False, multi_level_index=True)
+        except Exception as e:
+            logger.warning(f"Download dei cambi non riuscito: {e}")
+            frame = None
+        for currency, symbol in zip([c for c in self.currencies if c != self.base], symbols):
+            rate = None
+            if (frame is not None and isinstance(frame.columns, pd.MultiIndex)
+                    and symbol in frame.columns.get_level_values(0)):
+                closes = frame[symbol]['Close'].dropna()
+                if not closes.empty:
+                    rate = float(closes.iloc[-1])
+            if rate is None:
+                # Una coppia che non si scarica resta fuori dalla matrice, le altre no
+                try:
+                    rate = USDEURScraperYF(symbol).get_rate()
+                except Exception as e:
+                    logger.warning(f"Cambio {symbol} non scaricato: {e}")
+            if rate:
+                rates[currency] = float(rate)
+            else:
+                logger.warning(f"Cambio {symbol} non disponibile")
+        return rates
+
+    def base_rates(self) -> CachedValue:
+        return self.swr.get(f'fx/{self.base}', self.fetch_base_rates, self.ttl, self.max_stale)
+
+    @staticmethod
+    def cross(base_rates: Dict[str, float], source: str, target: str) -> float:
+        """Unità di `target` per 1 `source`"""
+        return base_rates[target] / base_rates[source]
+
+    def matrix(self) -> Dict[str, Any]:
+        """Matrice completa {da: {a: tasso}} con età della quotazione"""
+        result = self.base_rates()
+        rates = result.value
+        return {
+            'base': self.base,
+            'age': int(result.age),
+            'pairs': {self.pair_symbol(c): rate for c, rate in rates.items() if c != self.base},
+            'rates': {a: {b: self.cross(rates, a, b) for b in rates} for a in rates}
+        }
+
+    def rate(self, source: str, target: str) -> float:
+        rates = self.base_rates().value
+        source, target = source.upper(), target.upper()
+        for currency in (source, target):
+            if currency not in rates:
+                raise KeyError(f"Valuta non supportata: {currency}")
+        return self.cross(rates, source, target)
+
+    def symbol_rate(self, symbol: str) -> Optional[float]:
+        """
+        Valore di /usd/<simbolo> (1 / prezzo Yahoo della coppia) calcolato dalla matrice:
+        USDEUR=X -> dollari per 1 euro; EUR=X è la coppia con base USD. None se non coperto.
+        """
+        match = PAIR_RE.match(symbol.upper())
+        if not match:
+            return None
+        source, target = match.group(1) or 'USD', match.group(2)
+        try:
+            return self.rate(target, source)
+        except KeyError:
+            return None
+
+    def convert(self, items: List[Dict[str, Any]], target: str) -> Dict[str, Any]:
+        """
+        Converte in `target` una lista di {'amount', 'currency'} con un solo snapshot dei
+        tassi; torna le voci con 'converted' e il totale.
+        """
+        rates = self.base_rates().value
+        target = target.upper()
+        if target not in rates:
+            raise KeyError(f"Valuta non supportata: {target}")
+        converted = []
+        total = 0.0
+        for item in items:
+            currency = str(item.get('currency', self.base)).upper()
+            if currency not in rates:
+                raise KeyError(f"Valuta non supportata: {currency}")
+            if item.get('amount') is None:
+                raise ValueError("Importo mancante")
+            value = float(item['amount']) * self.cross(rates, currency, target)
+            total += value
+            converted.append({**item, 'currency': currency, 'converted': value})
+        return {'currency': target, 'items': converted, 'total': total}
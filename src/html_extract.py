@@ -0,0 +1,195 @@
+import os
+from bs4 import BeautifulSoup, Tag
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+# Parser di default: lxml (C) se installato, altrimenti il parser pure-Python della stdlib.
+# FINANZA_HTML_PARSER=html.parser ripristina l'albero del vecchio parser anche su HTML malformato
+try:
+    import lxml  # noqa: F401
+    DEFAULT_PARSER = os.environ.get('FINANZA_HTML_PARSER', 'lxml')
+except ImportError:
+    DEFAULT_PARSER = os.environ.get('FINANZA_HTML_PARSER', 'html.parser')
+
+# Classi CSS cercate da scrape_key_statistics
+STAT_CONTAINER_CLASSES = {'stats-table', 'table'}
+STAT_DIV_CLASSES = {'stat', 'metric', 'data-point'}
+LABEL_CLASSES = {'label', 'stat-label', 'metric-label'}
+VALUE_CLASSES = {'value', 'stat-value', 'metric-value'}
+CELL_TAGS = ('td', 'th')
+
+
+def make_soup(content, parser: Optional[str] = None) -> BeautifulSoup:
+    """Crea il BeautifulSoup con il parser indicato (default: DEFAULT_PARSER)"""
+    return BeautifulSoup(content, parser or DEFAULT_PARSER)
+
+
+class _Node:
+    """Informazioni raccolte durante la visita per un elemento di interesse"""
+    __slots__ = ('tag', 'cells', 'rows', 'thead', 'tbody', 'label', 'value')
+
+    def __init__(self, tag: Tag):
+        self.tag = tag
+        self.cells: List[Tag] = []
+        self.rows: List['_Node'] = []
+        self.thead: Optional['_Node'] = None
+        self.tbody: Optional['_Node'] = None
+        self.label: Optional[Tag] = None
+        self.value: Optional[Tag] = None
+
+
+@dataclass
+class PageExtract:
+    tables: List[Dict] = field(default_factory=list)
+    metrics: Dict[str, Any] = field(default_factory=dict)
+
+
+class PageExtractor:
+    """
+    Estrae in una sola visita dell'albero le tabelle (come scrape_table), le statistiche
+    chiave/valore delle tabelle e dei div .stat/.metric/.data-point (come
+    scrape_key_statistics). Il testo di ogni cella è pulito e convertito una volta sola,
+    anche se la cella compare sia nelle tabelle sia nelle statistiche.
+    """
+    def __init__(self, clean_text: Callable[[str], str], parse_numbers: Callable[[List[str]], List[Any]]):
+        self.clean_text = clean_text
+        self.parse_numbers = parse_numbers
+
+    def extract(self, soup: BeautifulSoup) -> PageExtract:
+        tables, containers, stat_divs = self._walk(soup)
+        texts: Dict[int, str] = {}
+
+        def text(tag: Tag) -> str:
+            key = id(tag)
+            if key not in texts:
+                texts[key] = self.clean_text(tag.get_text())
+            return texts[key]
+
+        # Prima si raccolgono chiavi e testi, poi tutti i valori della pagina sono
+        # convertiti in un colpo solo da parse_numbers
+        table_rows: List[List[tuple]] = []
+        metric_items: List[tuple] = []
+
+        # Tabelle: headers dal primo thead, righe dal primo tbody (o dall'intera tabella)
+        for table in tables:
+            headers = [text(cell) for cell in table.thead.cells] if table.thead else []
+            body = table.tbody or table
+            for row in body.rows:
+                if len(row.cells) > 0:
+                    table_rows.append([(headers[i] if i < len(headers) else f"col_{i}", text(cell))
+                                       for i, cell in enumerate(row.cells)])
+
+        # Statistiche dalle righe con almeno due celle
+        for container in containers:
+            for row in container.rows:
+                if len(row.cells) >= 2:
+                    key = text(row.cells[0])
+                    value = text(row.cells[1])
+                    if key and value:
+                        metric_items.append((key, value))
+
+        # Statistiche dai div con label e value
+        for div in stat_divs:
+            if div.label and div.value:
+                key = self.clean_text(div.label.get_text())
+                val = self.clean_text(div.value.get_text())
+                if key and val:
+                    metric_items.append((key, val))
+
+        values = [value for row in table_rows for _, value in row] + [value for _, value in metric_items]
+        numbers = dict(zip(values, self.parse_numbers(values)))
+
+        result = PageExtract()
+        for row in table_rows:
+            row_data = {}
+            for key, value in row:
+                row_data[key] = numbers[value]
+            if row_data:
+                result.tables.append(row_data)
+        for key, value in metric_items:
+            result.metrics[key] = numbers[value]
+        return result
+
+    def _walk(self, soup: BeautifulSoup):
+        """
+        Visita in pre-ordine con stack degli antenati aperti per ruolo: ogni tr, cella,
+        thead/tbody, label e value viene assegnato agli antenati che lo raccoglierebbero
+        con find/find_all/select_one.
+        """
+        tables: List[_Node] = []
+        containers: List[_Node] = []
+        stat_divs: List[_Node] = []
+        open_tables: List[_Node] = []
+        open_row_owners: List[_Node] = []
+        open_cell_owners: List[_Node] = []
+        open_stat_divs: List[_Node] = []
+
+        stack: List[Any] = [iter(soup.children)]
+        pops: List[List[List[_Node]]] = [[]]
+        while stack:
+            child = next(stack[-1], None)
+            if child is None:
+                stack.pop()
+                for opened in pops.pop():
+                    opened.pop()
+                continue
+            if not isinstance(child, Tag):
+                continue
+
+            name = child.name
+            classes = child.get('class') or ()
+            opened: List[List[_Node]] = []
+
+            if name == 'tr':
+                row = _Node(child)
+                for owner in open_row_owners:
+                    owner.rows.append(row)
+                open_cell_owners.append(row)
+                opened.append(open_cell_owners)
+            elif name in CELL_TAGS:
+                for owner in open_cell_owners:
+                    owner.cells.append(child)
+            elif name == 'thead':
+                thead = _Node(child)
+                for table in open_tables:
+                    if table.thead is None:
+                        table.thead = thead
+                open_cell_owners.append(thead)
+                opened.append(open_cell_owners)
+            elif name == 'tbody':
+                tbody = _Node(child)
+                for table in open_tables:
+                    if table.tbody is None:
+                        table.tbody = tbody
+                open_row_owners.append(tbody)
+                opened.append(open_row_owners)
+
+            if classes:
+                if open_stat_divs and not LABEL_CLASSES.isdisjoint(classes):
+                    for div in open_stat_divs:
+                        if div.label is None:
+                            div.label = child
+                if open_stat_divs and not VALUE_CLASSES.isdisjoint(classes):
+                    for div in open_stat_divs:
+                        if div.value is None:
+                            div.value = child
+
+            if name == 'table' or (classes and not STAT_CONTAINER_CLASSES.isdisjoint(classes)):
+                container = _Node(child)
+                containers.append(container)
+                open_row_owners.append(container)
+                opened.append(open_row_owners)
+                if name == 'table':
+                    tables.append(container)
+                    open_tables.append(container)
+                    opened.append(open_tables)
+            if classes and not STAT_DIV_CLASSES.isdisjoint(classes):
+                div = _Node(child)
+                stat_divs.append(div)
+                open_stat_divs.append(div)
+                opened.append(open_stat_divs)
+
+            stack.append(iter(child.children))
+            pops.append(opened)
+
+        return tables, containers, stat_divs
@@ -0,0 +1,192 @@
+import hashlib
+import logging
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Risposte per cui si ritenta: troppe richieste ed errori temporanei del server
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+Timeout = Union[float, Tuple[float, float]]
+
+
+class HttpClient:
+    """
+    Client HTTP condiviso dal processo: una sola requests.Session con pool di connessioni
+    keep-alive limitato (`pool_connections` host, `pool_maxsize` connessioni per host),
+    timeout di default, retry con backoff esponenziale e jitter su 429/5xx ed errori di
+    rete (rispettando Retry-After) e al massimo `per_host` richieste contemporanee per host.
+    """
+    def __init__(self, pool_connections: int = 10, pool_maxsize: int = 20, timeout: Timeout = (5.0, 30.0),
+                 retries: int = 3, backoff: float = 0.5, max_backoff: float = 30.0, per_host: int = 4):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.per_host = per_host
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                              max_retries=0, pool_block=True)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.hosts: Dict[str, threading.BoundedSemaphore] = {}
+        self.lock = threading.Lock()
+        self.counters = {'requests': 0, 'retries': 0, 'failures': 0}
+        self.counters_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'HttpClient':
+        """Client configurato dalle variabili FINANZA_HTTP_*"""
+        env = os.environ.get
+        return cls(pool_maxsize=int(env('FINANZA_HTTP_POOL', '20')),
+                   timeout=(float(env('FINANZA_HTTP_CONNECT_TIMEOUT', '5')), float(env('FINANZA_HTTP_TIMEOUT', '30'))),
+                   retries=int(env('FINANZA_HTTP_RETRIES', '3')),
+                   backoff=float(env('FINANZA_HTTP_BACKOFF', '0.5')),
+                   per_host=int(env('FINANZA_HTTP_PER_HOST', '4')))
+
+    def _count(self, name: str):
+        with self.counters_lock:
+            self.counters[name] += 1
+
+    def host_slots(self, url: str) -> threading.BoundedSemaphore:
+        host = urlparse(url).hostname or ''
+        with self.lock:
+            slots = self.hosts.get(host)
+            if slots is None:
+                slots = self.hosts[host] = threading.BoundedSemaphore(self.per_host)
+            return slots
+
+    def delay(self, attempt: int, response: Optional[requests.Response] = None) -> float:
+        """Attesa prima del tentativo successivo: Retry-After se presente, altrimenti full jitter"""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                return min(float(retry_after), self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Esegue la richiesta con retry; torna l'ultima risposta (anche di errore, il chiamante
+        usa raise_for_status) o solleva l'ultima eccezione di rete.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        slots = self.host_slots(url)
+        attempt = 0
+        while True:
+            with slots:
+                self._count('requests')
+                try:
+                    response = self.session.request(method, url, **kwargs)
+                    error = None
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    response, error = None, e
+            if error is None and response.status_code not in RETRY_STATUSES:
+                return response
+            if attempt >= self.retries:
+                self._count('failures')
+                if error is not None:
+                    raise error
+                return response
+            wait = self.delay(attempt, response)
+            reason = error if error is not None else f"HTTP {response.status_code}"
+            logger.warning(f"{method} {url}: {reason}, nuovo tentativo tra {wait:.2f}s")
+            self._count('retries')
+            attempt += 1
+            time.sleep(wait)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def stats(self) -> Dict[str, int]:
+        with self.counters_lock:
+            return dict(self.counters)
+
+
+@dataclass
+class _Cached:
+    etag: Optional[str]
+    last_modified: Optional[str]
+    digest: str
+    value: Any
+
+
+class ConditionalCache:
+    """
+    Cache LRU (al massimo `max_entries` url) per GET condizionali: per ogni url tiene i
+    validatori (ETag, Last-Modified), l'hash del body e il valore già elaborato. La richiesta
+    porta If-None-Match/If-Modified-Since dell'ultima risposta; con 304, o con un body
+    identico (stesso hash) se il server non supporta i validatori, si riusa il valore senza
+    chiamare `parse`. `parse` dovrebbe tornare dati compatti (non l'albero HTML), che
+    restano in memoria per ogni voce. Con max_entries=0 non memorizza nulla.
+    """
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self.entries: 'OrderedDict[Any, _Cached]' = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = {'fetches': 0, 'not_modified': 0, 'unchanged': 0, 'parsed': 0}
+
+    def _get(self, key: Any) -> Optional[_Cached]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def _count(self, name: str):
+        with self.lock:
+            self.counters[name] += 1
+
+    def _put(self, key: Any, entry: _Cached):
+        if self.max_entries <= 0:
+            return
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def fetch(self, client: 'HttpClient', url: str, parse: Callable[[bytes], Any],
+              key: Any = None, headers: Optional[Dict[str, str]] = None, **kwargs) -> Any:
+        """GET condizionale di url; torna parse(body) o il valore in cache se invariato"""
+        key = url if key is None else key
+        entry = self._get(key)
+        headers = dict(headers or {})
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+        self._count('fetches')
+        response = client.get(url, headers=headers, **kwargs)
+        if response.status_code == 304 and entry is not None:
+            self._count('not_modified')
+            return entry.value
+        response.raise_for_status()
+        digest = hashlib.sha1(response.content).hexdigest()
+        etag, last_modified = response.headers.get('ETag'), response.headers.get('Last-Modified')
+        if entry is not None and entry.digest == digest:
+            self._count('unchanged')
+            self._put(key, _Cached(etag, last_modified, digest, entry.value))
+            return entry.value
+        value = parse(response.content)
+        self._count('parsed')
+        self._put(key, _Cached(etag, last_modified, digest, value))
+        return value
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {'entries': len(self.entries), **self.counters}
+
+
+# Client di default condiviso da tutti gli scraper del processo
+http_client = HttpClient.from_env()
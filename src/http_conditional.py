@@ -0,0 +1,59 @@
+import gzip
+import logging
+from datetime import datetime, timedelta, timezone
+
+from flask import Flask, Response, request
+
+try:
+    import brotli
+except ImportError:  # brotli è opzionale: senza, si comprime solo in gzip
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+
+def _encoding() -> str:
+    """Codifica preferita tra quelle accettate dal client ('' se nessuna)"""
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return ''
+
+
+def init_conditional(app: Flask, prefix: str = '/api/finanza', min_size: int = 500, level: int = 5):
+    """
+    Risposte condizionali e compresse per le GET JSON sotto `prefix`:
+    - ETag debole sul body non compresso e Last-Modified ricavato dall'header Age della
+      cache, così If-None-Match/If-Modified-Since ricevono 304 senza body;
+    - Cache-Control no-cache: il browser tiene la risposta ma la rivalida sempre;
+    - body da `min_size` byte in su compressi in br (se installato) o gzip.
+    Gli stream (SSE) e le risposte non JSON restano invariati.
+    """
+    @app.after_request
+    def conditional_response(response: Response) -> Response:
+        if (request.method not in ('GET', 'HEAD') or not request.path.startswith(prefix)
+                or response.status_code != 200 or response.is_streamed
+                or response.mimetype != 'application/json'):
+            return response
+        age = response.headers.get('Age', '')
+        if age.isdigit():
+            response.last_modified = datetime.now(timezone.utc) - timedelta(seconds=int(age))
+        response.cache_control.no_cache = True
+        response.add_etag(weak=True)
+        response.make_conditional(request)
+        if response.status_code == 304:
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = _encoding()
+        data = response.get_data()
+        if not encoding or len(data) < min_size:
+            return response
+        if encoding == 'br':
+            response.set_data(brotli.compress(data, quality=level))
+        else:
+            response.set_data(gzip.compress(data, compresslevel=level))
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,172 @@
+"""
+Indice ISIN -> ticker su file: tabella ordinata di record a larghezza fissa letta via mmap,
+quindi l'avvio non fa parsing e la memoria resta piatta anche con centinaia di migliaia
+di ISIN (le pagine del file sono caricate dal sistema operativo solo quando servono).
+
+    python src/isin_index.py build riferimento.csv data/isin.idx
+    python src/isin_index.py lookup data/isin.idx US0378331005 IE00BYTBXV33
+
+Il dump di riferimento è un CSV con colonne isin e ticker (o symbol), oppure un JSON
+{isin: ticker} o [{"isin": ..., "ticker": ...}].
+"""
+import argparse
+import csv
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ISIN_RE = re.compile(r'^[A-Z]{2}[A-Z0-9]{9}[0-9]$')
+
+# Header: magic, versione, larghezza del ticker, numero di record
+MAGIC = b'ISNX'
+HEADER = struct.Struct('<4sHHI')
+ISIN_WIDTH = 12
+TICKER_WIDTH = 20
+
+
+# Lettere -> due cifre (A=10 ... Z=35) e somma delle cifre del doppio di ogni cifra (Luhn)
+_EXPAND = str.maketrans({chr(ord('A') + i): str(10 + i) for i in range(26)})
+_DOUBLED = {str(d): (2 * d) // 10 + (2 * d) % 10 for d in range(10)}
+
+
+def is_valid_isin(isin: str) -> bool:
+    """Formato (paese, 9 alfanumerici, cifra di controllo) e checksum Luhn sulle cifre espanse"""
+    if not ISIN_RE.match(isin):
+        return False
+    digits = isin.translate(_EXPAND)
+    # Da destra: cifre in posizione pari così come sono, in posizione dispari raddoppiate
+    total = sum(map(int, digits[-1::-2])) + sum(_DOUBLED[d] for d in digits[-2::-2])
+    return total % 10 == 0
+
+
+def normalize(isin: str) -> str:
+    return isin.strip().upper()
+
+
+def read_reference(path: str) -> Iterator[Tuple[str, str]]:
+    """Coppie (isin, ticker) dal dump di riferimento CSV o JSON"""
+    if path.lower().endswith('.json'):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            yield from data.items()
+        else:
+            for row in data:
+                yield row.get('isin', ''), row.get('ticker') or row.get('symbol') or ''
+        return
+    with open(path, encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            row = {(k or '').strip().lower(): (v or '') for k, v in row.items()}
+            yield row.get('isin', ''), row.get('ticker') or row.get('symbol') or ''
+
+
+def build_index(pairs: Iterable[Tuple[str, str]], output: str) -> Dict[str, int]:
+    """
+    Scrive l'indice ordinato in `output` (rename atomico). Gli ISIN non validi, i ticker
+    vuoti o troppo lunghi sono scartati; per gli ISIN ripetuti vale la prima occorrenza.
+    """
+    table: Dict[bytes, bytes] = {}
+    skipped = 0
+    for isin, ticker in pairs:
+        isin, ticker = normalize(isin), ticker.strip().upper()
+        encoded = ticker.encode('ascii', 'ignore')
+        if not is_valid_isin(isin) or not encoded or len(encoded) > TICKER_WIDTH:
+            skipped += 1
+            continue
+        table.setdefault(isin.encode('ascii'), encoded)
+
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    tmp = f"{output}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, 1, TICKER_WIDTH, len(table)))
+        for isin in sorted(table):
+            f.write(isin + table[isin].ljust(TICKER_WIDTH, b'\0'))
+    os.replace(tmp, output)
+    logger.info(f"Indice ISIN {output}: {len(table)} voci, {skipped} scartate")
+    return {'entries': len(table), 'skipped': skipped}
+
+
+class IsinIndex:
+    """Ricerca binaria sui record dell'indice mappato in memoria (sola lettura, thread-safe)"""
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, width, self.count = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != 1:
+            raise ValueError(f"{path} non è un indice ISIN")
+        self.ticker_width = width
+        self.record = ISIN_WIDTH + width
+        if len(self.mm) < HEADER.size + self.count * self.record:
+            raise ValueError(f"Indice ISIN {path} troncato")
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _find(self, key: bytes) -> Optional[str]:
+        mm, record, base = self.mm, self.record, HEADER.size
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = base + mid * record
+            current = mm[offset:offset + ISIN_WIDTH]
+            if current < key:
+                lo = mid + 1
+            elif current > key:
+                hi = mid
+            else:
+                return mm[offset + ISIN_WIDTH:offset + record].rstrip(b'\0').decode('ascii')
+        return None
+
+    def lookup(self, isin: str) -> Optional[str]:
+        """Ticker dell'ISIN; None se non presente. ValueError se l'ISIN non è valido"""
+        isin = normalize(isin)
+        if not is_valid_isin(isin):
+            raise ValueError(f"ISIN non valido: {isin}")
+        return self._find(isin.encode('ascii'))
+
+    def lookup_many(self, isins: Iterable[str]) -> Dict[str, Optional[str]]:
+        """Ticker (o None) per ogni ISIN valido; gli ISIN non validi sono esclusi"""
+        ret: Dict[str, Optional[str]] = {}
+        for isin in isins:
+            isin = normalize(isin)
+            if isin not in ret and is_valid_isin(isin):
+                ret[isin] = self._find(isin.encode('ascii'))
+        return ret
+
+    def close(self):
+        self.mm.close()
+        self.file.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Indice ISIN -> ticker')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help='Costruisce l\'indice da un dump CSV/JSON')
+    build.add_argument('source')
+    build.add_argument('output')
+    lookup = commands.add_parser('lookup', help='Cerca uno o più ISIN')
+    lookup.add_argument('index')
+    lookup.add_argument('isins', nargs='+')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        result = build_index(read_reference(args.source), args.output)
+        print(f"✅ {result['entries']} ISIN indicizzati in {args.output} ({result['skipped']} scartati)")
+        return
+    index = IsinIndex(args.index)
+    for isin in args.isins:
+        try:
+            print(f"{isin}: {index.lookup(isin) or '-'}")
+        except ValueError as e:
+            print(f"⚠️ {e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Colonne delle posizioni in risposta (formato split: header una sola volta)
+POSITION_COLUMNS = ('symbol', 'quantity', 'cost', 'currency', 'price', 'market_value', 'cost_basis',
+                    'pnl', 'pnl_pct', 'annual_dividend', 'yield_on_cost', 'current_yield', 'weight',
+                    'market_value_target')
+
+
+# Valute in sottounità quotate da Yahoo (pence, cent, agorot): valuta principale e divisore
+SUBUNITS = {
+    'GBp': ('GBP', 100.0), 'GBX': ('GBP', 100.0),
+    'ZAc': ('ZAR', 100.0), 'ZAC': ('ZAR', 100.0),
+    'ILA': ('ILS', 100.0),
+}
+
+
+def main_currency(currency: str) -> Tuple[str, float]:
+    """Valuta principale e divisore di una valuta di quotazione (es. 'GBp' -> ('GBP', 100))"""
+    if currency in SUBUNITS:
+        return SUBUNITS[currency]
+    return currency.upper(), 1.0
+
+
+def annual_dividend_per_share(quote: Dict) -> float:
+    """Dividendo annuo per azione: dividendRate, altrimenti l'ultimo dividendo (mensile) x 12"""
+    rate = quote.get('dividendRate')
+    if rate:
+        return float(rate)
+    last = quote.get('lastDividendValue')
+    return float(last) * 12 if last else 0.0
+
+
+def _ratio(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+    out = np.full_like(num, np.nan, dtype=float)
+    np.divide(num, den, out=out, where=den != 0)
+    return out
+
+
+def _clean(value: Any) -> Any:
+    """float NaN -> None per il JSON"""
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+def _rate(rate: Callable[[str, str], float], source: str, target: str) -> float:
+    """Cambio da source a target; NaN se una delle due valute non è supportata"""
+    if source == target:
+        return 1.0
+    try:
+        return float(rate(source, target))
+    except KeyError:
+        return np.nan
+
+
+def _totals(market_value: float, cost_basis: float, annual_dividend: float) -> Dict[str, Optional[float]]:
+    pnl = market_value - cost_basis
+    return {
+        'market_value': market_value,
+        'cost_basis': cost_basis,
+        'pnl': pnl,
+        'pnl_pct': pnl / cost_basis * 100 if cost_basis else None,
+        'annual_dividend': annual_dividend,
+        'monthly_dividend': annual_dividend / 12,
+        'yield_on_cost': annual_dividend / cost_basis * 100 if cost_basis else None,
+        'current_yield': annual_dividend / market_value * 100 if market_value else None
+    }
+
+
+def value_portfolio(holdings: List[Dict], quotes: Dict[str, Dict], rate: Callable[[str, str], float],
+                    base: str = 'USD', target: str = 'EUR') -> Dict[str, Any]:
+    """
+    Valutazione del portafoglio con array NumPy: valore di mercato, P&L, dividendo annuo,
+    yield on cost e rendimento corrente per posizione e in totale, nelle valute `base` e
+    `target`. `holdings`: [{'symbol', 'quantity', 'cost'}] con il costo per azione nella
+    valuta del titolo; `quotes`: quotazioni compatte per simbolo; `rate(da, a)`: cambio.
+    Prezzi e costi in sottounità (es. GBp, pence) sono riportati alla valuta principale.
+    Le posizioni senza quotazione o in una valuta senza cambio sono riportate in 'missing'
+    ed escluse dai totali; una valuta `target` non supportata solleva KeyError.
+    """
+    rate(target, base)
+    symbols = [str(h['symbol']).upper() for h in holdings]
+    held = [main_currency(str(h.get('currency') or quotes.get(s, {}).get('currency') or base))
+            for h, s in zip(holdings, symbols)]
+    # Il prezzo è nell'unità della quotazione (es. pence anche se la posizione indica GBP)
+    quoted = [main_currency(str(quotes[s]['currency'])) if quotes.get(s, {}).get('currency') else unit
+              for s, unit in zip(symbols, held)]
+    quantity = np.array([float(h.get('quantity') or 0) for h in holdings], dtype=float)
+    cost = np.array([float(h.get('cost') or 0) / unit for h, (_, unit) in zip(holdings, held)], dtype=float)
+    price = np.array([float(quotes.get(s, {}).get('currentPrice') or np.nan) / unit
+                      for s, (_, unit) in zip(symbols, quoted)], dtype=float)
+    dividend = np.array([annual_dividend_per_share(quotes.get(s, {})) / unit
+                         for s, (_, unit) in zip(symbols, quoted)], dtype=float)
+    currencies = [currency for currency, _ in held]
+
+    # Un cambio per valuta distinta, poi broadcast sulle posizioni (NaN se non supportata)
+    to_base = {c: _rate(rate, c, base) for c in set(currencies)}
+    to_target = {c: _rate(rate, c, target) for c in set(currencies)}
+    fx_base = np.array([to_base[c] for c in currencies], dtype=float)
+    fx_target = np.array([to_target[c] for c in currencies], dtype=float)
+
+    valid = ~np.isnan(price) & ~np.isnan(fx_base) & ~np.isnan(fx_target)
+    market_value = quantity * price
+    cost_basis = quantity * cost
+    pnl = market_value - cost_basis
+    annual_dividend = quantity * dividend
+    market_value_base = np.where(valid, market_value * fx_base, 0.0)
+    total_base = market_value_base.sum()
+
+    positions = np.column_stack([
+        quantity, cost, price, market_value, cost_basis, pnl,
+        _ratio(pnl, cost_basis) * 100, annual_dividend,
+        _ratio(annual_dividend, cost_basis) * 100, _ratio(annual_dividend, market_value) * 100,
+        market_value_base / total_base * 100 if total_base else np.full_like(price, np.nan),
+        market_value * fx_target
+    ])
+
+    def totals(fx: np.ndarray) -> Dict[str, Optional[float]]:
+        return {key: _clean(value) for key, value in _totals(
+            float((market_value * fx)[valid].sum()),
+            float((cost_basis * fx)[valid].sum()),
+            float((annual_dividend * fx)[valid].sum())).items()}
+
+    rows = []
+    for symbol, currency, values in zip(symbols, currencies, positions.tolist()):
+        values = [_clean(v) for v in values]
+        rows.append([symbol, values[0], values[1], currency] + values[2:])
+
+    return {
+        'currency': target,
+        'fx': {c: _clean(to_target[c]) for c in sorted(to_target)},
+        'totals': {base: totals(fx_base), target: totals(fx_target)},
+        'positions': {'columns': list(POSITION_COLUMNS), 'data': rows},
+        'missing': [s for s, ok in zip(symbols, valid.tolist()) if not ok]
+    }
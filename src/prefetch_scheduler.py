@@ -0,0 +1,290 @@
+import heapq
+import logging
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from datetime import time as dtime
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+try:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+    try:
+        NEW_YORK = ZoneInfo('America/New_York')
+    except ZoneInfoNotFoundError:  # Windows senza il pacchetto tzdata
+        NEW_YORK = timezone(timedelta(hours=-5))
+except ImportError:
+    NEW_YORK = timezone(timedelta(hours=-5))
+
+logger = logging.getLogger(__name__)
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """n-esimo giorno della settimana del mese (n=-1: l'ultimo)"""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year, month + 1, 1) - timedelta(days=1) if month < 12 else date(year, 12, 31)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _easter(year: int) -> date:
+    """Domenica di Pasqua (algoritmo gregoriano anonimo)"""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month = (h + l - 7 * m + 114) // 31
+    day = (h + l - 7 * m + 114) % 31 + 1
+    return date(year, month, day)
+
+
+def _observed(day: date) -> date:
+    """Festività di sabato osservata il venerdì, di domenica il lunedì"""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+def nyse_holidays(year: int) -> Set[date]:
+    """Giorni di chiusura NYSE dell'anno (regole correnti, senza chiusure straordinarie)"""
+    holidays = {
+        _nth_weekday(year, 1, 0, 3),    # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),    # Presidents' Day
+        _easter(year) - timedelta(days=2),  # Good Friday
+        _nth_weekday(year, 5, 0, -1),   # Memorial Day
+        _observed(date(year, 7, 4)),    # Independence Day
+        _nth_weekday(year, 9, 0, 1),    # Labor Day
+        _nth_weekday(year, 11, 3, 4),   # Thanksgiving
+        _observed(date(year, 12, 25)),  # Christmas
+    }
+    # Capodanno di sabato non si osserva il venerdì precedente (31 dicembre)
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        holidays.add(_observed(new_year))
+    if year >= 2022:
+        holidays.add(_observed(date(year, 6, 19)))  # Juneteenth
+    return holidays
+
+
+class MarketCalendar:
+    """
+    Orari della borsa (default NYSE 9:30-16:00 ora di New York), weekend e festività.
+    `lead` minuti prima dell'apertura contano già come apertura, così la cache è calda
+    per le prime richieste della giornata.
+    """
+    def __init__(self, tz=NEW_YORK, open_time: dtime = dtime(9, 30), close_time: dtime = dtime(16, 0),
+                 lead: int = 30, extra_holidays: Optional[Set[date]] = None):
+        self.tz = tz
+        self.open_time = open_time
+        self.close_time = close_time
+        self.lead = timedelta(minutes=lead)
+        self.extra_holidays = extra_holidays or set()
+        self.holidays: Dict[int, Set[date]] = {}
+
+    def is_trading_day(self, day: date) -> bool:
+        if day.weekday() >= 5 or day in self.extra_holidays:
+            return False
+        if day.year not in self.holidays:
+            self.holidays[day.year] = nyse_holidays(day.year)
+        return day not in self.holidays[day.year]
+
+    def is_open(self, ts: Optional[float] = None) -> bool:
+        now = datetime.fromtimestamp(time.time() if ts is None else ts, self.tz)
+        if not self.is_trading_day(now.date()):
+            return False
+        opens = datetime.combine(now.date(), self.open_time, self.tz) - self.lead
+        closes = datetime.combine(now.date(), self.close_time, self.tz)
+        return opens <= now < closes
+
+    def session(self, ts: Optional[float] = None) -> str:
+        """
+        'open' in orario di borsa (lead compreso, anche il lunedì mattina), 'weekend' il
+        sabato e la domenica, 'holiday' nelle festività infrasettimanali, 'closed' altrimenti
+        """
+        now = datetime.fromtimestamp(time.time() if ts is None else ts, self.tz)
+        if self.is_open(ts):
+            return 'open'
+        if now.weekday() >= 5:
+            return 'weekend'
+        if not self.is_trading_day(now.date()):
+            return 'holiday'
+        return 'closed'
+
+
+class WatchRegistry:
+    """
+    Simboli da tenere caldi in cache: quelli del file di configurazione (uno o più per riga,
+    '#' per i commenti, riletto quando cambia) e quelli usati dalle API negli ultimi
+    `idle_ttl` secondi.
+    """
+    def __init__(self, path: Optional[str] = None, idle_ttl: float = 7 * 24 * 3600):
+        self.path = path
+        self.idle_ttl = idle_ttl
+        self.used: Dict[str, float] = {}
+        self.configured: Set[str] = set()
+        self.mtime: Optional[float] = None
+        self.lock = threading.Lock()
+        self.reload()
+
+    def reload(self):
+        """Rilegge il file di configurazione se è cambiato"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        mtime = os.path.getmtime(self.path)
+        if mtime == self.mtime:
+            return
+        symbols = set()
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                symbols.update(s.upper() for s in re.split(r'[\s,;]+', line.split('#', 1)[0]) if s)
+        with self.lock:
+            self.configured = symbols
+            self.mtime = mtime
+        logger.info(f"Watchlist {self.path}: {len(symbols)} simboli")
+
+    def touch(self, symbol: str):
+        """Segna il simbolo come usato adesso"""
+        with self.lock:
+            self.used[symbol.upper()] = time.time()
+
+    def symbols(self) -> Set[str]:
+        now = time.time()
+        with self.lock:
+            for symbol in [s for s, seen in self.used.items() if now - seen > self.idle_ttl]:
+                del self.used[symbol]
+            return self.configured | set(self.used)
+
+
+@dataclass
+class PrefetchJob:
+    """
+    Un tipo di dato da tenere caldo e ogni quanto aggiornarlo (secondi; None = mai) per
+    sessione: weekend e festività di default sono in pausa. `max_interval` limita l'intervallo dopo il jitter (es. sotto il max stale
+    della cache, così la voce non scade mai tra due aggiornamenti).
+    """
+    name: str
+    refresh: Callable[[str], Any]
+    open_interval: Optional[float]
+    closed_interval: Optional[float] = None
+    holiday_interval: Optional[float] = None
+    weekend_interval: Optional[float] = None
+    max_interval: Optional[float] = None
+
+    def interval(self, session: str) -> Optional[float]:
+        return {'open': self.open_interval, 'closed': self.closed_interval,
+                'holiday': self.holiday_interval, 'weekend': self.weekend_interval}[session]
+
+
+class PrefetchScheduler:
+    """
+    Thread che aggiorna in background i job per ogni simbolo della watchlist. Ogni coppia
+    (job, simbolo) ha la sua scadenza: alla prima comparsa è sfasata a caso nell'intervallo
+    e ogni nuova scadenza ha un jitter di ±`jitter`, così gli aggiornamenti non arrivano a
+    raffica. I refresh sono bloccanti: al più `max_workers` in corso e uno per coppia
+    (job, simbolo), il giro successivo è saltato se il precedente non è finito. Fuori
+    sessione i job senza intervallo restano in pausa e sono ricontrollati ogni `idle_check`
+    secondi.
+    """
+    def __init__(self, registry: WatchRegistry, jobs: List[PrefetchJob],
+                 calendar: Optional[MarketCalendar] = None, max_workers: int = 2,
+                 jitter: float = 0.2, idle_check: float = 600.0):
+        self.registry = registry
+        self.jobs = {job.name: job for job in jobs}
+        self.calendar = calendar or MarketCalendar()
+        self.jitter = jitter
+        self.idle_check = idle_check
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='prefetch')
+        self.queue: List[Tuple[float, str, str]] = []
+        self.scheduled: Set[Tuple[str, str]] = set()
+        self.running: Set[Tuple[str, str]] = set()
+        self.counters = {'runs': 0, 'errors': 0, 'skipped': 0}
+        self.lock = threading.Lock()
+        self.stop = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name='prefetch-scheduler', daemon=True)
+            self.thread.start()
+
+    def _spread(self, job: PrefetchJob, interval: float) -> float:
+        spread = interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+        return min(spread, job.max_interval) if job.max_interval else spread
+
+    def _schedule_new(self, session: str):
+        """Accoda i simboli nuovi della watchlist con uno sfasamento casuale"""
+        now = time.time()
+        for symbol in self.registry.symbols():
+            for name, job in self.jobs.items():
+                if (name, symbol) in self.scheduled:
+                    continue
+                interval = job.interval(session)
+                delay = random.uniform(0, min(interval, 60.0)) if interval else self.idle_check
+                heapq.heappush(self.queue, (now + delay, name, symbol))
+                self.scheduled.add((name, symbol))
+
+    def _run(self):
+        while not self.stop.is_set():
+            self.registry.reload()
+            session = self.calendar.session()
+            self._schedule_new(session)
+            watched = self.registry.symbols()
+            now = time.time()
+            while self.queue and self.queue[0][0] <= now:
+                _, name, symbol = heapq.heappop(self.queue)
+                if symbol not in watched:
+                    self.scheduled.discard((name, symbol))
+                    continue
+                interval = self.jobs[name].interval(session)
+                if interval is None:
+                    heapq.heappush(self.queue, (now + self.idle_check, name, symbol))
+                    continue
+                self._submit(name, symbol)
+                heapq.heappush(self.queue, (now + self._spread(self.jobs[name], interval), name, symbol))
+            wait = self.queue[0][0] - time.time() if self.queue else self.idle_check
+            self.stop.wait(min(max(wait, 0.5), 30.0))
+
+    def _submit(self, name: str, symbol: str):
+        with self.lock:
+            if (name, symbol) in self.running:
+                # Il giro precedente non è ancora finito: niente accodamenti
+                self.counters['skipped'] += 1
+                return
+            self.running.add((name, symbol))
+        self.executor.submit(self._refresh, name, symbol)
+
+    def _refresh(self, name: str, symbol: str):
+        try:
+            self.jobs[name].refresh(symbol)
+            error = 0
+        except Exception as e:
+            error = 1
+            logger.error(f"Errore nel prefetch {name} di {symbol}: {e}")
+        with self.lock:
+            self.running.discard((name, symbol))
+            self.counters['runs'] += 1
+            self.counters['errors'] += error
+
+    def stats(self) -> Dict[str, Any]:
+        """Sessione di borsa, simboli seguiti, prossime scadenze e contatori"""
+        with self.lock:
+            counters = dict(self.counters)
+        upcoming = sorted(self.queue)[:10]
+        return {
+            'session': self.calendar.session(),
+            'symbols': sorted(self.registry.symbols()),
+            'next': [{'job': name, 'symbol': symbol, 'in_s': round(due - time.time(), 1)}
+                     for due, name, symbol in upcoming],
+            **counters
+        }
@@ -0,0 +1,48 @@
+from typing import Any, Dict, List
+
+# Valore assente (None è un valore valido nei documenti)
+MISSING = object()
+
+
+def parse_fields(raw: str) -> List[str]:
+    """
+    Path puntati separati da virgola ('data.overview.key_metrics.Dividend'), senza duplicati
+    e senza i path già coperti da un loro antenato richiesto, in ordine canonico.
+    """
+    paths = sorted({p.strip().strip('.') for p in raw.split(',') if p.strip().strip('.')})
+    ret: List[str] = []
+    for path in paths:
+        # In ordine alfabetico un antenato precede sempre i suoi discendenti
+        if not any(path.startswith(parent + '.') for parent in ret):
+            ret.append(path)
+    return ret
+
+
+def get_path(doc: Any, path: str) -> Any:
+    """Valore al path puntato (indici numerici per le liste), MISSING se non raggiungibile"""
+    for part in path.split('.'):
+        if isinstance(doc, dict) and part in doc:
+            doc = doc[part]
+        elif isinstance(doc, list) and part.isdigit() and int(part) < len(doc):
+            doc = doc[int(part)]
+        else:
+            return MISSING
+    return doc
+
+
+def project(doc: Any, paths: List[str]) -> Dict[str, Any]:
+    """
+    Sottoinsieme del documento con i soli `paths` (da parse_fields), nella stessa forma
+    annidata dell'originale; i path non presenti sono omessi.
+    """
+    ret: Dict[str, Any] = {}
+    for path in paths:
+        value = get_path(doc, path)
+        if value is MISSING:
+            continue
+        parts = path.split('.')
+        target = ret
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = value
+    return ret
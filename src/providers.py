@@ -0,0 +1,214 @@
+import abc
+import logging
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from portfolio import annual_dividend_per_share
+
+logger = logging.getLogger(__name__)
+
+# Campi comuni a più provider
+FIELDS = ('price', 'dividend', 'name', 'currency')
+
+NUMBER_RE = re.compile(r'-?\d[\d,]*\.?\d*')
+
+
+def _first_number(text: Any) -> Optional[float]:
+    """Primo numero di un testo come '$1.04 (0.45%)'"""
+    if isinstance(text, (int, float)):
+        return float(text)
+    match = NUMBER_RE.search(str(text or ''))
+    return float(match.group().replace(',', '')) if match else None
+
+
+class Provider(abc.ABC):
+    """Interfaccia comune: nome, campi coperti e fetch(simbolo, campi) -> {campo: valore}"""
+    name = 'provider'
+    fields: Tuple[str, ...] = ()
+
+    @abc.abstractmethod
+    def fetch(self, symbol: str, fields: Iterable[str]) -> Dict[str, Any]:
+        """Valori dei campi richiesti (tra quelli coperti) per il simbolo"""
+
+
+class YahooProvider(Provider):
+    """Quotazione compatta di Yahoo Finance (QuoteEngine o un loader con la stessa forma)"""
+    name = 'yahoo'
+    fields = ('price', 'dividend', 'name', 'currency')
+
+    def __init__(self, quote: Optional[Callable[[str], Dict]] = None):
+        if quote is None:
+            from quote_engine import QuoteEngine
+            quote = QuoteEngine().quote
+        self.quote = quote
+
+    def fetch(self, symbol: str, fields: Iterable[str]) -> Dict[str, Any]:
+        quote = self.quote(symbol)
+        return {'price': quote.get('currentPrice'), 'dividend': annual_dividend_per_share(quote) or None,
+                'name': quote.get('shortName'), 'currency': quote.get('currency')}
+
+
+class StockAnalysisProvider(Provider):
+    """Sezione overview di StockAnalysis (scraper o un loader della sezione)"""
+    name = 'stockanalysis'
+    fields = ('price', 'dividend', 'name')
+
+    def __init__(self, overview: Optional[Callable[[str], Dict]] = None):
+        if overview is None:
+            from scraper_stockanalysis import StockAnalysisScraper
+            overview = lambda symbol: StockAnalysisScraper(symbol, delay=0).scrape_section('overview')
+        self.overview = overview
+
+    def fetch(self, symbol: str, fields: Iterable[str]) -> Dict[str, Any]:
+        overview = self.overview(symbol) or {}
+        metrics = overview.get('key_metrics', {})
+        return {'price': _first_number(overview.get('price_data', {}).get('current_price')),
+                'dividend': _first_number(metrics.get('Dividend')),
+                'name': overview.get('basic_info', {}).get('company_name')}
+
+
+class FinnhubQuoteProvider(Provider):
+    """Prezzo (quote) e anagrafica (profile2) da Finnhub, solo per i campi richiesti"""
+    name = 'finnhub'
+    fields = ('price', 'name', 'currency')
+
+    def __init__(self, finnhub):
+        self.finnhub = finnhub
+
+    def fetch(self, symbol: str, fields: Iterable[str]) -> Dict[str, Any]:
+        fields = set(fields)
+        ret: Dict[str, Any] = {}
+        if 'price' in fields:
+            ret['price'] = self.finnhub.quote(symbol).get('c') or None
+        if fields & {'name', 'currency'}:
+            profile = self.finnhub.company_profile(symbol)
+            ret['name'], ret['currency'] = profile.get('name'), profile.get('currency')
+        return ret
+
+
+class ProviderScore:
+    """Media mobile esponenziale di latenza (secondi) e tasso di errore di un provider"""
+    def __init__(self, alpha: float = 0.2, prior_latency: float = 1.0):
+        self.alpha = alpha
+        self.latency = prior_latency
+        self.errors = 0.0
+        self.samples = 0
+        self.lock = threading.Lock()
+
+    def record(self, latency: float, ok: bool):
+        with self.lock:
+            a = self.alpha if self.samples else 1.0
+            self.latency += a * (latency - self.latency)
+            self.errors += self.alpha * ((0.0 if ok else 1.0) - self.errors)
+            self.samples += 1
+
+    def cost(self, error_penalty: float) -> float:
+        """Latenza attesa più una penalità proporzionale al tasso di errore"""
+        return self.latency + self.errors * error_penalty
+
+
+class ProviderRouter:
+    """
+    Interroga i provider che coprono i campi richiesti in ordine di punteggio (latenza e
+    errori recenti): parte il migliore e, se entro `hedge_delay` secondi non ha risposto
+    (o ha risposto senza tutti i campi, o con errore), parte anche il successivo. Vince
+    la prima risposta valida per ogni campo entro il budget di latenza della richiesta;
+    allo scadere si torna quello che c'è. Con hedge_delay=0 i provider partono insieme.
+    Le chiamate rimaste in corso finiscono in background e aggiornano comunque i punteggi.
+    """
+    def __init__(self, providers: List[Provider], budget: float = 2.0, hedge_delay: float = 0.3,
+                 max_workers: int = 8, alpha: float = 0.2, error_penalty: float = 2.0):
+        self.providers = providers
+        self.budget = budget
+        self.hedge_delay = hedge_delay
+        self.error_penalty = error_penalty
+        self.scores = {p.name: ProviderScore(alpha) for p in providers}
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='provider')
+
+    def ranking(self, fields: Iterable[str]) -> List[Provider]:
+        """Provider che coprono almeno un campo, dal costo più basso"""
+        fields = set(fields)
+        candidates = [p for p in self.providers if fields & set(p.fields)]
+        return sorted(candidates, key=lambda p: self.scores[p.name].cost(self.error_penalty))
+
+    def _call(self, provider: Provider, symbol: str, fields: List[str]) -> Dict[str, Any]:
+        start = time.monotonic()
+        try:
+            result = provider.fetch(symbol, fields) or {}
+        except Exception:
+            self.scores[provider.name].record(time.monotonic() - start, False)
+            raise
+        ok = any(result.get(f) is not None for f in fields if f in provider.fields)
+        self.scores[provider.name].record(time.monotonic() - start, ok)
+        return result
+
+    def fetch(self, symbol: str, fields: Iterable[str] = FIELDS, budget: Optional[float] = None,
+              hedge_delay: Optional[float] = None) -> Dict[str, Any]:
+        symbol = symbol.upper()
+        fields = list(dict.fromkeys(fields))
+        budget = self.budget if budget is None else budget
+        hedge_delay = self.hedge_delay if hedge_delay is None else hedge_delay
+        start = time.monotonic()
+        deadline = start + budget
+
+        values: Dict[str, Any] = {}
+        sources: Dict[str, str] = {}
+        errors: Dict[str, str] = {}
+        candidates = self.ranking(fields)
+        running: Dict[Future, Provider] = {}
+        next_launch = start
+
+        while True:
+            missing = [f for f in fields if f not in values]
+            now = time.monotonic()
+            if not missing or now >= deadline:
+                break
+            if now >= next_launch or not running:
+                # Prossimo provider che copre almeno un campo ancora mancante
+                while candidates and not set(missing) & set(candidates[0].fields):
+                    candidates.pop(0)
+                if candidates:
+                    provider = candidates.pop(0)
+                    running[self.executor.submit(self._call, provider, symbol, missing)] = provider
+                    next_launch = now + hedge_delay
+                    continue
+            if not running:
+                break
+            until = min(deadline, next_launch) if candidates and next_launch > now else deadline
+            done, _ = wait(list(running), timeout=max(until - now, 0.0), return_when=FIRST_COMPLETED)
+            for future in done:
+                provider = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    errors[provider.name] = str(e)
+                    logger.warning(f"Provider {provider.name} per {symbol}: {e}")
+                    next_launch = time.monotonic()
+                    continue
+                for field in missing:
+                    if field not in values and result.get(field) is not None:
+                        values[field] = result[field]
+                        sources[field] = provider.name
+                # Risposta parziale: si passa subito al provider successivo
+                next_launch = time.monotonic()
+
+        return {
+            'symbol': symbol,
+            'values': values,
+            'sources': sources,
+            'missing': [f for f in fields if f not in values],
+            'errors': errors,
+            'elapsed_ms': round((time.monotonic() - start) * 1000, 1)
+        }
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Punteggi dei provider, dal migliore"""
+        ret = {}
+        for provider in self.ranking(FIELDS):
+            score = self.scores[provider.name]
+            ret[provider.name] = {'latency_ms': round(score.latency * 1000, 1), 'error_rate': round(score.errors, 3),
+                                  'samples': score.samples, 'cost': round(score.cost(self.error_penalty), 3)}
+        return ret
@@ -0,0 +1,195 @@
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+import yfinance as yf
+
+logger = logging.getLogger(__name__)
+
+# Campi anagrafici presi da .info (lookup pesante, uno per simbolo): cambiano di rado
+PROFILE_FIELDS = ('shortName', 'industryDisp', 'currency', 'lastDividendValue', 'dividendRate')
+# Campi di prezzo calcolati dalle barre giornaliere di un solo yf.download per tutti i simboli
+PRICE_FIELDS = ('currentPrice', 'previousClose', 'open', 'dayLow', 'dayHigh', 'regularMarketChangePercent')
+QUOTE_FIELDS = ('symbol',) + PROFILE_FIELDS + PRICE_FIELDS
+
+
+class TickerPool:
+    """Pool LRU limitato di yf.Ticker riusabili (sessione e cache interne di yfinance)"""
+    def __init__(self, max_size: int = 256):
+        self.max_size = max_size
+        self.tickers: 'OrderedDict[str, yf.Ticker]' = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, symbol: str) -> yf.Ticker:
+        with self.lock:
+            ticker = self.tickers.get(symbol)
+            if ticker is None:
+                ticker = self.tickers[symbol] = yf.Ticker(symbol)
+                if len(self.tickers) > self.max_size:
+                    self.tickers.popitem(last=False)
+            else:
+                self.tickers.move_to_end(symbol)
+            return ticker
+
+    def __len__(self) -> int:
+        return len(self.tickers)
+
+
+class _Pending:
+    """Richiesta di un simbolo in attesa del prossimo batch"""
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Optional[Dict] = None
+        self.error: Optional[BaseException] = None
+
+
+def _number(value: Any) -> Optional[float]:
+    if value is None:
+        return None
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+class QuoteEngine:
+    """
+    Quotazioni compatte (QUOTE_FIELDS) per molti simboli con una sola chiamata upstream:
+    - i prezzi arrivano da un unico yf.download di tutti i simboli richiesti;
+    - i campi anagrafici da .info, per simbolo, ma tenuti in memoria per `profile_ttl` secondi
+      e scaricati in parallelo solo per i simboli nuovi o scaduti;
+    - quote(simbolo) raccoglie le richieste singole che arrivano entro `window` secondi
+      (da thread diversi) in un unico batch.
+    """
+    def __init__(self, pool_size: int = 256, profile_ttl: float = 6 * 3600, window: float = 0.05,
+                 max_batch: int = 100, max_workers: int = 4,
+                 download: Callable[..., pd.DataFrame] = yf.download):
+        self.pool = TickerPool(pool_size)
+        self.profile_ttl = profile_ttl
+        self.window = window
+        self.max_batch = max_batch
+        self.download = download
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='quote-info')
+        self.profiles: Dict[str, Tuple[float, Dict]] = {}
+        self.waiting: Dict[str, _Pending] = {}
+        self.timer: Optional[threading.Timer] = None
+        self.lock = threading.Lock()
+        self.counters = {'downloads': 0, 'symbols': 0, 'info_calls': 0}
+        self.counters_lock = threading.Lock()
+
+    def _count(self, name: str, amount: int = 1):
+        with self.counters_lock:
+            self.counters[name] += amount
+
+    def _profile(self, symbol: str) -> Dict:
+        """Campi anagrafici (e prezzi di riserva) da .info"""
+        self._count('info_calls')
+        info = self.pool.get(symbol).info or {}
+        profile = {name: info.get(name) for name in PROFILE_FIELDS}
+        profile['_fallback'] = {name: info.get(name) for name in PRICE_FIELDS}
+        return profile
+
+    def profiles_for(self, symbols: List[str]) -> Dict[str, Dict]:
+        now = time.time()
+        missing = [s for s in symbols if s not in self.profiles or now - self.profiles[s][0] > self.profile_ttl]
+        for symbol, future in [(s, self.executor.submit(self._profile, s)) for s in missing]:
+            try:
+                self.profiles[symbol] = (now, future.result())
+            except Exception as e:
+                logger.warning(f"Info non disponibili per {symbol}: {e}")
+        return {s: self.profiles[s][1] for s in symbols if s in self.profiles}
+
+    def prices(self, symbols: List[str]) -> Dict[str, Dict]:
+        """Prezzi del giorno e chiusura precedente di tutti i simboli con un solo download"""
+        self._count('downloads')
+        self._count('symbols', len(symbols))
+        frame = self.download(symbols, period='5d', interval='1d', group_by='ticker', auto_adjust=False,
+                              progress=False, threads=True, multi_level_index=True)
+        ret = {}
+        if frame is None or frame.empty:
+            return ret
+        for symbol in symbols:
+            if isinstance(frame.columns, pd.MultiIndex):
+                if symbol not in frame.columns.get_level_values(0):
+                    continue
+                bars = frame[symbol]
+            else:
+                bars = frame
+            bars = bars.dropna(subset=['Close'])
+            if bars.empty:
+                continue
+            last = bars.iloc[-1]
+            previous = _number(bars['Close'].iloc[-2]) if len(bars) > 1 else None
+            current = _number(last['Close'])
+            ret[symbol] = {
+                'currentPrice': current,
+                'previousClose': previous,
+                'open': _number(last['Open']),
+                'dayLow': _number(last['Low']),
+                'dayHigh': _number(last['High']),
+                'regularMarketChangePercent': (current / previous - 1) * 100 if current and previous else None
+            }
+        return ret
+
+    def quotes(self, symbols: Iterable[str]) -> Dict[str, Dict]:
+        """Quotazioni di più simboli; quelli senza né prezzi né info non compaiono"""
+        symbols = list(dict.fromkeys(s.upper() for s in symbols))
+        ret = {}
+        for start in range(0, len(symbols), self.max_batch):
+            chunk = symbols[start:start + self.max_batch]
+            try:
+                prices = self.prices(chunk)
+            except Exception as e:
+                logger.error(f"Errore nel download delle quotazioni: {e}")
+                prices = {}
+            profiles = self.profiles_for(chunk)
+            for symbol in chunk:
+                profile = profiles.get(symbol)
+                if profile is None and symbol not in prices:
+                    continue
+                profile = profile or {}
+                price = prices.get(symbol) or profile.get('_fallback', {})
+                ret[symbol] = {'symbol': symbol, **{name: profile.get(name) for name in PROFILE_FIELDS},
+                               **{name: price.get(name) for name in PRICE_FIELDS}}
+        return ret
+
+    def quote(self, symbol: str, timeout: float = 60.0) -> Dict:
+        """Quotazione di un simbolo, accorpata alle altre richieste della stessa finestra"""
+        symbol = symbol.upper()
+        with self.lock:
+            pending = self.waiting.get(symbol)
+            if pending is None:
+                pending = self.waiting[symbol] = _Pending()
+            if self.timer is None:
+                self.timer = threading.Timer(self.window, self._flush)
+                self.timer.daemon = True
+                self.timer.start()
+        if not pending.done.wait(timeout):
+            raise TimeoutError(f"Timeout sulla quotazione di {symbol}")
+        if pending.error is not None:
+            raise pending.error
+        return pending.value
+
+    def _flush(self):
+        with self.lock:
+            batch, self.waiting = self.waiting, {}
+            self.timer = None
+        try:
+            results = self.quotes(batch)
+        except Exception as e:
+            results = {}
+            logger.error(f"Errore nel batch di quotazioni: {e}")
+        for symbol, pending in batch.items():
+            if symbol in results:
+                pending.value = results[symbol]
+            else:
+                pending.error = KeyError(f"Nessuna quotazione per {symbol}")
+            pending.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.counters_lock:
+            counters = dict(self.counters)
+        return {'pool': len(self.pool), 'profiles': len(self.profiles), **counters}
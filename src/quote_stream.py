@@ -0,0 +1,117 @@
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class Subscriber:
+    """Un client dello stream: i suoi simboli e le variazioni non ancora inviate"""
+    def __init__(self, symbols: Set[str]):
+        self.symbols = symbols
+        self.pending: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+
+    def push(self, symbol: str, changes: Dict[str, Any]):
+        # Le variazioni si fondono: un client lento riceve solo lo stato più recente
+        with self.lock:
+            self.pending.setdefault(symbol, {}).update(changes)
+        self.ready.set()
+
+    def drain(self) -> Dict[str, Dict[str, Any]]:
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.ready.clear()
+        return pending
+
+
+class QuoteHub:
+    """
+    Hub delle quotazioni in push: ogni `interval` secondi scarica con una sola chiamata
+    `fetch(simboli) -> {simbolo: dict}` tutti i simboli richiesti da almeno un client e
+    invia a ogni iscritto solo i campi cambiati rispetto al giro precedente. Il thread di
+    polling parte alla prima iscrizione e resta inattivo finché non ci sono client.
+    """
+    def __init__(self, fetch: Callable[[Set[str]], Dict[str, Dict[str, Any]]], interval: float = 5.0,
+                 heartbeat: float = 15.0):
+        self.fetch = fetch
+        self.interval = interval
+        self.heartbeat = heartbeat
+        self.subscribers: Set[Subscriber] = set()
+        self.last: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def subscribe(self, symbols: Set[str]) -> Subscriber:
+        subscriber = Subscriber(symbols)
+        with self.lock:
+            self.subscribers.add(subscriber)
+            # Il nuovo client riceve subito l'ultimo stato noto dei suoi simboli
+            for symbol in symbols:
+                if symbol in self.last:
+                    subscriber.push(symbol, self.last[symbol])
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='quote-hub', daemon=True)
+                self.thread.start()
+        # Simboli nuovi: giro anticipato invece di attendere l'intervallo
+        if not symbols.issubset(self.last):
+            self.wakeup.set()
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def symbols(self) -> Set[str]:
+        """Unione dei simboli di tutti gli iscritti"""
+        with self.lock:
+            return set().union(*(s.symbols for s in self.subscribers))
+
+    def _run(self):
+        while True:
+            symbols = self.symbols()
+            if symbols:
+                self.poll(symbols)
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+
+    def poll(self, symbols: Set[str]):
+        """Un giro: un solo fetch per tutti i simboli, poi invio delle differenze"""
+        try:
+            quotes = self.fetch(symbols)
+        except Exception as e:
+            logger.error(f"Errore nel fetch delle quotazioni per lo stream: {e}")
+            return
+        for symbol in symbols - set(quotes):
+            logger.warning(f"Nessuna quotazione di {symbol} per lo stream")
+        for symbol, quote in quotes.items():
+            previous = self.last.get(symbol, {})
+            changes = {key: value for key, value in quote.items() if previous.get(key) != value}
+            if not changes:
+                continue
+            with self.lock:
+                self.last[symbol] = {**previous, **quote}
+                listeners = [s for s in self.subscribers if symbol in s.symbols]
+            for subscriber in listeners:
+                subscriber.push(symbol, changes)
+        # I simboli non più richiesti da nessuno non vanno tenuti in memoria
+        with self.lock:
+            for symbol in set(self.last) - set().union(*(s.symbols for s in self.subscribers)):
+                del self.last[symbol]
+
+    def events(self, subscriber: Subscriber) -> Iterator[str]:
+        """Eventi Server-Sent Events per un iscritto; alla disconnessione lo rimuove"""
+        try:
+            yield f"retry: {int(self.interval * 1000)}\n\n"
+            while True:
+                if subscriber.ready.wait(self.heartbeat):
+                    yield f"event: quote\ndata: {json.dumps(subscriber.drain(), default=str)}\n\n"
+                else:
+                    # Commento SSE: mantiene viva la connessione e rileva i client chiusi
+                    yield f": keepalive {int(time.time())}\n\n"
+        finally:
+            self.unsubscribe(subscriber)
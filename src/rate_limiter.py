@@ -0,0 +1,181 @@
+import heapq
+import itertools
+import os
+import struct
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+try:
+    import fcntl
+except ImportError:  # Windows: niente lock su file, il secchio condiviso resta del processo
+    fcntl = None
+
+
+class TokenBucket:
+    """
+    Token bucket thread-safe: `rate` token al secondo, al massimo `capacity` accumulati.
+    Ogni richiesta consuma un token; se il secchio è vuoto il chiamante attende.
+    """
+    def __init__(self, rate: float, capacity: float = 1.0):
+        if rate <= 0:
+            raise ValueError("rate deve essere > 0")
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """Prova a consumare i token; torna 0 se riuscito, altrimenti i secondi da attendere"""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return 0.0
+            return (tokens - self.tokens) / self.rate
+
+    def acquire(self, tokens: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """Attende finché i token sono disponibili (o scade il timeout)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0.0:
+                return True
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+class SharedTokenBucket(TokenBucket):
+    """
+    TokenBucket con lo stato (token e istante dell'ultimo aggiornamento) in un file con
+    lock esclusivo: tutti i processi che usano lo stesso `path` (es. i worker gunicorn)
+    consumano dallo stesso secchio e insieme non superano `rate`. Senza fcntl il secchio
+    resta del processo.
+    """
+    STATE = struct.Struct('<dd')
+
+    def __init__(self, path: str, rate: float, capacity: float = 1.0):
+        super().__init__(rate, capacity)
+        self.path = path if fcntl is not None else None
+        folder = os.path.dirname(path)
+        if self.path and folder:
+            os.makedirs(folder, exist_ok=True)
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        if not self.path:
+            return super().try_acquire(tokens)
+        with self.lock:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                # Orologio di sistema e non monotonic: lo stato è letto da altri processi
+                now = time.time()
+                state = os.pread(fd, self.STATE.size, 0)
+                if len(state) == self.STATE.size:
+                    self.tokens, self.updated = self.STATE.unpack(state)
+                else:
+                    self.tokens, self.updated = self.capacity, now
+                self.tokens = min(self.capacity, self.tokens + max(now - self.updated, 0.0) * self.rate)
+                self.updated = now
+                wait = 0.0
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                else:
+                    wait = (tokens - self.tokens) / self.rate
+                os.pwrite(fd, self.STATE.pack(self.tokens, self.updated), 0)
+                return wait
+            finally:
+                # La chiusura rilascia anche il lock
+                os.close(fd)
+
+
+# Priorità delle richieste verso API a quota: le interattive passano prima dei refresh
+INTERACTIVE = 0
+BACKGROUND = 1
+
+
+class PriorityLimiter:
+    """
+    TokenBucket con coda di priorità: quando i token scarseggiano il prossimo token va alla
+    richiesta in attesa con priorità più alta (valore più basso), a parità in ordine di arrivo.
+    Con `path` il secchio è uno SharedTokenBucket condiviso tra processi; la coda di
+    priorità resta del processo.
+    """
+    def __init__(self, rate: float, capacity: float = 1.0, path: Optional[str] = None):
+        self.bucket = SharedTokenBucket(path, rate, capacity) if path else TokenBucket(rate, capacity)
+        self.waiting: List[Tuple[int, int]] = []
+        self.sequence = itertools.count()
+        self.cond = threading.Condition()
+        self.counters = {INTERACTIVE: 0, BACKGROUND: 0}
+
+    def acquire(self, priority: int = INTERACTIVE, timeout: Optional[float] = None) -> bool:
+        """Attende il proprio turno e un token (o il timeout); torna False se scaduto"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        ticket = (priority, next(self.sequence))
+        with self.cond:
+            heapq.heappush(self.waiting, ticket)
+            try:
+                while True:
+                    wait = None
+                    if self.waiting[0] == ticket:
+                        wait = self.bucket.try_acquire()
+                        if wait == 0.0:
+                            self.counters[priority] = self.counters.get(priority, 0) + 1
+                            return True
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            return False
+                        wait = remaining if wait is None else min(wait, remaining)
+                    self.cond.wait(wait)
+            finally:
+                self.waiting.remove(ticket)
+                heapq.heapify(self.waiting)
+                self.cond.notify_all()
+
+    def pending(self) -> int:
+        return len(self.waiting)
+
+
+class HostRateLimiter:
+    """
+    Limitatore per host: un TokenBucket per ogni hostname, condiviso da tutti i thread
+    del processo, così le richieste parallele verso lo stesso sito restano educate.
+    """
+    def __init__(self, rate: float = 2.0, capacity: float = 4.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.lock = threading.Lock()
+
+    def configure(self, host: str, rate: float, capacity: float = 1.0):
+        """Imposta un limite specifico per un host"""
+        with self.lock:
+            self.buckets[host] = TokenBucket(rate, capacity)
+
+    def bucket(self, host: str) -> TokenBucket:
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.capacity)
+                self.buckets[host] = bucket
+            return bucket
+
+    def acquire(self, url: str, timeout: Optional[float] = None) -> bool:
+        """Consuma un token per l'host dell'url"""
+        return self.bucket(urlparse(url).hostname or '').acquire(timeout=timeout)
+
+
+# Limitatore di default condiviso da tutti gli scraper del processo
+host_limiter = HostRateLimiter()
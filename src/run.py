@@ -2,10 +2,14 @@ from flask import Flask, jsonify, request
 from flask_cors import CORS
 import requests
 from bs4 import BeautifulSoup
+import os
 import re
 import datetime
 from flasgger import Swagger
 
+from http_client import http_client
+from isin_index import IsinIndex, is_valid_isin, normalize
+
 app = Flask(__name__)
 CORS(app) # Abilita CORS per permettere richieste dal frontend
 swagger = Swagger(app, template={
@@ -16,39 +20,103 @@ swagger = Swagger(app, template={
     }
 })
 
-# Questa è la mappatura ISIN -> Ticker. Ancora necessaria perché stockanalysis.com non cerca per ISIN.
+# Mappatura ISIN -> Ticker di riserva, usata se l'indice non c'è o non contiene l'ISIN.
+# Ancora necessaria perché stockanalysis.com non cerca per ISIN.
 isin_map = {
     "US0378331005": "AAPL",  # Apple
     "US5949181045": "MSFT",  # Microsoft
     "US0231351067": "AMZN",  # Amazon
-    "US3696041013": "GOOG",  # Alphabet (Google)
+    "US02079K1079": "GOOG",  # Alphabet (Google), classe C
     "US88160R1014": "TSLA",  # Tesla
     "DE000BASF111": "BASF", # BASF (esempio di titolo tedesco, il ticker su stockanalysis è spesso solo il nome)
-    "IT0005238287": "ENI", # ENI (esempio di titolo italiano)
-    "IE00B1FL5M68": "RYAAY", # Ryanair Holdings plc (ADR)
+    "IT0003132476": "ENI", # ENI (esempio di titolo italiano)
+    "IE00BYTBXV33": "RYAAY", # Ryanair Holdings plc (ADR)
 }
 
+# Indice completo costruito offline da un dump di riferimento (python src/isin_index.py build ...)
+ISIN_INDEX_PATH = os.environ.get('FINANZA_ISIN_INDEX', 'data/isin.idx')
+isin_index = IsinIndex(ISIN_INDEX_PATH) if os.path.exists(ISIN_INDEX_PATH) else None
+MAX_BULK_ISINS = 10000
+
+
+def resolve_isins(isins):
+    """Ticker (o None) per ogni ISIN valido, dall'indice e poi dalla mappatura di riserva"""
+    found = isin_index.lookup_many(isins) if isin_index is not None else {
+        isin: None for isin in map(normalize, isins) if is_valid_isin(isin)}
+    return {isin: ticker or isin_map.get(isin) for isin, ticker in found.items()}
+
+
 @app.route('/isin_to_ticker', methods=['GET'])
 def isin_to_ticker_route():
     """
-        This is an example endpoint that returns 'Hello, World!'
+        Ticker stockanalysis.com di un ISIN
         ---
+        parameters:
+            - name: isin
+              in: query
+              type: string
+              required: true
         responses:
             200:
-                description: A successful response
+                description: Ticker trovato
                 examples:
-                    application/json: "Hello, World!"
+                    application/json: {"ticker": "AAPL"}
+            400:
+                description: ISIN mancante o non valido (checksum)
+            404:
+                description: ISIN non mappato
     """
     isin = request.args.get('isin')
     if not isin:
         return jsonify({"error": "ISIN parameter is missing"}), 400
+    if not is_valid_isin(normalize(isin)):
+        return jsonify({"error": f"ISIN {isin} is not valid"}), 400
 
-    ticker = isin_map.get(isin.upper())
+    ticker = resolve_isins([isin]).get(normalize(isin))
     if not ticker:
         return jsonify({"error": f"ISIN {isin} not found or not mapped to a ticker for stockanalysis.com"}), 404
         
     return jsonify({"ticker": ticker})
 
+
+@app.route('/isin_to_ticker/bulk', methods=['GET', 'POST'])
+def isin_to_ticker_bulk_route():
+    """
+        Ticker di più ISIN in una richiesta
+        ---
+        parameters:
+            - name: isins
+              in: query
+              type: string
+              description: ISIN separati da virgola (GET), oppure body JSON {"isins": [...]} (POST)
+        responses:
+            200:
+                description: Ticker per ISIN, ISIN non trovati e ISIN non validi
+                examples:
+                    application/json: {"results": {"US0378331005": "AAPL"}, "not_found": [], "invalid": ["XX123"]}
+            400:
+                description: Nessun ISIN, troppi ISIN o body non valido
+    """
+    if request.method == 'POST':
+        body = request.get_json(silent=True) or {}
+        isins = (body.get('isins') if isinstance(body, dict) else None) or []
+        if not isinstance(isins, list) or not all(isinstance(isin, str) for isin in isins):
+            return jsonify({"error": "isins must be a list of strings"}), 400
+    else:
+        isins = [i for i in (request.args.get('isins') or '').split(',') if i.strip()]
+    if not isins:
+        return jsonify({"error": "ISIN list is missing"}), 400
+    if len(isins) > MAX_BULK_ISINS:
+        return jsonify({"error": f"At most {MAX_BULK_ISINS} ISINs per request"}), 400
+
+    found = resolve_isins(isins)
+    invalid = [isin for isin in dict.fromkeys(map(normalize, isins)) if isin not in found]
+    return jsonify({
+        "results": {isin: ticker for isin, ticker in found.items() if ticker},
+        "not_found": [isin for isin, ticker in found.items() if not ticker],
+        "invalid": invalid
+    })
+
 @app.route('/stock_data_stockanalysis', methods=['GET'])
 def get_stock_data_stockanalysis():
     ticker_symbol = request.args.get('ticker')
@@ -64,7 +132,7 @@ def get_stock_data_stockanalysis():
 
     try:
         # --- Ottieni i dati generali e il prezzo corrente ---
-        response = requests.get(base_url, headers=headers)
+        response = http_client.get(base_url, headers=headers)
         response.raise_for_status() # Lancia un'eccezione per codici di stato HTTP errati
         soup = BeautifulSoup(response.text, 'html.parser')
 
@@ -102,7 +170,7 @@ def get_stock_data_stockanalysis():
 
 
         # --- Ottieni i dati dei dividendi ---
-        dividend_response = requests.get(dividends_url, headers=headers)
+        dividend_response = http_client.get(dividends_url, headers=headers)
         dividend_response.raise_for_status()
         dividend_soup = BeautifulSoup(dividend_response.text, 'html.parser')
 
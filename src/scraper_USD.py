@@ -13,35 +13,40 @@ class USDEURScraperYF:
         self.ticker_symbol = ticker_symbol
         print(f"Inizializzazione con ticker: {self.ticker_symbol}")
 
+    def get_rate(self):
+        """
+        Recupera il prezzo attuale del simbolo (es. USDEUR=X: euro per 1 dollaro).
+        """
+        # Crea un oggetto Ticker per il simbolo
+        currency_ticker = yf.Ticker(self.ticker_symbol)
+
+        # Ottiene i dati della quotazione in tempo reale (o il più recente disponibile)
+        # using .info for current price or .history for historical data
+        # For a single, most recent price, .info is often sufficient.
+        info = currency_ticker.info
+        rate = info.get('regularMarketPrice')
+
+        if rate is None:
+            print("Impossibile recuperare 'regularMarketPrice' dal ticker.")
+            # Fallback: prova a usare il prezzo di chiusura dell'ultimo giorno disponibile
+            hist = currency_ticker.history(period="1d")
+            if not hist.empty:
+                rate = hist['Close'].iloc[-1]
+                print(f"Usato il prezzo di chiusura storico: {rate}")
+            else:
+                print(f"Nessun dato storico disponibile per {self.ticker_symbol}.")
+                return None
+        return rate
+
     def get_usd_eur_rate(self):
         """
         Recupera e restituisce la quotazione USD/EUR attuale.
         """
         try:
-            # Crea un oggetto Ticker per il simbolo EUR=X (EUR/USD)
-            currency_ticker = yf.Ticker(self.ticker_symbol)
-
-            # Ottiene i dati della quotazione in tempo reale (o il più recente disponibile)
-            # using .info for current price or .history for historical data
-            # For a single, most recent price, .info is often sufficient.
-            info = currency_ticker.info
-            
             # Yahoo Finance fornisce EUR/USD, quindi il campo 'regularMarketPrice' sarà il prezzo di 1 EUR in USD.
             # Esempio: Se EUR/USD è 1.08, significa che 1 EUR = 1.08 USD.
             # Vogliamo USD/EUR, quindi 1 USD = (1 / 1.08) EUR.
-            
-            eur_usd_rate = info.get('regularMarketPrice')
-
-            if eur_usd_rate is None:
-                print("Impossibile recuperare 'regularMarketPrice' dal ticker.")
-                # Fallback: prova a usare il prezzo di chiusura dell'ultimo giorno disponibile
-                hist = currency_ticker.history(period="1d")
-                if not hist.empty:
-                    eur_usd_rate = hist['Close'].iloc[-1]
-                    print(f"Usato il prezzo di chiusura storico: {eur_usd_rate}")
-                else:
-                    print(f"Nessun dato storico disponibile per {self.ticker_symbol}.")
-                    return None
+            eur_usd_rate = self.get_rate()
 
             if eur_usd_rate:
                 usd_eur_rate = 1 / eur_usd_rate
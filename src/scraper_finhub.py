@@ -1,29 +1,46 @@
-import finnhub
 import json
 import datetime
+import os
 
-def get_finnhub_data_with_library(symbol, api_key):
+from finnhub_provider import FinnhubProvider
+from symbol_index import symbols_path
+
+def get_finnhub_data_with_library(symbol, api_key, provider=None):
     """
-    Scarica i dati storici di candele da Finnhub per un dato simbolo
-    utilizzando la libreria finnhub-python.
+    Scarica da Finnhub ricerca, profilo, consensi degli analisti e dividendi dell'ultimo
+    anno per un dato simbolo, passando dal FinnhubProvider (quota e cache).
     """
+    provider = provider or FinnhubProvider(api_key)
+    today = datetime.date.today()
     try:
-        finnhub_client = finnhub.Client(api_key=api_key)
-
-        print(finnhub_client.stock_symbols('US'))
-        print(finnhub_client.symbol_lookup(symbol))
-        #print(finnhub_client.market_status(exchange='US'))
-        #print(finnhub_client.market_holiday(exchange='US'))
-        print(finnhub_client.company_profile(symbol=symbol))
-        #print(finnhub_client.stock_insider_transactions(symbol, '2021-01-01', '2021-03-01'))
-        print(finnhub_client.recommendation_trends(symbol))
-        print(finnhub_client.stock_dividends(symbol=symbol, _from='2019-01-01', to='2020-01-01'))
-
-            
+        return {
+            'symbol': symbol,
+            'lookup': provider.symbol_lookup(symbol),
+            'profile': provider.company_profile(symbol),
+            'recommendations': provider.recommendation_trends(symbol),
+            'dividends': provider.stock_dividends(symbol, _from=(today - datetime.timedelta(days=365)).isoformat(),
+                                                  to=today.isoformat())
+        }
     except Exception as e:
         print(f"Errore durante la richiesta API: {e}")
         return None
 
+def save_stock_symbols(api_key, exchange='US', filename=None, provider=None):
+    """
+    Salva su disco l'elenco dei simboli della borsa (stock_symbols), usato dal server per
+    l'autocompletamento senza chiamare Finnhub a ogni ricerca.
+    """
+    filename = filename or symbols_path(exchange)
+    symbols = (provider or FinnhubProvider(api_key)).stock_symbols(exchange)
+    os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+    # Scrittura su file temporaneo e rename: il server non legge mai un file a metà
+    tmp = f"{filename}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(symbols, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp, filename)
+    print(f"📇 {len(symbols)} simboli {exchange} salvati in '{filename}'")
+    return filename
+
 def save_to_json(data, filename):
     """
     Salva i dati in un file JSON.
@@ -37,7 +54,7 @@ def save_to_json(data, filename):
 
 if __name__ == "__main__":
     # Sostituisci con la tua chiave API Finnhub
-    FINNHUB_API_KEY = "d2rvr9pr01qv11lgg9bgd2rvr9pr01qv11lgg9c0"  
+    FINNHUB_API_KEY = os.environ.get('FINANZA_FINNHUB_KEY', "d2rvr9pr01qv11lgg9bgd2rvr9pr01qv11lgg9c0")
     
     # Simbolo del titolo che vuoi scaricare (es. Apple)
     STOCK_SYMBOL = "AAPL"
@@ -45,8 +62,11 @@ if __name__ == "__main__":
     if FINNHUB_API_KEY == "LA_TUA_CHIAVE_API_FINNHUB":
         print("ATTENZIONE: Inserisci la tua chiave API Finnhub. Puoi ottenerne una gratuitamente su finnhub.io")
     else:
-        print(f"Scaricamento dati per {STOCK_SYMBOL} usando la libreria finnhub-python...")
-        stock_data = get_finnhub_data_with_library(STOCK_SYMBOL, FINNHUB_API_KEY)
+        # Un solo provider: quota e cache condivise tra le chiamate
+        provider = FinnhubProvider.from_env(FINNHUB_API_KEY)
+        save_stock_symbols(FINNHUB_API_KEY, provider=provider)
+        print(f"Scaricamento dati per {STOCK_SYMBOL} da Finnhub...")
+        stock_data = get_finnhub_data_with_library(STOCK_SYMBOL, FINNHUB_API_KEY, provider=provider)
 
         if stock_data:
             output_filename = f"data/{STOCK_SYMBOL}_data_library.json"
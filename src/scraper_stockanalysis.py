@@ -1,19 +1,48 @@
 import requests
 from bs4 import BeautifulSoup
-import json
+import os
 import re
 import time
 import pandas as pd
 from urllib.parse import urljoin, urlparse
-from typing import Dict, List, Any
+from typing import Callable, Dict, List, Any, Optional
 import logging
-from dataclasses import dataclass, asdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
 
+from columnar import records_to_frame
+from html_extract import PageExtract, PageExtractor, make_soup
+from http_client import ConditionalCache, HttpClient, http_client
+from rate_limiter import HostRateLimiter, host_limiter
+from serializer import as_document
+from snapshot_store import SnapshotStore
+
 # Configurazione logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Suffissi numerici e pattern usati da parse_number/parse_numbers
+MULTIPLIERS = {'K': 1000, 'M': 1000000, 'B': 1000000000, 'T': 1000000000000}
+NULL_VALUES = ('-', 'N/A', 'n/a')
+STRIP_RE = re.compile(r'[,$%()]')
+# Forme numeriche "semplici" convertite in blocco; tutto il resto passa da parse_number
+INT_PATTERN = r'[+-]?[0-9]{1,18}'
+FLOAT_PATTERN = r'[+-]?(?:[0-9]+\.[0-9]*|\.[0-9]+)'
+SUFFIX_PATTERN = r'[+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)[KMBT]'
+# Sotto questa soglia di valori distinti l'overhead di pandas supera il guadagno
+# (misurato con bench_scraper: una pagina ha poche centinaia di valori distinti)
+VECTOR_MIN_SIZE = 5000
+try:
+    import pyarrow  # noqa: F401
+    STRING_DTYPE = pd.StringDtype('pyarrow')
+except ImportError:
+    STRING_DTYPE = object
+
+# Limite di default verso stockanalysis.com in modalità concorrente:
+# un burst che copre tutte le pagine di un ticker, poi 4 richieste al secondo
+host_limiter.configure('stockanalysis.com', rate=4.0, capacity=11.0)
+
 @dataclass
 class ScrapedData:
     ticker: str
@@ -21,22 +50,57 @@ class ScrapedData:
     last_updated: str
     data: Dict[str, Any]
 
+# Dati già estratti dalle pagine (non le soup), condivisi dagli scraper del processo e da
+# non modificare; dimensionata in ticker, ognuno con una voce per pagina
+PAGES_PER_TICKER = 11
+shared_page_cache = ConditionalCache(
+    max_entries=int(os.environ.get('FINANZA_PAGE_CACHE_TICKERS', '100')) * PAGES_PER_TICKER)
+
+# Headers per simulare un browser
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1'
+}
+
 class StockAnalysisScraper:
-    def __init__(self, ticker: str, delay: float = 1.0):
+    # Pagine necessarie a ciascuna sezione di ScrapedData.data
+    SECTIONS = {
+        'overview': ['overview'],
+        'financials': ['financials', 'balance-sheet', 'cash-flow', 'ratios'],
+        'performance': ['revenue', 'earnings', 'dividend'],
+        'analysis': ['statistics', 'forecast'],
+        'news': ['news']
+    }
+
+    def __init__(self, ticker: str, delay: float = 1.0, concurrent: bool = False,
+                 max_workers: int = 4, rate_limiter: Optional[HostRateLimiter] = None,
+                 parser: Optional[str] = None, columnar: bool = False,
+                 http: Optional[HttpClient] = None, page_cache: Optional[ConditionalCache] = None):
         self.ticker = ticker.upper()
         self.base_url = f"https://stockanalysis.com/stocks/{self.ticker.lower()}"
         self.delay = delay
-        self.session = requests.Session()
-        
-        # Headers per simulare un browser
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Accept-Encoding': 'gzip, deflate',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1'
-        })
+        # In modalità concorrente le pagine sono scaricate in parallelo (max_workers thread)
+        # e il delay fisso è sostituito dal token bucket per host
+        self.concurrent = concurrent
+        self.max_workers = max_workers
+        self.rate_limiter = rate_limiter if rate_limiter is not None else (host_limiter if concurrent else None)
+        # Dati estratti per pagina (None se il download è fallito)
+        self.page_data: Dict[str, Any] = {}
+        # Parser HTML (lxml se disponibile) ed estrattore a singola visita
+        self.parser = parser
+        self.extractor = PageExtractor(self.clean_text, self.parse_numbers)
+        self.last_extract = None
+        # Se True le tabelle delle pagine finanziarie sono DataFrame invece di liste di dict
+        self.columnar = columnar
+        # Client HTTP condiviso dal processo: connessioni keep-alive riusate tra scraper e richieste
+        self.http = http if http is not None else http_client
+        # GET condizionali: le pagine invariate (304 o stesso body) non vengono né
+        # analizzate né estratte di nuovo
+        self.page_cache = page_cache if page_cache is not None else shared_page_cache
         
         # URLs delle diverse sezioni
         self.urls = {
@@ -53,17 +117,53 @@ class StockAnalysisScraper:
             'news': f"{self.base_url}/news/"
         }
     
-    def get_page(self, url: str) -> BeautifulSoup:
-        """Ottiene una pagina e restituisce l'oggetto BeautifulSoup"""
+    def _fetch(self, url: str, fetch: Callable[[], Any]) -> Any:
+        """Esegue fetch() rispettando il rate limit (o il delay fisso); None se fallisce"""
         try:
             logger.info(f"Scraping: {url}")
-            response = self.session.get(url, timeout=30)
-            response.raise_for_status()
-            time.sleep(self.delay)
-            return BeautifulSoup(response.content, 'html.parser')
+            if self.rate_limiter:
+                self.rate_limiter.acquire(url)
+            value = fetch()
+            if not self.rate_limiter:
+                time.sleep(self.delay)
+            return value
         except requests.RequestException as e:
             logger.error(f"Errore nel recuperare {url}: {e}")
             return None
+
+    def fetch_page(self, url: str) -> BeautifulSoup:
+        """Scarica una pagina (senza cache) e restituisce l'oggetto BeautifulSoup"""
+        def download():
+            response = self.http.get(url, headers=BROWSER_HEADERS)
+            response.raise_for_status()
+            return make_soup(response.content, self.parser)
+        return self._fetch(url, download)
+
+    def get_page(self, url: str) -> BeautifulSoup:
+        """Alias di fetch_page: le pagine già scaricate si leggono da get_page_data"""
+        return self.fetch_page(url)
+
+    def fetch_page_data(self, page: str) -> Any:
+        """Scarica una pagina con GET condizionale e ne restituisce i dati estratti"""
+        url = self.urls[page]
+        return self._fetch(url, lambda: self.page_cache.fetch(
+            self.http, url, lambda body: self.extract_page(page, make_soup(body, self.parser)),
+            key=(url, self.parser, self.columnar), headers=BROWSER_HEADERS))
+
+    def get_page_data(self, page: str) -> Any:
+        """Dati estratti della pagina, scaricandola se non è già stata prefetchata"""
+        if page not in self.page_data:
+            self.page_data[page] = self.fetch_page_data(page)
+        return self.page_data[page]
+
+    def prefetch(self, pages: List[str]):
+        """Scarica ed estrae in parallelo le pagine indicate, le successive get_page_data le trovano già pronte"""
+        pages = [page for page in pages if page not in self.page_data]
+        if not pages:
+            return
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(pages))) as executor:
+            for page, data in zip(pages, executor.map(self.fetch_page_data, pages)):
+                self.page_data[page] = data
     
     def clean_text(self, text: str) -> str:
         """Pulisce il testo rimuovendo caratteri indesiderati"""
@@ -73,16 +173,14 @@ class StockAnalysisScraper:
     
     def parse_number(self, text: str) -> Any:
         """Converte stringhe numeriche in numeri"""
-        if not text or text in ['-', 'N/A', 'n/a']:
+        if not text or text in NULL_VALUES:
             return None
         
         # Rimuove simboli e spazi
-        clean_text = re.sub(r'[,$%()]', '', text.strip())
+        clean_text = STRIP_RE.sub('', text.strip())
         
         # Gestisce numeri con suffissi (B, M, K)
-        multipliers = {'K': 1000, 'M': 1000000, 'B': 1000000000, 'T': 1000000000000}
-        
-        for suffix, multiplier in multipliers.items():
+        for suffix, multiplier in MULTIPLIERS.items():
             if clean_text.endswith(suffix):
                 try:
                     return float(clean_text[:-1]) * multiplier
@@ -96,9 +194,58 @@ class StockAnalysisScraper:
             return int(clean_text)
         except ValueError:
             return text
+
+    def parse_numbers(self, texts: List[str]) -> List[Any]:
+        """
+        Versione a colonna di parse_number: i valori ripetuti sono convertiti una volta
+        sola e, oltre VECTOR_MIN_SIZE valori distinti, le forme comuni (interi, decimali,
+        suffissi K/M/B/T, con $ , % e parentesi) sono convertite in blocco con pandas.
+        I casi particolari ricadono su parse_number: il risultato è identico valore per valore.
+        """
+        unique = list(dict.fromkeys(texts))
+        if len(unique) < VECTOR_MIN_SIZE:
+            numbers = {text: self.parse_number(text) for text in unique}
+        else:
+            numbers = dict(zip(unique, self._parse_numbers_vectorized(unique)))
+        return [numbers[text] for text in texts]
+
+    def _parse_numbers_vectorized(self, texts: List[str]) -> List[Any]:
+        ret: List[Any] = [None] * len(texts)
+        raw = pd.Series(texts, dtype=object)
+        valid = raw.notna() & (raw != '') & ~raw.isin(NULL_VALUES)
+        if not valid.any():
+            return ret
+        clean = raw[valid].astype(STRING_DTYPE).str.strip().str.replace(STRIP_RE.pattern, '', regex=True)
+
+        ints = clean.str.fullmatch(INT_PATTERN).astype(bool)
+        floats = clean.str.fullmatch(FLOAT_PATTERN).astype(bool)
+        suffixed = clean.str.fullmatch(SUFFIX_PATTERN).astype(bool)
+
+        for index, value in zip(clean.index[ints], clean[ints].astype('int64').tolist()):
+            ret[index] = value
+        for index, value in zip(clean.index[floats], clean[floats].astype('float64').tolist()):
+            ret[index] = value
+        if suffixed.any():
+            numbers = clean[suffixed]
+            scaled = numbers.str[:-1].astype('float64') * numbers.str[-1].map(MULTIPLIERS).astype('float64')
+            for index, value in zip(numbers.index, scaled.tolist()):
+                ret[index] = value
+
+        for index in clean.index[~(ints | floats | suffixed)]:
+            ret[index] = self.parse_number(texts[index])
+        return ret
     
+    def extract(self, soup: BeautifulSoup) -> PageExtract:
+        """Tabelle e statistiche della pagina in una sola visita (riusata per la stessa pagina)"""
+        if self.last_extract is None or self.last_extract[0] is not soup:
+            self.last_extract = (soup, self.extractor.extract(soup))
+        return self.last_extract[1]
+
     def scrape_table(self, soup: BeautifulSoup, table_selector: str = "table") -> List[Dict]:
         """Estrae dati da una tabella HTML"""
+        if table_selector == "table":
+            return self.extract(soup).tables
+
         tables = soup.select(table_selector)
         all_data = []
         
@@ -130,41 +277,25 @@ class StockAnalysisScraper:
         return all_data
     
     def scrape_key_statistics(self, soup: BeautifulSoup) -> Dict:
-        """Estrae statistiche chiave dalla pagina"""
-        stats = {}
-        
-        # Cerca tabelle con statistiche
-        stat_tables = soup.select('table, .stats-table, .table')
-        for table in stat_tables:
-            rows = table.find_all('tr')
-            for row in rows:
-                cells = row.find_all(['td', 'th'])
-                if len(cells) >= 2:
-                    key = self.clean_text(cells[0].get_text())
-                    value = self.clean_text(cells[1].get_text())
-                    if key and value:
-                        stats[key] = self.parse_number(value)
-        
-        # Cerca div con statistiche
-        stat_divs = soup.select('.stat, .metric, .data-point')
-        for div in stat_divs:
-            label = div.select_one('.label, .stat-label, .metric-label')
-            value = div.select_one('.value, .stat-value, .metric-value')
-            
-            if label and value:
-                key = self.clean_text(label.get_text())
-                val = self.clean_text(value.get_text())
-                if key and val:
-                    stats[key] = self.parse_number(val)
-        
-        return stats
+        """Estrae statistiche chiave dalla pagina (tabelle e div .stat/.metric/.data-point)"""
+        return self.extract(soup).metrics
     
-    def scrape_overview(self) -> Dict:
-        """Scraping della pagina overview"""
-        soup = self.get_page(self.urls['overview'])
-        if not soup:
-            return {}
-        
+    def extract_page(self, page: str, soup: BeautifulSoup) -> Any:
+        """Dati di una pagina: overview e news hanno la loro forma, le altre tabelle e statistiche"""
+        if page == 'overview':
+            return self.extract_overview(soup)
+        if page == 'news':
+            return self.extract_news(soup)
+        # Estrazione locale e non extract(): le pagine sono estratte in parallelo
+        extract = self.extractor.extract(soup)
+        columnar = self.columnar and page in self.SECTIONS['financials']
+        return {
+            'tables': records_to_frame(extract.tables) if columnar else extract.tables,
+            'metrics': extract.metrics
+        }
+
+    def extract_overview(self, soup: BeautifulSoup) -> Dict:
+        """Dati della pagina overview"""
         data = {
             'basic_info': {},
             'key_metrics': {},
@@ -184,13 +315,11 @@ class StockAnalysisScraper:
             if '$' in text:
                 data['price_data']['current_price'] = self.parse_number(text.replace('$', ''))
         
-        # Estrae statistiche dalla pagina
-        data['key_metrics'].update(self.scrape_key_statistics(soup))
-        
-        # Tabelle con dati
-        tables_data = self.scrape_table(soup)
-        if tables_data:
-            data['tables'] = tables_data
+        # Statistiche e tabelle della pagina
+        extract = self.extractor.extract(soup)
+        data['key_metrics'].update(extract.metrics)
+        if extract.tables:
+            data['tables'] = extract.tables
         
         # Descrizione dell'azienda
         description = soup.select_one('.description, .company-description, .about')
@@ -198,64 +327,9 @@ class StockAnalysisScraper:
             data['description'] = self.clean_text(description.get_text())
         
         return data
-    
-    def scrape_financials(self) -> Dict:
-        """Scraping delle pagine finanziarie"""
-        financial_data = {}
-        
-        financial_pages = ['financials', 'balance-sheet', 'cash-flow', 'ratios']
-        
-        for page in financial_pages:
-            soup = self.get_page(self.urls[page])
-            if soup:
-                page_data = {
-                    'tables': self.scrape_table(soup),
-                    'metrics': self.scrape_key_statistics(soup)
-                }
-                financial_data[page.replace('-', '_')] = page_data
-        
-        return financial_data
-    
-    def scrape_performance_data(self) -> Dict:
-        """Scraping di dati su performance (revenue, earnings, dividend)"""
-        performance_data = {}
-        
-        performance_pages = ['revenue', 'earnings', 'dividend']
-        
-        for page in performance_pages:
-            soup = self.get_page(self.urls[page])
-            if soup:
-                page_data = {
-                    'tables': self.scrape_table(soup),
-                    'metrics': self.scrape_key_statistics(soup)
-                }
-                performance_data[page] = page_data
-        
-        return performance_data
-    
-    def scrape_forecast_and_analysis(self) -> Dict:
-        """Scraping di previsioni e analisi"""
-        analysis_data = {}
-        
-        analysis_pages = ['statistics', 'forecast']
-        
-        for page in analysis_pages:
-            soup = self.get_page(self.urls[page])
-            if soup:
-                page_data = {
-                    'tables': self.scrape_table(soup),
-                    'metrics': self.scrape_key_statistics(soup)
-                }
-                analysis_data[page] = page_data
-        
-        return analysis_data
-    
-    def scrape_news(self) -> List[Dict]:
-        """Scraping delle news"""
-        soup = self.get_page(self.urls['news'])
-        if not soup:
-            return []
-        
+
+    def extract_news(self, soup: BeautifulSoup) -> List[Dict]:
+        """Articoli della pagina news"""
         news_data = []
         
         # Cerca articoli di news
@@ -288,7 +362,53 @@ class StockAnalysisScraper:
                 news_data.append(news_item)
         
         return news_data
+
+    def _scrape_pages(self, pages: List[str]) -> Dict[str, Any]:
+        """Dati estratti delle pagine scaricate con successo"""
+        ret = {}
+        for page in pages:
+            data = self.get_page_data(page)
+            if data is not None:
+                ret[page] = data
+        return ret
+
+    def scrape_overview(self) -> Dict:
+        """Scraping della pagina overview"""
+        return self.get_page_data('overview') or {}
+    
+    def scrape_financials(self) -> Dict:
+        """Scraping delle pagine finanziarie"""
+        pages = self._scrape_pages(['financials', 'balance-sheet', 'cash-flow', 'ratios'])
+        return {page.replace('-', '_'): data for page, data in pages.items()}
     
+    def scrape_performance_data(self) -> Dict:
+        """Scraping di dati su performance (revenue, earnings, dividend)"""
+        return self._scrape_pages(['revenue', 'earnings', 'dividend'])
+    
+    def scrape_forecast_and_analysis(self) -> Dict:
+        """Scraping di previsioni e analisi"""
+        return self._scrape_pages(['statistics', 'forecast'])
+    
+    def scrape_news(self) -> List[Dict]:
+        """Scraping delle news"""
+        return self.get_page_data('news') or []
+    
+    def scrape_section(self, section: str) -> Any:
+        """Scraping di una sola sezione, scaricando solo le pagine che le servono"""
+        scrapers = {
+            'overview': self.scrape_overview,
+            'financials': self.scrape_financials,
+            'performance': self.scrape_performance_data,
+            'analysis': self.scrape_forecast_and_analysis,
+            'news': self.scrape_news
+        }
+        if section not in scrapers:
+            raise ValueError(f"Sezione sconosciuta: {section}")
+        if self.concurrent:
+            self.prefetch(self.SECTIONS[section])
+        logger.info(f"Scraping {section} per {self.ticker}...")
+        return scrapers[section]()
+
     def scrape_all(self) -> ScrapedData:
         """Scraping completo di tutti i dati"""
         logger.info(f"Inizio scraping completo per {self.ticker}")
@@ -302,6 +422,10 @@ class StockAnalysisScraper:
         }
         
         try:
+            if self.concurrent:
+                logger.info(f"Download parallelo di {len(self.urls)} pagine...")
+                self.prefetch(list(self.urls))
+
             # Overview
             logger.info("Scraping overview...")
             all_data['overview'] = self.scrape_overview()
@@ -357,12 +481,10 @@ def main():
         print(f"🚀 Inizio scraping per {ticker}...")
         data = scraper.scrape_all()
         
-        # Salva i dati in un file JSON
-        filename = f"data/{ticker.lower()}_stockanalysis_data.json"
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(asdict(data), f, indent=2, ensure_ascii=False, default=str)
-        
-        print(f"✅ Dati salvati in {filename}")
+        # Salva lo snapshot nello storico (solo le sezioni cambiate occupano spazio)
+        store = SnapshotStore()
+        entry = store.save(as_document(data))
+        print(f"✅ Snapshot salvato in {store.root}/{entry['ticker']}")
         
         # Mostra un riepilogo
         total_items = 0
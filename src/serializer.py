@@ -0,0 +1,100 @@
+import dataclasses
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from functools import partial
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+import numpy as np
+import pandas as pd
+
+from columnar import frame_to_records, frame_to_split
+
+try:
+    import orjson
+except ImportError:  # orjson è opzionale: senza, si usa il modulo json della libreria standard
+    orjson = None
+
+
+def _default(orient: str, obj: Any) -> Any:
+    """Tipi non JSON nativi: DataFrame nel formato richiesto, scalari NumPy, il resto come str"""
+    if isinstance(obj, pd.DataFrame):
+        return frame_to_split(obj) if orient == 'split' else frame_to_records(obj)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return as_document(obj)
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return str(obj)
+
+
+def as_document(obj: Any) -> Dict[str, Any]:
+    """Dataclass -> dict dei soli campi di primo livello, senza la copia profonda di asdict"""
+    return {field.name: getattr(obj, field.name) for field in dataclasses.fields(obj)}
+
+
+def dumps(obj: Any, orient: str = 'records', sort_keys: bool = False, indent: bool = False) -> bytes:
+    """
+    JSON UTF-8 di obj (dict, liste, dataclass come ScrapedData, DataFrame in `orient`)
+    serializzato direttamente in bytes: con orjson senza copie intermedie del documento.
+    I documenti che orjson rifiuta (es. interi oltre i 64 bit di parse_number) passano
+    dal modulo json.
+    """
+    default = partial(_default, orient)
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(obj, default=default, option=option)
+        except orjson.JSONEncodeError:
+            pass
+    return json.dumps(obj, default=default, sort_keys=sort_keys, ensure_ascii=False,
+                      indent=2 if indent else None,
+                      separators=None if indent else (',', ':')).encode('utf-8')
+
+
+def loads(data: Any) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def etag(body: bytes) -> str:
+    """ETag debole del body (come Response.add_etag(weak=True))"""
+    return f'W/"{hashlib.sha1(body).hexdigest()}"'
+
+
+class BytesCache:
+    """
+    Cache LRU in memoria dei body già serializzati (con il loro ETag), per chiave e
+    versione dei dati: finché la voce sottostante non cambia (stessa versione, es. il
+    timestamp di salvataggio in cache) la risposta riusa gli stessi bytes.
+    """
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.entries: 'OrderedDict[Hashable, Tuple[Hashable, bytes, str]]' = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0}
+
+    def get(self, key: Hashable, version: Hashable, build: Callable[[], bytes]) -> Tuple[bytes, str]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == version:
+                self.entries.move_to_end(key)
+                self.counters['hits'] += 1
+                return entry[1], entry[2]
+            self.counters['misses'] += 1
+        body = build()
+        tag = etag(body)
+        if self.max_entries > 0:
+            with self.lock:
+                self.entries[key] = (version, body, tag)
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        return body, tag
+
+    def stats(self) -> Dict[str, int]:
+        return {'entries': len(self.entries), 'bytes': sum(len(e[1]) for e in self.entries.values()),
+                **self.counters}
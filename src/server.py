@@ -1,15 +1,33 @@
-import json
-from flask import Flask, send_from_directory
+import atexit
+import os
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, Response, make_response, request, send_from_directory
 from flask_cors import CORS
 from flask_caching import Cache
-from flask_restx import Api, Resource, fields
-from dataclasses import asdict, dataclass
-from typing import Optional
+from flask_restx import Api, Resource, fields, reqparse
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
 import random
+import time
 
+import columnar
+import projection
+import serializer
+from background_writer import BackgroundWriter
+from cache_store import CachedValue, SingleFlight, StaleWhileRevalidate
+from finnhub_provider import FinnhubProvider
+from fx_service import DEFAULT_CURRENCIES, FxService
+from http_conditional import init_conditional
+from portfolio import value_portfolio
+from prefetch_scheduler import PrefetchJob, PrefetchScheduler, WatchRegistry
+from providers import FIELDS, FinnhubQuoteProvider, ProviderRouter, StockAnalysisProvider, YahooProvider
+from quote_engine import QuoteEngine
+from quote_stream import QuoteHub
 from scraper_USD import USDEURScraperYF
 from scraper_stockanalysis import StockAnalysisScraper
-from scraper_yahoo import YahooFinanceScraper
+from snapshot_store import SnapshotStore
+from symbol_index import SymbolIndex, symbols_path
 
 app = Flask(__name__,
             static_url_path='', 
@@ -22,7 +40,68 @@ cors = CORS(app, resources={
     }
 })
 
-cache = Cache(app, config={'CACHE_TYPE': 'simple'})
+# Cache su SQLite condivisa tra i worker e persistente ai riavvii
+CACHE_PATH = os.environ.get('FINANZA_CACHE_PATH', 'cache/finanza.db')
+cache = Cache(app, config={
+    'CACHE_TYPE': 'cache_store.SQLiteCache',
+    'CACHE_SQLITE_PATH': CACHE_PATH,
+    'CACHE_DEFAULT_TIMEOUT': 300
+})
+
+# Con la cache condivisa un file lock per chiave evita che più worker scarichino
+# lo stesso ticker in contemporanea (FINANZA_CROSS_WORKER_LOCK=0 per disattivarlo)
+CROSS_WORKER_LOCK = os.environ.get('FINANZA_CROSS_WORKER_LOCK', '1') == '1'
+
+# TTL in secondi per endpoint e per sezione dei dati StockAnalysis ('tickerSA.<sezione>')
+CACHE_TTLS = {
+    'ticker': 30,
+    'fx': 60*5,
+    'usd': 60*5,
+    'tickerSA': 60*15,
+    'tickerSA.overview': 60*15,
+    'tickerSA.financials': 60*60*24,
+    'tickerSA.performance': 60*60*24,
+    'tickerSA.analysis': 60*60*6,
+    'tickerSA.news': 60*30,
+}
+
+# Età massima (secondi) oltre la quale una voce scaduta non viene più servita stale
+# e la richiesta attende il fetch; per default coincide con il TTL (nessuno stale)
+CACHE_MAX_STALE = {
+    'ticker': 60*5,
+    'fx': 60*60*24,
+    'usd': 60*60,
+    'tickerSA': 60*60*2,
+    'tickerSA.overview': 60*60*2,
+}
+
+flight = SingleFlight(lock_dir=os.path.join(os.path.dirname(CACHE_PATH) or '.', 'locks') if CROSS_WORKER_LOCK else None)
+swr = StaleWhileRevalidate(cache, flight=flight)
+
+# Storico degli scraping SA: all'avvio gli snapshot recenti riempiono la cache
+# (FINANZA_WARM_CACHE=0 per disattivare)
+snapshots = SnapshotStore(os.environ.get('FINANZA_SNAPSHOT_DIR', 'data/snapshots'))
+WARM_CACHE = os.environ.get('FINANZA_WARM_CACHE', '1') == '1'
+# Gli snapshot sono scritti da un thread in background, fuori dal percorso della richiesta
+snapshot_writer = BackgroundWriter(lambda ticker, doc: snapshots.save(columnar.to_serializable(doc)),
+                                   max_pending=int(os.environ.get('FINANZA_WRITER_QUEUE', '256')),
+                                   name='snapshot-writer')
+atexit.register(snapshot_writer.flush, 10.0)
+
+# Cambi: si scaricano le sole coppie USD/valuta e la matrice incrociata è calcolata in locale
+fx = FxService(currencies=os.environ.get('FINANZA_FX_CURRENCIES', ','.join(DEFAULT_CURRENCIES)).split(','),
+               ttl=CACHE_TTLS['fx'], max_stale=CACHE_MAX_STALE['fx'], swr=swr)
+
+# Prefetch in background dei simboli seguiti (usati dalle API negli ultimi 7 giorni o
+# elencati in FINANZA_WATCHLIST): quotazioni spesso in orario di borsa, dati SA di rado a
+# mercato chiuso nei giorni feriali, niente nel weekend e nelle festività NYSE: il lunedì la
+# cache torna calda nei 30 minuti prima dell'apertura (FINANZA_PREFETCH=0 per disattivarlo)
+PREFETCH = os.environ.get('FINANZA_PREFETCH', '1') == '1'
+watchlist = WatchRegistry(os.environ.get('FINANZA_WATCHLIST', 'watchlist.txt'))
+
+# Con FINANZA_COLUMNAR=1 le tabelle finanziarie restano DataFrame in cache (più compatte)
+# e sono convertite solo in risposta: ?format=records (default) o ?format=split
+COLUMNAR = os.environ.get('FINANZA_COLUMNAR', '0') == '1'
 
 # Configurazione API con Swagger automatico
 api = Api(
@@ -37,6 +116,24 @@ api = Api(
 # Namespace per organizzare gli endpoints
 ns_finanza = api.namespace('finanza', description='Operazioni di fin')
 
+# JSON serializzato in bytes con orjson (se installato) per tutte le risposte delle API;
+# i body delle voci di cache sono riusati finché la voce non cambia (FINANZA_RESPONSE_CACHE voci)
+response_bytes = serializer.BytesCache(int(os.environ.get('FINANZA_RESPONSE_CACHE', '256')))
+
+
+@api.representation('application/json')
+def output_json(data, code, headers=None):
+    """Rappresentazione JSON: i bytes già pronti passano così come sono"""
+    body = data if isinstance(data, bytes) else serializer.dumps(data)
+    response = make_response(body, code)
+    response.headers.extend(headers or {})
+    response.mimetype = 'application/json'
+    return response
+
+# ETag/Last-Modified con 304 e compressione gzip/br per le risposte JSON delle API
+# (FINANZA_COMPRESS_MIN: dimensione minima in byte del body da comprimere)
+init_conditional(app, prefix='/api/finanza', min_size=int(os.environ.get('FINANZA_COMPRESS_MIN', '500')))
+
 errore_model = api.model('Errore', {
     'success': fields.Boolean(description='Successo operazione'),
     'error': fields.String(description='Messaggio di errore')
@@ -68,44 +165,595 @@ def send_report(path):
 def hello_name(name):
    return 'Hello %s!' % name
 
+# Numero massimo di simboli per richiesta batch e thread usati per il fan-out
+MAX_BATCH_SYMBOLS = 50
+batch_executor = ThreadPoolExecutor(max_workers=8)
+# Scraping SA completi (11 pagine ciascuno) attesi al massimo per richiesta /tickers: gli
+# altri simboli senza dati in cache sono scaricati in background e segnalati in 'pending'
+MAX_COLD_SA = int(os.environ.get('FINANZA_MAX_COLD_SA', '3'))
+MAX_PORTFOLIO_HOLDINGS = 500
+# Numero massimo di path in ?fields=
+MAX_FIELDS = 50
+
+# Quotazioni Yahoo: un solo yf.download per tutti i simboli mancanti in cache di una
+# richiesta /tickers o di un giro dello stream (load_tickers), le richieste singole della
+# stessa finestra accorpate; .info solo per l'anagrafica, tenuta 6 ore
+quote_engine = QuoteEngine(pool_size=int(os.environ.get('FINANZA_TICKER_POOL', '256')))
+
+# Stream delle quotazioni: ogni simbolo è scaricato una volta per intervallo per tutti
+# i client iscritti, che ricevono solo i campi cambiati
+STREAM_INTERVAL = float(os.environ.get('FINANZA_STREAM_INTERVAL', '5'))
+STREAM_FIELDS = ('currentPrice', 'previousClose', 'open', 'dayLow', 'dayHigh',
+                 'regularMarketChangePercent', 'currency', 'shortName',
+                 'lastDividendValue', 'dividendRate')
+
+
+def cache_ttls(name: str) -> Tuple[int, int]:
+    """TTL e max stale (mai inferiore al TTL) di `name`"""
+    ttl = CACHE_TTLS[name]
+    return ttl, max(ttl, CACHE_MAX_STALE.get(name, ttl))
+
+
+def cached(name: str, ticker: str, loader) -> CachedValue:
+    """Legge `name/ticker` dalla cache in stale-while-revalidate con TTL e max stale di `name`"""
+    return swr.get(f"{name}/{ticker}", lambda: loader(ticker), *cache_ttls(name))
+
+
+def refresh_cached(name: str, ticker: str, loader):
+    """Accoda in background il fetch di `name/ticker` senza attenderlo"""
+    swr.refresh(f"{name}/{ticker}", lambda: loader(ticker), *cache_ttls(name))
+
+
+def cache_headers(result: CachedValue) -> Dict[str, str]:
+    """Header con età e stato della voce di cache servita"""
+    return {'Age': str(int(result.age)), 'X-Cache': result.status.upper()}
+
+
+def load_ticker(ticker: str) -> CachedValue:
+    """Info Yahoo Finance di un ticker (cache condivisa da /ticker e /tickers)"""
+    watchlist.touch(ticker)
+    return cached('ticker', ticker, scrape_ticker)
+
+
+def load_tickers(symbols: List[str]) -> Dict[str, CachedValue]:
+    """
+    Info Yahoo Finance di più simboli dalla stessa cache di load_ticker: i mancanti con un
+    solo quote_engine.quotes (un download), gli stale aggiornati insieme in background.
+    I simboli senza quotazione sono assenti dal risultato.
+    """
+    for symbol in symbols:
+        watchlist.touch(symbol)
+    return swr.get_many({symbol: f'ticker/{symbol}' for symbol in symbols}, quote_engine.quotes,
+                        *cache_ttls('ticker'))
+
+
+def load_ticker_sa(ticker: str) -> CachedValue:
+    """Dati StockAnalysis di un ticker (cache condivisa da /tickerSA e /tickers)"""
+    watchlist.touch(ticker)
+    return cached('tickerSA', ticker, scrape_ticker_sa)
+
+
+def load_ticker_sa_section(ticker: str, section: str) -> CachedValue:
+    """Una sezione dei dati StockAnalysis, in cache con il TTL della sezione"""
+    watchlist.touch(ticker)
+    return cached(f'tickerSA.{section}', ticker, lambda t: scrape_ticker_sa_section(t, section))
+
+
+def sa_sections(paths: List[str]) -> Optional[Set[str]]:
+    """Sezioni di StockAnalysis toccate dai path del documento completo; None se serve tutto"""
+    sections = set()
+    for path in paths:
+        parts = path.split('.')
+        if parts[0] == 'company_name':
+            sections.add('overview')
+        elif parts[0] == 'data':
+            if len(parts) < 2 or parts[1] not in StockAnalysisScraper.SECTIONS:
+                return None
+            sections.add(parts[1])
+    return sections or None
+
+
+def sa_fields_source(paths: List[str]) -> str:
+    """Voce di cache da cui si calcola la proiezione: la sezione se i path stanno in una sola"""
+    sections = sa_sections(paths)
+    if sections is None or len(sections) > 1:
+        return 'tickerSA'
+    return f'tickerSA.{sections.pop()}'
+
+
+def load_ticker_sa_fields(ticker: str, paths: List[str]) -> CachedValue:
+    """
+    Documento StockAnalysis per una proiezione: se i path stanno in una sola sezione si
+    carica (e scarica) solo quella, ricomposta nella forma del documento completo
+    """
+    name = sa_fields_source(paths)
+    if name == 'tickerSA':
+        return load_ticker_sa(ticker)
+    section = name.split('.', 1)[1]
+    result = load_ticker_sa_section(ticker, section)
+    doc = {'ticker': result.value['ticker'], 'last_updated': result.value['last_updated'],
+           'data': {section: result.value['data']}}
+    if section == 'overview':
+        doc['company_name'] = (result.value['data'].get('basic_info', {}).get('company_name')
+                               or result.value['ticker'])
+    return CachedValue(doc, result.age, result.status, result.stored_at)
+
+
+def load_projection(name: str, ticker: str, paths: List[str], loader) -> CachedValue:
+    """
+    Proiezione `paths` del documento `name/ticker`, in cache a sé con TTL e max stale del
+    documento (`name` è la voce che `loader` legge davvero, es. la sola sezione): una
+    proiezione fresca non rilegge né deserializza il documento completo. La proiezione è
+    salvata con lo stored_at del documento da cui è calcolata, così età e freschezza
+    restano quelle del documento. Le proiezioni hanno un namespace a sé ('fields.<name>')
+    nelle statistiche della cache.
+    """
+    watchlist.touch(ticker)
+    key = f"fields.{name}/{ticker}?fields={','.join(paths)}"
+    ttl, max_stale = cache_ttls(name)
+    result = swr.lookup(key, ttl, max_stale)
+    if result is not None and result.status == 'fresh':
+        return result
+    # Proiezione stale o assente: il documento (che intanto si aggiorna) dice se è cambiato
+    source = loader(ticker)
+    if result is not None and result.stored_at == source.stored_at:
+        return CachedValue(result.value, source.age, source.status, source.stored_at)
+    stored = swr.store(key, projection.project(source.value, paths), max_stale, source.stored_at)
+    return CachedValue(stored.value, source.age, source.status, source.stored_at)
+
+
+def requested_fields() -> Optional[List[str]]:
+    """Path di ?fields= (None se assente); ValueError se sono troppi"""
+    raw = request.args.get('fields')
+    if raw is None:
+        return None
+    paths = projection.parse_fields(raw)
+    if len(paths) > MAX_FIELDS:
+        raise ValueError(f'Massimo {MAX_FIELDS} campi per richiesta')
+    return paths
+
+
+def prefetch(name: str, loader):
+    """
+    Refresh per lo scheduler: scarica solo se la voce non è fresca, ma attende il fetch nel
+    worker dello scheduler (che così limita davvero i refresh in corso)
+    """
+    def refresh(ticker: str):
+        with app.app_context():
+            swr.load(f"{name}/{ticker}", lambda: loader(ticker), *cache_ttls(name))
+    return refresh
+
+
+def scrape_ticker(ticker: str) -> Dict:
+    """Quotazione compatta del ticker da Yahoo Finance, accorpata alle richieste concorrenti"""
+    return quote_engine.quote(ticker)
+
+
+def scrape_ticker_sa(ticker: str) -> Dict:
+    """Esegue lo scraping completo del ticker su StockAnalysis"""
+    # Crea lo scraper
+    scraper = StockAnalysisScraper(ticker, delay=0.3, concurrent=True, columnar=COLUMNAR)
+    # Esegue lo scraping
+    print(f"🚀 Inizio scraping per {ticker}...")
+    data = scraper.scrape_all()
+
+    # Dict dei soli campi di primo livello (niente copia profonda di asdict): lo stesso
+    # documento va in cache e, in background, nello storico
+    doc = serializer.as_document(data)
+    snapshot_writer.submit(data.ticker, doc)
+    return doc
+
+
+def scrape_ticker_sa_section(ticker: str, section: str) -> Dict:
+    """Scraping di una sola sezione; se il documento completo è fresco in cache lo riusa"""
+    full = swr.fresh(f'tickerSA/{ticker}', CACHE_TTLS['tickerSA'])
+    if full is not None:
+        return {'ticker': full['ticker'], 'section': section,
+                'last_updated': full['last_updated'], 'data': full['data'][section]}
+    scraper = StockAnalysisScraper(ticker, delay=0.3, concurrent=True, columnar=COLUMNAR)
+    print(f"🚀 Inizio scraping di {section} per {ticker}...")
+    return {'ticker': scraper.ticker, 'section': section,
+            'last_updated': datetime.now().isoformat(), 'data': scraper.scrape_section(section)}
+
+
+def warm_cache() -> int:
+    """Carica in cache l'ultimo snapshot di ogni ticker ancora entro il max stale di tickerSA"""
+    max_stale = max(CACHE_TTLS['tickerSA'], CACHE_MAX_STALE.get('tickerSA', 0))
+    warmed = 0
+    for ticker in snapshots.tickers():
+        entry = snapshots.latest_entry(ticker)
+        if entry is None or time.time() - entry['ts'] >= max_stale:
+            continue
+        try:
+            if swr.prime(f'tickerSA/{ticker}', snapshots.load(entry), entry['ts'], max_stale):
+                warmed += 1
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Snapshot di {ticker} non leggibile: {e}")
+    return warmed
+
+
+def respond(result: CachedValue, orient: str = 'records'):
+    """
+    Risposta JSON di una voce di cache: bytes ed ETag sono calcolati una volta per URL e
+    versione della voce, poi riusati finché la voce non viene aggiornata
+    """
+    body, tag = response_bytes.get(request.full_path, result.stored_at,
+                                   lambda: serializer.dumps(result.value, orient))
+    return body, 200, {**cache_headers(result), 'ETag': tag}
+
+
+def render_sa(result: CachedValue):
+    """Risposta con i dati SA: DataFrame in 'records' (default) o 'split' con ?format=split"""
+    orient = request.args.get('format', 'records')
+    if orient not in columnar.ORIENTS:
+        return {'success': False, 'error': f'Formato sconosciuto: {orient}'}, 400
+    return respond(result, orient)
+
+
+def load_in_context(loader, ticker: str):
+    """Esegue un loader in un thread del pool con l'app context attivo"""
+    with app.app_context():
+        return loader(ticker).value
+
+
+fields_parser = reqparse.RequestParser()
+fields_parser.add_argument('fields', type=str, location='args',
+                           help='Path puntati separati da virgola, es. data.overview.key_metrics.Dividend')
+
+
 @ns_finanza.route('/ticker/<string:ticker>')
 class Ticker(Resource):
-    @cache.cached(timeout=30)
+    @ns_finanza.expect(fields_parser)
+    @ns_finanza.response(400, 'Richiesta non valida', errore_model)
     def get(self,ticker):
-        """Torna tiker info da Yahoo Finance"""
-        print(f"🚀 Inizio scraping per {ticker}...")
-        # Crea lo scraper
-        scraper = YahooFinanceScraper(ticker, delay=1)
-        return scraper.data.yf_ticker.info
+        """Torna tiker info da Yahoo Finance (solo i campi indicati con ?fields=)"""
+        try:
+            paths = requested_fields()
+        except ValueError as e:
+            return {'success': False, 'error': str(e)}, 400
+        if paths is None:
+            result = load_ticker(ticker)
+        else:
+            result = load_projection('ticker', ticker, paths, load_ticker)
+        return respond(result)
 
 
 @ns_finanza.route('/tickerSA/<string:ticker>')
 class TickerSA(Resource):
-    @cache.cached(timeout=60*15)
+    @ns_finanza.expect(fields_parser)
+    @ns_finanza.response(400, 'Richiesta non valida', errore_model)
     def get(self,ticker):
-        """Torna tiker info da SA Finance"""
-        # Crea lo scraper
-        scraper = StockAnalysisScraper(ticker, delay=0.3)
-        # Esegue lo scraping
-        print(f"🚀 Inizio scraping per {ticker}...")
-        data = scraper.scrape_all()
-        
-        # Salva i dati in un file JSON
-        filename = f"data/{ticker.lower()}_stockanalysis_data.json"
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(asdict(data), f, indent=2, ensure_ascii=False, default=str)
-        #json.dumps(asdict(data), indent=2, ensure_ascii=False, default=str)
-            
-        return asdict(data)
+        """Torna tiker info da SA Finance; con ?fields= solo quei path, scaricando solo le sezioni necessarie"""
+        try:
+            paths = requested_fields()
+        except ValueError as e:
+            return {'success': False, 'error': str(e)}, 400
+        if paths is None:
+            return render_sa(load_ticker_sa(ticker))
+        return render_sa(load_projection(sa_fields_source(paths), ticker, paths,
+                                         lambda t: load_ticker_sa_fields(t, paths)))
+
+
+@ns_finanza.route('/tickerSA/<string:ticker>/<string:section>')
+@ns_finanza.doc(params={'section': 'Sezione: ' + ', '.join(StockAnalysisScraper.SECTIONS)})
+class TickerSASection(Resource):
+    @ns_finanza.expect(fields_parser)
+    @ns_finanza.response(400, 'Richiesta non valida', errore_model)
+    @ns_finanza.response(404, 'Sezione sconosciuta', errore_model)
+    def get(self, ticker, section):
+        """Torna una sola sezione dei dati SA, scaricando solo le pagine necessarie"""
+        if section not in StockAnalysisScraper.SECTIONS:
+            return {'success': False, 'error': f'Sezione sconosciuta: {section}'}, 404
+        try:
+            paths = requested_fields()
+        except ValueError as e:
+            return {'success': False, 'error': str(e)}, 400
+        if paths is None:
+            return render_sa(load_ticker_sa_section(ticker, section))
+        return render_sa(load_projection(f'tickerSA.{section}', ticker, paths,
+                                         lambda t: load_ticker_sa_section(t, section)))
+
+
+def parse_symbols(raw: str) -> List[str]:
+    """Simboli separati da virgola, maiuscoli e senza duplicati, nell'ordine dato"""
+    symbols: List[str] = []
+    for symbol in raw.split(','):
+        symbol = symbol.strip().upper()
+        if symbol and symbol not in symbols:
+            symbols.append(symbol)
+    return symbols
+
+
+# Elenco dei simboli caricato una volta all'avvio (dump Finnhub di scraper_finhub.py):
+# l'autocompletamento non fa mai richieste upstream
+symbol_index = SymbolIndex.load(symbols_path())
+MAX_SEARCH_RESULTS = 50
+
+search_parser = reqparse.RequestParser()
+search_parser.add_argument('q', type=str, required=True, location='args',
+                           help='Inizio del simbolo o del nome della società')
+search_parser.add_argument('limit', type=int, default=10, location='args',
+                           help=f'Numero massimo di risultati (al massimo {MAX_SEARCH_RESULTS})')
+
+
+@ns_finanza.route('/symbols/search')
+class SymbolSearch(Resource):
+    @ns_finanza.expect(search_parser)
+    def get(self):
+        """Autocompletamento: simboli e società che iniziano con q, dall'indice locale"""
+        args = search_parser.parse_args()
+        limit = min(max(args['limit'] or 10, 1), MAX_SEARCH_RESULTS)
+        return {'query': args['q'], 'results': symbol_index.search(args['q'], limit)}
+
+
+tickers_parser = reqparse.RequestParser()
+tickers_parser.add_argument('symbols', type=str, required=True, location='args',
+                            help='Simboli separati da virgola, es. AAPL,MSFT')
+
+
+@ns_finanza.route('/tickers')
+class Tickers(Resource):
+    @ns_finanza.expect(tickers_parser)
+    @ns_finanza.response(400, 'Richiesta non valida', errore_model)
+    def get(self):
+        """
+        Torna in una sola risposta ticker (Yahoo) e tickerSA (SA) di più simboli; i tickerSA
+        non in cache oltre i primi FINANZA_MAX_COLD_SA sono null e elencati in 'pending'
+        """
+        args = tickers_parser.parse_args()
+        symbols = parse_symbols(args['symbols'])
+        if not symbols:
+            return {'success': False, 'error': 'Nessun simbolo indicato'}, 400
+        if len(symbols) > MAX_BATCH_SYMBOLS:
+            return {'success': False, 'error': f'Massimo {MAX_BATCH_SYMBOLS} simboli per richiesta'}, 400
+
+        # SA in parallelo per simbolo, riusando le cache dei loader; dei simboli SA mai
+        # scaricati (o oltre il max stale) solo i primi MAX_COLD_SA
+        cold = [symbol for symbol in symbols if not cache.has(f'tickerSA/{symbol}')]
+        deferred = set(cold[MAX_COLD_SA:])
+        futures = {symbol: batch_executor.submit(load_in_context, load_ticker_sa, symbol)
+                   for symbol in symbols if symbol not in deferred}
+        for symbol in deferred:
+            watchlist.touch(symbol)
+            refresh_cached('tickerSA', symbol, scrape_ticker_sa)
+        # Yahoo: tutti i simboli mancanti in cache con un solo download
+        try:
+            quotes = load_tickers(symbols)
+        except Exception as e:
+            print(f"⚠️ Quotazioni non disponibili: {e}")
+            quotes = {}
+        results = {}
+        errors = {}
+        for symbol in symbols:
+            try:
+                if symbol not in quotes:
+                    raise KeyError(f"Nessuna quotazione per {symbol}")
+                sa = futures[symbol].result() if symbol in futures else None
+                results[symbol] = columnar.to_serializable({'ticker': quotes[symbol].value, 'tickerSA': sa})
+            except Exception as e:
+                errors[symbol] = str(e).strip("'")
+        return {'results': results, 'errors': errors, 'pending': [s for s in symbols if s in deferred]}
+
+
+def usd_rate(symbol: str) -> Optional[float]:
+    """Valore di /usd/<simbolo>: dalla matrice dei cambi, o con USDEURScraperYF (in cache) se non coperto"""
+    with app.app_context():
+        rate = fx.symbol_rate(symbol)
+        if rate is not None:
+            return rate
+        return cached('usd', symbol, lambda s: USDEURScraperYF(s).get_usd_eur_rate()).value
+
+
+def fetch_quotes(symbols: Set[str]) -> Dict[str, Dict]:
+    """Campi dello stream per un giro: i cambi (es. USDEUR=X) come /usd, i titoli dalla cache Yahoo in batch"""
+    ret = {}
+    for symbol in symbols:
+        if symbol.endswith('=X'):
+            try:
+                ret[symbol] = {'rate': usd_rate(symbol)}
+            except Exception as e:
+                print(f"⚠️ Cambio {symbol} non disponibile: {e}")
+    for symbol, result in load_tickers(sorted(s for s in symbols if not s.endswith('=X'))).items():
+        ret[symbol] = {name: result.value.get(name) for name in STREAM_FIELDS}
+    return ret
+
+
+quote_hub = QuoteHub(fetch_quotes, interval=STREAM_INTERVAL)
+
+
+@ns_finanza.route('/stream')
+class Stream(Resource):
+    @ns_finanza.expect(tickers_parser)
+    @ns_finanza.response(400, 'Richiesta non valida', errore_model)
+    def get(self):
+        """Stream Server-Sent Events (evento 'quote') con i soli campi cambiati dei simboli richiesti"""
+        symbols = parse_symbols(tickers_parser.parse_args()['symbols'])
+        if not symbols:
+            return {'success': False, 'error': 'Nessun simbolo indicato'}, 400
+        if len(symbols) > MAX_BATCH_SYMBOLS:
+            return {'success': False, 'error': f'Massimo {MAX_BATCH_SYMBOLS} simboli per richiesta'}, 400
+        subscriber = quote_hub.subscribe(set(symbols))
+        return Response(quote_hub.events(subscriber), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+holding_model = api.model('Posizione', {
+    'symbol': fields.String(required=True, example='AAPL'),
+    'quantity': fields.Float(required=True, description='Numero di azioni'),
+    'cost': fields.Float(description='Prezzo di carico per azione, nella valuta del titolo'),
+    'currency': fields.String(description='Valuta del titolo (default: quella della quotazione)')
+})
+
+valuation_model = api.model('Valutazione', {
+    'currency': fields.String(description='Valuta dei totali oltre a USD', example='EUR'),
+    'holdings': fields.List(fields.Nested(holding_model), required=True)
+})
+
+
+@ns_finanza.route('/portfolio/valuation')
+class PortfolioValuation(Resource):
+    @ns_finanza.expect(valuation_model)
+    @ns_finanza.response(400, 'Richiesta non valida', errore_model)
+    def post(self):
+        """Valore di mercato, P&L, dividendi e yield del portafoglio, per posizione e in totale"""
+        payload = api.payload or {}
+        holdings = payload.get('holdings') or []
+        if not holdings or not all(isinstance(h, dict) and h.get('symbol') for h in holdings):
+            return {'success': False, 'error': 'Indicare le posizioni con almeno il simbolo'}, 400
+        if len(holdings) > MAX_PORTFOLIO_HOLDINGS:
+            return {'success': False, 'error': f'Massimo {MAX_PORTFOLIO_HOLDINGS} posizioni per richiesta'}, 400
+
+        # Quotazioni dalla cache; i simboli mancanti con un solo quote_engine.quotes
+        symbols = list(dict.fromkeys(str(h['symbol']).upper() for h in holdings))
+        try:
+            quotes = {symbol: result.value for symbol, result in load_tickers(symbols).items()}
+        except Exception as e:
+            print(f"⚠️ Quotazioni non disponibili: {e}")
+            quotes = {}
+        try:
+            return value_portfolio(holdings, quotes, fx.rate, fx.base, str(payload.get('currency') or 'EUR').upper())
+        except (KeyError, TypeError, ValueError) as e:
+            return {'success': False, 'error': str(e).strip("'")}, 400
 
 
 @ns_finanza.route('/usd/<string:ticker>')
 class Ticker(Resource):
     def get(self,ticker):
         """Torna USD da Yahoo Finance EURUSD=X"""
-        # Crea lo scraper
-        scraper = USDEURScraperYF(ticker)
-        return scraper.get_usd_eur_rate()
+        return usd_rate(ticker.upper())
+
+
+fx_parser = reqparse.RequestParser()
+fx_parser.add_argument('base', type=str, location='args', help='Valuta di partenza, es. EUR (default: tutta la matrice)')
+
+convert_item_model = api.model('ImportoValuta', {
+    'amount': fields.Float(required=True, description='Importo'),
+    'currency': fields.String(description='Valuta, default USD', example='USD')
+})
+
+convert_model = api.model('Conversione', {
+    'currency': fields.String(required=True, description='Valuta di arrivo', example='EUR'),
+    'items': fields.List(fields.Nested(convert_item_model), required=True)
+})
+
+
+@ns_finanza.route('/fx')
+class Fx(Resource):
+    @ns_finanza.expect(fx_parser)
+    @ns_finanza.response(400, 'Valuta non supportata', errore_model)
+    def get(self):
+        """Torna la matrice dei cambi {da: {a: tasso}}, o la sola riga della valuta base"""
+        matrix = fx.matrix()
+        base = (fx_parser.parse_args()['base'] or '').upper()
+        if base:
+            if base not in matrix['rates']:
+                return {'success': False, 'error': f'Valuta non supportata: {base}'}, 400
+            return {'base': base, 'age': matrix['age'], 'rates': matrix['rates'][base]}
+        return matrix
+
+
+@ns_finanza.route('/fx/convert')
+class FxConvert(Resource):
+    @ns_finanza.expect(convert_model)
+    @ns_finanza.response(400, 'Richiesta non valida', errore_model)
+    def post(self):
+        """Converte più importi nella valuta indicata con un solo snapshot dei tassi in cache"""
+        payload = api.payload or {}
+        try:
+            return fx.convert(payload.get('items') or [], payload.get('currency', 'EUR'))
+        except (KeyError, TypeError, ValueError) as e:
+            return {'success': False, 'error': str(e).strip("'")}, 400
+
+
+snapshot_parser = reqparse.RequestParser()
+snapshot_parser.add_argument('as_of', type=str, location='args',
+                             help='Data (YYYY-MM-DD) o data/ora ISO; default: ultimo snapshot')
+
+
+@ns_finanza.route('/snapshots/<string:ticker>')
+class Snapshot(Resource):
+    @ns_finanza.expect(snapshot_parser)
+    @ns_finanza.response(404, 'Nessuno snapshot', errore_model)
+    def get(self, ticker):
+        """Torna i dati SA salvati nello storico: l'ultimo o quello valido alla data as_of"""
+        as_of = snapshot_parser.parse_args()['as_of']
+        try:
+            doc = snapshots.as_of(ticker, as_of) if as_of else snapshots.latest(ticker)
+        except ValueError:
+            return {'success': False, 'error': f'Data non valida: {as_of}'}, 400
+        if doc is None:
+            return {'success': False, 'error': f'Nessuno snapshot per {ticker.upper()}'}, 404
+        return doc
+
+
+@ns_finanza.route('/cache/stats')
+class CacheStats(Resource):
+    def get(self):
+        """Torna hit e miss della cache per namespace"""
+        return cache.cache.stats()
+
+
+@ns_finanza.route('/prefetch/stats')
+class PrefetchStats(Resource):
+    def get(self):
+        """Torna sessione di borsa, simboli seguiti e prossimi aggiornamenti del prefetch"""
+        return prefetcher.stats()
+
+
+# Router tra i provider che si sovrappongono su prezzo, dividendo, nome e valuta: Yahoo e
+# StockAnalysis passano dalle cache dei loader, Finnhub solo se c'è la chiave API
+PROVIDER_BUDGET = float(os.environ.get('FINANZA_PROVIDER_BUDGET', '2.0'))
+provider_list = [
+    YahooProvider(lambda symbol: load_in_context(load_ticker, symbol)),
+    StockAnalysisProvider(lambda symbol: load_in_context(
+        lambda t: load_ticker_sa_section(t, 'overview'), symbol)['data']),
+]
+if os.environ.get('FINANZA_FINNHUB_KEY'):
+    provider_list.append(FinnhubQuoteProvider(FinnhubProvider.from_env(cache=cache.cache, flight=flight)))
+router = ProviderRouter(provider_list, budget=PROVIDER_BUDGET,
+                        hedge_delay=float(os.environ.get('FINANZA_HEDGE_DELAY', '0.3')))
+
+best_parser = reqparse.RequestParser()
+best_parser.add_argument('fields', type=str, location='args',
+                         help='Campi separati da virgola tra ' + ', '.join(FIELDS))
+best_parser.add_argument('budget_ms', type=int, location='args',
+                         help=f'Budget di latenza in millisecondi (default {int(PROVIDER_BUDGET * 1000)})')
+
+
+@ns_finanza.route('/best/<string:ticker>')
+class BestQuote(Resource):
+    @ns_finanza.expect(best_parser)
+    @ns_finanza.response(400, 'Campo sconosciuto', errore_model)
+    def get(self, ticker):
+        """Prima risposta valida per campo tra i provider, in ordine di punteggio e con hedging, entro il budget"""
+        args = best_parser.parse_args()
+        fields = [f.strip() for f in (args['fields'] or ','.join(FIELDS)).split(',') if f.strip()]
+        unknown = [f for f in fields if f not in FIELDS]
+        if unknown or not fields:
+            return {'success': False, 'error': f"Campi sconosciuti: {', '.join(unknown) or '-'}"}, 400
+        budget = min(args['budget_ms'], 30000) / 1000 if args['budget_ms'] else None
+        return router.fetch(ticker, fields, budget=budget)
+
+
+@ns_finanza.route('/providers/stats')
+class ProviderStats(Resource):
+    def get(self):
+        """Torna latenza e tasso di errore (medie mobili) dei provider, dal migliore"""
+        return router.stats()
+
+
+@ns_finanza.route('/quotes/stats')
+class QuoteStats(Resource):
+    def get(self):
+        """Torna dimensione del pool di Ticker e chiamate a yfinance del motore quotazioni"""
+        return quote_engine.stats()
+
+
+@ns_finanza.route('/writer/stats')
+class WriterStats(Resource):
+    def get(self):
+        """Torna profondità della coda e scritture (eseguite, coalescenti, scartate) dello storico"""
+        return snapshot_writer.stats()
 
 
 # Error handlers automatici
@@ -114,6 +762,20 @@ def default_error_handler(error):
     """Gestore errori di default"""
     return {'success': False, 'error': str(error)}, getattr(error, 'code', 500)
 
+if WARM_CACHE:
+    print(f"🔥 Cache riscaldata con {warm_cache()} ticker dallo storico")
+
+# Gli intervalli, jitter compreso, restano sotto l'80% del max stale: la voce non scade
+# tra due aggiornamenti ed è sempre servita subito dalla cache
+prefetcher = PrefetchScheduler(watchlist, [
+    PrefetchJob('ticker', prefetch('ticker', scrape_ticker),
+                open_interval=60*4, max_interval=0.8 * cache_ttls('ticker')[1]),
+    PrefetchJob('tickerSA', prefetch('tickerSA', scrape_ticker_sa),
+                open_interval=60*30, closed_interval=60*90, max_interval=0.8 * cache_ttls('tickerSA')[1]),
+])
+if PREFETCH:
+    prefetcher.start()
+
 if __name__ == '__main__':
     print("🚀 Avvio API REST")
     print("📚 Swagger UI disponibile su: http://localhost:5000/swagger/")
@@ -0,0 +1,233 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from datetime import date, datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import serializer
+
+try:
+    import fcntl
+except ImportError:  # Windows: niente lock tra processi sull'indice
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+When = Union[datetime, date, str, float]
+
+GZIP_MAGIC = b'\x1f\x8b\x08'
+
+
+def read_members(data: bytes) -> Tuple[List[bytes], List[Tuple[int, int]]]:
+    """
+    Contenuto e posizione (inizio, fine) dei membri gzip integri di `data`. Un membro
+    troncato o danneggiato è saltato e la lettura riprende dal membro successivo (il
+    prossimo header gzip), così i membri scritti dopo restano leggibili.
+    """
+    view = memoryview(data)
+    chunks: List[bytes] = []
+    spans: List[Tuple[int, int]] = []
+    pos = 0
+    while pos < len(data):
+        decompressor = zlib.decompressobj(wbits=31)
+        try:
+            chunk = decompressor.decompress(view[pos:])
+            if not decompressor.eof:
+                raise zlib.error('membro troncato')
+        except zlib.error:
+            pos = data.find(GZIP_MAGIC, pos + 1)
+            if pos < 0:
+                break
+            continue
+        end = len(data) - len(decompressor.unused_data)
+        chunks.append(chunk)
+        spans.append((pos, end))
+        pos = end
+    return chunks, spans
+
+
+class SnapshotStore:
+    """
+    Storico append-only degli scraping StockAnalysis, partizionato per ticker e giorno:
+
+        <root>/<ticker>/index/<YYYY-MM-DD>.jsonl.gz   una riga per snapshot (membri gzip in append)
+        <root>/<ticker>/objects/<sha256>.json.gz      contenuto di una sezione, indirizzato per hash
+
+    Ogni riga dell'indice riporta l'hash di ogni sezione di `data`: una sezione è scritta su
+    disco solo se il suo contenuto non è già presente, quindi gli snapshot successivi
+    occupano spazio solo per le sezioni cambiate.
+    """
+    def __init__(self, root: str = 'data/snapshots'):
+        self.root = root
+        self.lock = threading.Lock()
+
+    def _ticker_dir(self, ticker: str) -> str:
+        return os.path.join(self.root, ticker.upper())
+
+    def _object_path(self, ticker: str, digest: str) -> str:
+        return os.path.join(self._ticker_dir(ticker), 'objects', f"{digest}.json.gz")
+
+    def _index_dir(self, ticker: str) -> str:
+        return os.path.join(self._ticker_dir(ticker), 'index')
+
+    @staticmethod
+    def _encode(value: Any) -> bytes:
+        """JSON canonico (chiavi ordinate, niente spazi): stesso contenuto, stesso hash"""
+        return serializer.dumps(value, sort_keys=True)
+
+    def _put_object(self, ticker: str, payload: bytes) -> str:
+        digest = hashlib.sha256(payload).hexdigest()
+        path = self._object_path(ticker, digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Scrittura su file temporaneo e rename atomico: i lettori non vedono mai file a metà
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, 'wb') as f:
+                f.write(gzip.compress(payload))
+            os.replace(tmp, path)
+        return digest
+
+    def _get_object(self, ticker: str, digest: str) -> Any:
+        with gzip.open(self._object_path(ticker, digest), 'rb') as f:
+            return serializer.loads(f.read())
+
+    def save(self, doc: Dict) -> Dict:
+        """
+        Salva uno snapshot di `doc` (campi di ScrapedData come dict) e torna la riga dell'indice.
+        Le sezioni già presenti con lo stesso contenuto non vengono riscritte.
+        """
+        ticker = doc['ticker'].upper()
+        now = datetime.now()
+        sections = {name: self._put_object(ticker, self._encode(value))
+                    for name, value in doc.get('data', {}).items()}
+        entry = {
+            'ts': now.timestamp(),
+            'ticker': ticker,
+            'company_name': doc.get('company_name'),
+            'last_updated': doc.get('last_updated'),
+            'sections': sections
+        }
+        previous = self.latest_entry(ticker)
+        changed = [name for name, digest in sections.items()
+                   if previous is None or previous['sections'].get(name) != digest]
+        self._append(ticker, now.date().isoformat(), entry)
+        logger.info(f"Snapshot {ticker}: {len(changed)}/{len(sections)} sezioni cambiate")
+        return entry
+
+    def _append(self, ticker: str, day: str, entry: Dict):
+        """
+        Accoda la riga come nuovo membro gzip del file del giorno. Se il file ha membri
+        danneggiati (es. un append interrotto da un crash) prima lo riscrive con i soli
+        membri integri, così la nuova riga non finisce dietro un membro illeggibile.
+        """
+        folder = self._index_dir(ticker)
+        os.makedirs(folder, exist_ok=True)
+        member = gzip.compress(self._encode(entry) + b'\n')
+        path = os.path.join(folder, f"{day}.jsonl.gz")
+        with self.lock, open(os.open(path, os.O_RDWR | os.O_CREAT, 0o644), 'r+b') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                data = f.read()
+                _, spans = read_members(data)
+                if sum(end - start for start, end in spans) != len(data):
+                    logger.warning(f"Indice {path} danneggiato: riscritto con {len(spans)} membri integri")
+                    f.seek(0)
+                    f.write(b''.join(data[start:end] for start, end in spans))
+                    f.truncate()
+                f.seek(0, os.SEEK_END)
+                f.write(member)
+                f.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def tickers(self) -> List[str]:
+        """Ticker con almeno uno snapshot"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root) if os.path.isdir(self._index_dir(name)))
+
+    def days(self, ticker: str) -> List[str]:
+        """Giorni (YYYY-MM-DD) con snapshot del ticker, in ordine"""
+        folder = self._index_dir(ticker)
+        if not os.path.isdir(folder):
+            return []
+        return sorted(name[:-len('.jsonl.gz')] for name in os.listdir(folder) if name.endswith('.jsonl.gz'))
+
+    def entries(self, ticker: str, day: str) -> List[Dict]:
+        """Righe dell'indice di un giorno, in ordine di scrittura (saltando i membri danneggiati)"""
+        path = os.path.join(self._index_dir(ticker), f"{day}.jsonl.gz")
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        chunks, spans = read_members(data)
+        if sum(end - start for start, end in spans) != len(data):
+            logger.warning(f"Indice {path} danneggiato, letti {len(chunks)} membri integri")
+        entries = []
+        for line in b''.join(chunks).splitlines():
+            if not line.strip():
+                continue
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                logger.warning(f"Riga non valida in {path}: {e}")
+        return entries
+
+    def history(self, ticker: str) -> Iterator[Dict]:
+        """Tutte le righe dell'indice del ticker, dalla più vecchia"""
+        for day in self.days(ticker):
+            yield from self.entries(ticker, day)
+
+    def latest_entry(self, ticker: str) -> Optional[Dict]:
+        return self.entry_as_of(ticker, time.time())
+
+    def entry_as_of(self, ticker: str, when: When) -> Optional[Dict]:
+        """Ultima riga dell'indice scritta entro `when`"""
+        ts = _timestamp(when)
+        limit = datetime.fromtimestamp(ts).date().isoformat()
+        for day in reversed(self.days(ticker)):
+            if day > limit:
+                continue
+            candidates = [entry for entry in self.entries(ticker, day) if entry['ts'] <= ts]
+            if candidates:
+                return candidates[-1]
+        return None
+
+    def load(self, entry: Dict) -> Dict:
+        """Ricostruisce il documento (stessa forma di asdict(ScrapedData)) di una riga dell'indice"""
+        return {
+            'ticker': entry['ticker'],
+            'company_name': entry['company_name'],
+            'last_updated': entry['last_updated'],
+            'data': {name: self._get_object(entry['ticker'], digest)
+                     for name, digest in entry['sections'].items()}
+        }
+
+    def latest(self, ticker: str) -> Optional[Dict]:
+        """Ultimo snapshot del ticker, o None"""
+        entry = self.latest_entry(ticker)
+        return self.load(entry) if entry else None
+
+    def as_of(self, ticker: str, when: When) -> Optional[Dict]:
+        """Snapshot del ticker valido alla data/ora `when` (una data indica la fine del giorno)"""
+        entry = self.entry_as_of(ticker, when)
+        return self.load(entry) if entry else None
+
+
+def _timestamp(when: When) -> float:
+    """Timestamp da datetime, date (fine giornata), stringa ISO o numero"""
+    if isinstance(when, (int, float)):
+        return float(when)
+    if isinstance(when, str):
+        when = datetime.fromisoformat(when) if 'T' in when or ' ' in when else date.fromisoformat(when)
+    if isinstance(when, datetime):
+        return when.timestamp()
+    return datetime.combine(when, datetime.max.time()).timestamp()
@@ -0,0 +1,96 @@
+import logging
+import os
+import re
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+
+import serializer
+
+logger = logging.getLogger(__name__)
+
+# Parole del nome della società (lettere e cifre), per la ricerca per prefisso
+WORD_RE = re.compile(r'[A-Z0-9]+')
+
+
+class SymbolIndex:
+    """
+    Indice in memoria per l'autocompletamento dei simboli: array ordinati di chiavi
+    (simboli e parole dei nomi) con ricerca per prefisso tramite bisect. I simboli che
+    iniziano con la query vengono prima (in ordine alfabetico, quindi il simbolo esatto
+    per primo), poi le società il cui nome contiene parole che iniziano con ogni termine.
+    """
+    def __init__(self, records: List[Dict]):
+        self.records = [r for r in records if r.get('symbol')]
+        self.symbols: List[Tuple[str, int]] = sorted(
+            (str(r['symbol']).upper(), i) for i, r in enumerate(self.records))
+        self.symbol_keys = [key for key, _ in self.symbols]
+        self.words: List[Tuple[str, int]] = sorted(
+            {(word, i) for i, r in enumerate(self.records)
+             for word in WORD_RE.findall(str(r.get('description') or '').upper())})
+        self.word_keys = [key for key, _ in self.words]
+
+    @classmethod
+    def load(cls, path: str) -> 'SymbolIndex':
+        """Indice dal dump JSON di Finnhub stock_symbols (vuoto se il file non c'è)"""
+        if not os.path.exists(path):
+            logger.warning(f"Elenco simboli {path} non trovato: autocompletamento vuoto")
+            return cls([])
+        with open(path, 'rb') as f:
+            records = serializer.loads(f.read())
+        index = cls(records)
+        logger.info(f"Elenco simboli {path}: {len(index)} simboli")
+        return index
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @staticmethod
+    def _prefixed(keys: List[str], entries: List[Tuple[str, int]], prefix: str):
+        """Indici dei record con chiave che inizia con prefix, in ordine di chiave"""
+        for pos in range(bisect_left(keys, prefix), len(keys)):
+            if not keys[pos].startswith(prefix):
+                return
+            yield entries[pos][1]
+
+    def _result(self, i: int) -> Dict:
+        r = self.records[i]
+        return {'symbol': r['symbol'], 'description': r.get('description'), 'type': r.get('type'),
+                'currency': r.get('currency')}
+
+    def search(self, query: str, limit: int = 10) -> List[Dict]:
+        terms = WORD_RE.findall(query.upper())
+        if not terms or limit <= 0:
+            return []
+        found: List[int] = []
+        seen = set()
+
+        symbol = query.strip().upper()
+        if symbol:
+            for i in self._prefixed(self.symbol_keys, self.symbols, symbol):
+                if i not in seen:
+                    seen.add(i)
+                    found.append(i)
+                if len(found) >= limit:
+                    return [self._result(i) for i in found]
+
+        # Candidati dal termine più lungo (il più selettivo), poi filtro sugli altri termini
+        longest = max(terms, key=len)
+        others = [t for t in terms if t is not longest]
+        for i in self._prefixed(self.word_keys, self.words, longest):
+            if i in seen:
+                continue
+            seen.add(i)
+            if others:
+                words = WORD_RE.findall(str(self.records[i].get('description') or '').upper())
+                if not all(any(w.startswith(t) for w in words) for t in others):
+                    continue
+            found.append(i)
+            if len(found) >= limit:
+                break
+        return [self._result(i) for i in found]
+
+
+def symbols_path(exchange: str = 'US') -> str:
+    """Percorso del dump dei simboli della borsa (FINANZA_SYMBOLS per gli US)"""
+    default = os.path.join('data', f'symbols_{exchange}.json')
+    return os.environ.get('FINANZA_SYMBOLS', default) if exchange == 'US' else default
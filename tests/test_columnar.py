@@ -0,0 +1,24 @@
+from columnar import frame_to_records, frame_to_split, records_to_frame
+
+
+def test_round_trip_keeps_rows_of_different_tables():
+    rows = [{'Year': 2024, 'Revenue': 1.5}, {'Year': 2023, 'Revenue': None},
+            {'Metric': 'PE', 'Value': '12.3x'}]
+    frame = records_to_frame(rows)
+    assert str(frame['Year'].dtype) == 'Int64'
+    assert frame_to_records(frame) == rows
+
+
+def test_ints_beyond_64_bits_stay_in_an_object_column():
+    rows = [{'a': 2 ** 70}, {'a': 1}, {'a': None}]
+    frame = records_to_frame(rows)
+    assert frame['a'].dtype == object
+    assert frame_to_records(frame) == rows
+    assert frame_to_split(frame) == {'columns': ['a'], 'data': [[2 ** 70], [1], [None]]}
+
+
+def test_int64_bounds_still_use_the_nullable_int_column():
+    rows = [{'a': 2 ** 63 - 1}, {'a': -2 ** 63}]
+    frame = records_to_frame(rows)
+    assert str(frame['a'].dtype) == 'Int64'
+    assert frame_to_records(frame) == rows
@@ -0,0 +1,103 @@
+import threading
+import time
+
+import pytest
+
+from cache_store import SQLiteCache
+from finnhub_provider import FinnhubError, FinnhubProvider
+from http_client import HttpClient
+from rate_limiter import BACKGROUND
+
+
+@pytest.fixture
+def make_provider(stub_server, tmp_path):
+    def make(**kwargs):
+        kwargs.setdefault('cache', SQLiteCache(str(tmp_path / 'cache.db')))
+        kwargs.setdefault('http', HttpClient(retries=0, backoff=0.01))
+        return FinnhubProvider('test-key', base_url=stub_server.url, **kwargs)
+    return make
+
+
+def test_local_server_takes_the_place_of_finnhub(stub_server, make_provider):
+    stub_server.handle = lambda path, query: (200, {}, {'c': 123.4, 'symbol': query['symbol']})
+    provider = make_provider()
+    assert provider.quote('aapl') == {'c': 123.4, 'symbol': 'AAPL'}
+    request = stub_server.requests[0]
+    assert request['path'] == '/quote' and request['headers']['X-Finnhub-Token'] == 'test-key'
+
+
+def test_interactive_requests_go_before_queued_background_ones(stub_server, make_provider):
+    stub_server.handle = lambda path, query: (200, {}, {'c': 1.0})
+    # 10 chiamate al secondo, burst di 1
+    provider = make_provider(calls_per_minute=601, burst=1)
+    provider.quote('WARM')
+    background = [threading.Thread(target=provider.quote, args=(s,), kwargs={'priority': BACKGROUND})
+                  for s in ('BG1', 'BG2', 'BG3')]
+    for thread in background:
+        thread.start()
+        time.sleep(0.01)
+    provider.quote('USER')
+    for thread in background:
+        thread.join(5)
+    order = [r['query']['symbol'] for r in stub_server.requests]
+    assert order == ['WARM', 'USER', 'BG1', 'BG2', 'BG3']
+    assert provider.stats()['interactive'] == 2 and provider.stats()['background'] == 3
+
+
+def test_per_endpoint_ttls(stub_server, make_provider):
+    stub_server.handle = lambda path, query: (200, {}, {'path': path})
+    provider = make_provider(ttls={'quote': 1})
+    for _ in range(3):
+        provider.company_profile('MSFT')
+        provider.quote('MSFT')
+    # Anagrafica per giorni, quotazione per 1 s (override di FINNHUB_TTLS)
+    assert stub_server.paths() == ['/stock/profile2', '/quote']
+    assert provider.stats()['hits'] == 4
+    time.sleep(1.1)
+    provider.company_profile('MSFT')
+    provider.quote('MSFT')
+    assert stub_server.paths() == ['/stock/profile2', '/quote', '/quote']
+
+
+def test_429_is_retried_after_retry_after(stub_server, make_provider):
+    responses = [(429, {'Retry-After': '0'}, {'error': 'limit'}), (200, {}, {'c': 2.0})]
+    stub_server.handle = lambda path, query: responses.pop(0)
+    provider = make_provider(http=HttpClient(retries=2, backoff=0.01))
+    assert provider.quote('IBM') == {'c': 2.0}
+    assert len(stub_server.requests) == 2
+
+
+def test_429_after_retries_raises_and_is_not_cached(stub_server, make_provider):
+    stub_server.handle = lambda path, query: (429, {'Retry-After': '0'}, {'error': 'limit'})
+    provider = make_provider(http=HttpClient(retries=1, backoff=0.01))
+    for _ in range(2):
+        with pytest.raises(FinnhubError, match='HTTP 429'):
+            provider.quote('IBM')
+    assert len(stub_server.requests) == 4
+    assert provider.stats()['errors'] == 2 and provider.stats()['hits'] == 0
+
+
+def test_exhausted_quota_fails_after_queue_timeout(stub_server, make_provider):
+    stub_server.handle = lambda path, query: (200, {}, {'c': 1.0})
+    # Un token al minuto, burst di 1: la seconda chiamata resta in coda
+    provider = make_provider(calls_per_minute=2, burst=1, queue_timeout=0.2)
+    provider.quote('A')
+    start = time.monotonic()
+    with pytest.raises(FinnhubError, match='Quota Finnhub'):
+        provider.quote('B')
+    assert 0.15 <= time.monotonic() - start < 2.0
+    assert len(stub_server.requests) == 1
+
+
+def test_quota_is_shared_by_providers_on_the_same_bucket(stub_server, make_provider, tmp_path):
+    stub_server.handle = lambda path, query: (200, {}, {'c': 1.0})
+    bucket = str(tmp_path / 'finnhub.bucket')
+    workers = [make_provider(calls_per_minute=3, burst=2, queue_timeout=0.1, bucket_path=bucket) for _ in range(2)]
+    results = []
+    for i, provider in enumerate(workers * 2):
+        try:
+            provider.quote(f'S{i}')
+            results.append(True)
+        except FinnhubError:
+            results.append(False)
+    assert results.count(True) == 2
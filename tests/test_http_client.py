@@ -0,0 +1,94 @@
+import socket
+import threading
+import time
+
+import pytest
+import requests
+
+from http_client import ConditionalCache, HttpClient
+
+
+def test_retries_on_5xx_then_succeeds(stub_server):
+    responses = [(503, {}, {}), (502, {}, {}), (200, {}, {'ok': True})]
+    stub_server.handle = lambda path, query: responses.pop(0)
+    client = HttpClient(retries=3, backoff=0.01)
+    response = client.get(stub_server.url + '/data')
+    assert response.status_code == 200 and response.json() == {'ok': True}
+    assert len(stub_server.requests) == 3
+    assert client.stats() == {'requests': 3, 'retries': 2, 'failures': 0}
+
+
+def test_gives_up_after_retries_with_the_last_response(stub_server):
+    stub_server.handle = lambda path, query: (500, {}, {})
+    client = HttpClient(retries=2, backoff=0.01)
+    assert client.get(stub_server.url + '/data').status_code == 500
+    assert len(stub_server.requests) == 3
+    assert client.stats()['failures'] == 1
+
+
+def test_client_errors_are_not_retried(stub_server):
+    stub_server.handle = lambda path, query: (404, {}, {})
+    client = HttpClient(retries=3, backoff=0.01)
+    assert client.get(stub_server.url + '/missing').status_code == 404
+    assert len(stub_server.requests) == 1
+
+
+def test_network_errors_are_retried_then_raised():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    client = HttpClient(retries=2, backoff=0.01, timeout=1.0)
+    with pytest.raises(requests.ConnectionError):
+        client.get(f'http://127.0.0.1:{port}/')
+    assert client.stats() == {'requests': 3, 'retries': 2, 'failures': 1}
+
+
+def test_retry_after_is_honoured_and_capped(stub_server):
+    responses = [(429, {'Retry-After': '1'}, {}), (200, {}, {})]
+    stub_server.handle = lambda path, query: responses.pop(0)
+    client = HttpClient(retries=1, backoff=0.01)
+    client.get(stub_server.url + '/limited')
+    first, second = stub_server.requests
+    assert second['at'] - first['at'] >= 0.9
+    response = requests.Response()
+    response.headers['Retry-After'] = '120'
+    assert HttpClient(max_backoff=5.0).delay(0, response) == 5.0
+
+
+def test_full_jitter_bounds():
+    client = HttpClient(backoff=0.5, max_backoff=4.0)
+    for attempt, bound in ((0, 0.5), (1, 1.0), (2, 2.0), (3, 4.0), (8, 4.0)):
+        samples = [client.delay(attempt) for _ in range(500)]
+        assert all(0.0 <= wait <= bound for wait in samples)
+        # Jitter pieno: le attese coprono l'intervallo, non sono fisse
+        assert max(samples) - min(samples) > bound * 0.5
+
+
+def test_per_host_concurrency_cap(stub_server):
+    def slow(path, query):
+        time.sleep(0.1)
+        return 200, {}, {}
+    stub_server.handle = slow
+    client = HttpClient(per_host=2, retries=0)
+    threads = [threading.Thread(target=client.get, args=(stub_server.url + f'/{i}',)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    assert len(stub_server.requests) == 8
+    assert stub_server.max_in_flight == 2
+
+
+def test_conditional_cache_reuses_value_on_304(stub_server):
+    def handle(path, query):
+        return (304, {}, b'') if stub_server.requests[-1]['headers'].get('If-None-Match') == '"v1"' \
+            else (200, {'ETag': '"v1"'}, {'n': 1})
+    stub_server.handle = handle
+    cache, client, parsed = ConditionalCache(), HttpClient(retries=0), []
+
+    def parse(body):
+        parsed.append(body)
+        return len(body)
+    values = [cache.fetch(client, stub_server.url + '/page', parse) for _ in range(3)]
+    assert values == [len(parsed[0])] * 3 and len(parsed) == 1
+    assert cache.stats()['not_modified'] == 2
@@ -0,0 +1,25 @@
+from datetime import datetime
+
+from prefetch_scheduler import NEW_YORK, MarketCalendar, PrefetchJob
+
+
+def ts(*args) -> float:
+    return datetime(*args, tzinfo=NEW_YORK).timestamp()
+
+
+def test_sessions():
+    calendar = MarketCalendar()
+    assert calendar.session(ts(2025, 3, 5, 11, 0)) == 'open'
+    assert calendar.session(ts(2025, 3, 5, 18, 0)) == 'closed'
+    assert calendar.session(ts(2025, 3, 8, 11, 0)) == 'weekend'
+    assert calendar.session(ts(2025, 12, 25, 11, 0)) == 'holiday'
+    # Il lead prima dell'apertura scalda la cache del lunedì
+    assert calendar.session(ts(2025, 3, 10, 9, 10)) == 'open'
+    assert calendar.session(ts(2025, 3, 10, 8, 50)) == 'closed'
+
+
+def test_weekend_is_paused_by_default():
+    job = PrefetchJob('tickerSA', lambda symbol: None, open_interval=1800, closed_interval=5400)
+    assert job.interval('closed') == 5400
+    assert job.interval('weekend') is None
+    assert job.interval('holiday') is None
@@ -0,0 +1,42 @@
+import multiprocessing
+import time
+
+from rate_limiter import BACKGROUND, INTERACTIVE, PriorityLimiter, SharedTokenBucket, TokenBucket
+
+
+def test_token_bucket_burst_then_rate():
+    bucket = TokenBucket(rate=10.0, capacity=3)
+    assert [bucket.try_acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert 0.0 < bucket.try_acquire() <= 0.1
+
+
+def test_shared_bucket_is_one_quota_for_all_instances(tmp_path):
+    path = str(tmp_path / 'quota.bucket')
+    # Due istanze sullo stesso file, come due worker: il burst è uno solo
+    first, second = SharedTokenBucket(path, rate=0.01, capacity=4), SharedTokenBucket(path, rate=0.01, capacity=4)
+    granted = [bucket.try_acquire() == 0.0 for bucket in (first, second) * 4]
+    assert granted.count(True) == 4
+
+
+def _drain(path, results):
+    bucket = SharedTokenBucket(path, rate=0.01, capacity=5)
+    results.put(sum(bucket.try_acquire() == 0.0 for _ in range(5)))
+
+
+def test_shared_bucket_across_processes(tmp_path):
+    path = str(tmp_path / 'quota.bucket')
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=_drain, args=(path, results)) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(10)
+    assert sum(results.get(timeout=5) for _ in workers) == 5
+
+
+def test_priority_limiter_path_uses_shared_bucket(tmp_path):
+    limiter = PriorityLimiter(rate=100.0, capacity=1, path=str(tmp_path / 'b'))
+    assert isinstance(limiter.bucket, SharedTokenBucket)
+    start = time.monotonic()
+    assert limiter.acquire(INTERACTIVE) and limiter.acquire(BACKGROUND, timeout=1.0)
+    assert time.monotonic() - start < 1.0
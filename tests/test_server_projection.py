@@ -0,0 +1,45 @@
+import os
+import tempfile
+import time
+
+import pytest
+
+# Il server legge la configurazione all'import: cache su file temporaneo, niente thread di prefetch
+os.environ.setdefault('FINANZA_CACHE_PATH', os.path.join(tempfile.mkdtemp(), 'cache.db'))
+os.environ.setdefault('FINANZA_PREFETCH', '0')
+os.environ.setdefault('FINANZA_WARM_CACHE', '0')
+
+server = pytest.importorskip('server')
+
+
+@pytest.fixture
+def scrapes(monkeypatch):
+    calls = []
+
+    def scrape(ticker, section):
+        calls.append((ticker, section))
+        return {'ticker': ticker, 'section': section, 'last_updated': '2025-01-01T00:00:00',
+                'data': {'income': {'tables': [], 'metrics': {'Revenue': 100}}}}
+    monkeypatch.setattr(server, 'scrape_ticker_sa_section', scrape)
+    return calls
+
+
+def test_section_projection_uses_the_section_ttl(scrapes):
+    ticker = 'PROJ1'
+    # Sezione financials salvata 3 ore fa: oltre il max stale del documento completo (2 h),
+    # ma fresca per il TTL della sezione (24 h)
+    stored_at = time.time() - 3 * 3600
+    server.swr.store(f'tickerSA.financials/{ticker}', server.scrape_ticker_sa_section(ticker, 'financials'),
+                     server.cache_ttls('tickerSA.financials')[1], stored_at)
+    client = server.app.test_client()
+    url = f'/api/finanza/tickerSA/{ticker}?fields=data.financials.income.metrics.Revenue'
+    for _ in range(2):
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.headers['X-Cache'] == 'FRESH'
+        assert response.get_json() == {'data': {'financials': {'income': {'metrics': {'Revenue': 100}}}}}
+        assert int(response.headers['Age']) >= 3 * 3600 - 5
+    # Niente scraping: la sezione era in cache, e la proiezione è rimasta in cache
+    assert scrapes == [(ticker, 'financials')]
+    assert server.swr.lookup(f'fields.tickerSA.financials/{ticker}?fields=data.financials.income.metrics.Revenue',
+                             *server.cache_ttls('tickerSA.financials')) is not None
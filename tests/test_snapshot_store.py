@@ -0,0 +1,54 @@
+import gzip
+import os
+
+from snapshot_store import SnapshotStore
+
+
+def doc(price):
+    return {'ticker': 'TEST', 'company_name': 'Test Inc', 'last_updated': '2025-01-01T00:00:00',
+            'data': {'overview': {'price': price}, 'news': []}}
+
+
+def index_path(store):
+    ticker_dir = os.path.join(store.root, 'TEST', 'index')
+    return os.path.join(ticker_dir, os.listdir(ticker_dir)[0])
+
+
+def test_unchanged_sections_are_stored_once(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    first, second = store.save(doc(1)), store.save(doc(2))
+    assert first['sections']['news'] == second['sections']['news']
+    assert first['sections']['overview'] != second['sections']['overview']
+    assert store.latest('TEST')['data'] == doc(2)['data']
+    assert store.as_of('TEST', first['ts'])['data'] == doc(1)['data']
+
+
+def test_append_after_a_truncated_member_stays_readable(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    store.save(doc(1))
+    path = index_path(store)
+    # Crash a metà di un append: resta mezzo membro gzip in coda
+    with open(path, 'ab') as f:
+        f.write(gzip.compress(b'{"ts": 1}\n')[:12])
+    assert len(store.entries('TEST', os.path.basename(path)[:10])) == 1
+    store.save(doc(2))
+    store.save(doc(3))
+    day = os.path.basename(path)[:10]
+    assert [e['ts'] for e in store.entries('TEST', day)] == sorted(e['ts'] for e in store.entries('TEST', day))
+    assert len(store.entries('TEST', day)) == 3
+    assert store.latest('TEST')['data'] == doc(3)['data']
+    # Il file riscritto contiene solo membri integri
+    with gzip.open(path, 'rt') as f:
+        assert len(f.read().splitlines()) == 3
+
+
+def test_members_behind_a_corrupt_one_are_still_read(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    store.save(doc(1))
+    path = index_path(store)
+    with open(path, 'rb') as f:
+        good = f.read()
+    # File già danneggiato da una versione precedente: membro troncato in mezzo
+    with open(path, 'wb') as f:
+        f.write(good + gzip.compress(b'{"ts": 1}\n')[:15] + good)
+    assert len(store.entries('TEST', os.path.basename(path)[:10])) == 2